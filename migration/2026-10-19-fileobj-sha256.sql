@@ -0,0 +1 @@
+ALTER TABLE fileobj ADD COLUMN sha256 character varying(64);
@@ -0,0 +1,28 @@
+CREATE TABLE jobs_job (
+    id serial NOT NULL,
+    handler character varying NOT NULL,
+    params character varying NOT NULL,
+    status character varying(9) NOT NULL,
+    progress double precision,
+    message character varying,
+    error character varying,
+    result character varying,
+    user_id integer,
+    created timestamp without time zone NOT NULL,
+    started timestamp without time zone,
+    finished timestamp without time zone,
+    heartbeat timestamp without time zone,
+    fileobj_id integer,
+    filename character varying,
+    content_type character varying,
+    CONSTRAINT jobs_job_pkey PRIMARY KEY (id),
+    CONSTRAINT jobs_job_user_id_fkey FOREIGN KEY (user_id)
+        REFERENCES auth_user (principal_id),
+    CONSTRAINT jobs_job_fileobj_id_fkey FOREIGN KEY (fileobj_id)
+        REFERENCES fileobj (id),
+    CONSTRAINT jobs_job_status_check CHECK (status IN ('pending', 'running', 'succeeded', 'failed'))
+);
+
+CREATE INDEX jobs_job_status_id_idx ON jobs_job USING btree (status, id);
+
+COMMENT ON TABLE jobs_job IS 'jobs';
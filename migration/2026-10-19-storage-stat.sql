@@ -0,0 +1,13 @@
+ALTER TABLE fileobj ADD COLUMN size bigint;
+
+CREATE TABLE core_storage_stat (
+    id serial NOT NULL,
+    key character varying NOT NULL,
+    size bigint NOT NULL,
+    count bigint NOT NULL,
+    CONSTRAINT core_storage_stat_pkey PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_core_storage_stat_key ON core_storage_stat USING btree (key);
+
+COMMENT ON TABLE core_storage_stat IS 'core';
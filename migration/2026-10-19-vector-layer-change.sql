@@ -0,0 +1,17 @@
+ALTER TABLE vector_layer ADD COLUMN version bigint;
+UPDATE vector_layer SET version = 0;
+ALTER TABLE vector_layer ALTER COLUMN version SET NOT NULL;
+
+CREATE TABLE vector_layer_change (
+    resource_id integer NOT NULL,
+    version bigint NOT NULL,
+    action character varying(10) NOT NULL,
+    feature_id integer,
+    tstamp timestamp without time zone NOT NULL,
+    CONSTRAINT vector_layer_change_pkey PRIMARY KEY (resource_id, version),
+    CONSTRAINT vector_layer_change_resource_id_fkey FOREIGN KEY (resource_id)
+        REFERENCES vector_layer (id) ON DELETE CASCADE,
+    CONSTRAINT vector_layer_change_action_check CHECK (action IN ('create', 'update', 'delete', 'delete_all'))
+);
+
+COMMENT ON TABLE vector_layer_change IS 'vector_layer';
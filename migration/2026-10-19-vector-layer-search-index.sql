@@ -0,0 +1,3 @@
+ALTER TABLE vector_layer ADD COLUMN search_index boolean;
+UPDATE vector_layer SET search_index = false;
+ALTER TABLE vector_layer ALTER COLUMN search_index SET NOT NULL;
@@ -39,6 +39,7 @@ def pkginfo():
         'wmsserver',
         'tmsclient',
         'file_upload',
+        'jobs',
         'audit',
     )
 
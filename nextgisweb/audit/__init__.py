@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
 import json
+from datetime import timedelta
 from pkg_resources import resource_filename
 
 from elasticsearch import Elasticsearch
@@ -9,6 +10,7 @@ import elasticsearch.exceptions as esexc
 from ..component import Component
 from ..lib.config import Option
 
+from .shipper import AuditShipper
 from .util import disable_logging
 
 
@@ -28,6 +30,13 @@ class AuditComponent(Component):
                 self.audit_es_port,
             ))
 
+            opts_es = self.options.with_prefix('elasticsearch')
+            self.shipper = AuditShipper(
+                self.es, queue_size=opts_es['queue_size'],
+                batch_size=opts_es['batch_size'],
+                flush_interval=opts_es['flush_interval'].total_seconds(),
+                spill_path=opts_es['spill_path'])
+
     def is_service_ready(self):
         if self.audit_enabled:
             while True:
@@ -59,4 +68,14 @@ class AuditComponent(Component):
         Option('elasticsearch.port', int, default=9200),
         Option('elasticsearch.index.prefix', default='nextgisweb-audit'),
         Option('elasticsearch.index.suffix', default='%Y.%m'),
+        Option('elasticsearch.queue_size', int, default=10000,
+               doc="Maximum number of audit records waiting for shipping."),
+        Option('elasticsearch.batch_size', int, default=500,
+               doc="Maximum number of audit records shipped in one bulk request."),
+        Option('elasticsearch.flush_interval', timedelta, default=timedelta(seconds=1),
+               doc="Maximum delay before queued audit records are shipped."),
+        Option('elasticsearch.spill_path', default=None,
+               doc="File where audit records are appended in bulk API format "
+                   "when the queue overflows or Elasticsearch is unavailable. "
+                   "Records are dropped if not set."),
     )
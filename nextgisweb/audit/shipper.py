@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import atexit
+import io
+import os
+import threading
+from logging import getLogger
+from time import time
+
+from six.moves.queue import Queue, Empty, Full
+from elasticsearch.helpers import streaming_bulk
+
+_logger = getLogger(__name__)
+
+
+class _Flush(object):
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+class AuditShipper(object):
+    """ Ships audit records to Elasticsearch in batches from a background
+    thread, so requests don't wait for Elasticsearch. Records are put to a
+    bounded in-memory queue. When it overflows or shipping fails, records
+    are appended to a spill file in bulk API format (if configured) or
+    dropped. Counters are available in :py:attr:`stats`. """
+
+    def __init__(self, es, queue_size, batch_size, flush_interval, spill_path=None):
+        self.es = es
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+
+        self.stats = dict(shipped=0, spilled=0, dropped=0)
+
+        self._queue = Queue(maxsize=queue_size)
+        self._pid = None
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def put(self, index, body):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((index, body))
+        except Full:
+            self._overflow([(index, body)], "Audit queue is full")
+
+    def flush(self, timeout=None):
+        """ Ship all queued records and wait for completion """
+
+        if self._pid != os.getpid():
+            return True
+
+        flush = _Flush()
+        try:
+            self._queue.put(flush, timeout=timeout)
+        except Full:
+            return False
+        return flush.event.wait(timeout)
+
+    def _ensure_started(self):
+        # uWSGI workers are forked after application loading, so the
+        # thread is started in each process on the first record.
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+
+            thread = threading.Thread(target=self._run, name='AuditShipper')
+            thread.daemon = True
+            thread.start()
+
+            atexit.register(self.flush, timeout=self.flush_interval)
+
+    def _run(self):
+        batch = list()
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time(), 0)
+            flush = None
+            try:
+                item = self._queue.get(timeout=timeout)
+                if isinstance(item, _Flush):
+                    flush = item
+                else:
+                    batch.append(item)
+                    if deadline is None:
+                        deadline = time() + self.flush_interval
+            except Empty:
+                pass
+
+            if len(batch) > 0 and (
+                flush is not None or len(batch) >= self.batch_size
+                or time() >= deadline
+            ):
+                self._ship(batch)
+                batch = list()
+                deadline = None
+
+            if flush is not None:
+                flush.event.set()
+
+    def _ship(self, batch):
+        # Results are yielded in order of records, so only failed records
+        # are spilled. Records after a transport error aren't processed.
+        failed = list()
+        processed = rejected = 0
+        try:
+            for ok, item in streaming_bulk(self.es, [
+                dict(_op_type='index', _index=index, _source=body)
+                for index, body in batch
+            ], raise_on_error=False):
+                if not ok:
+                    failed.append(batch[processed])
+                    rejected += 1
+                processed += 1
+        except Exception:
+            _logger.exception("Failed to ship %d audit records", len(batch) - processed)
+            failed.extend(batch[processed:])
+
+        if rejected > 0:
+            _logger.error("Audit records rejected by Elasticsearch: %d", rejected)
+
+        self._count('shipped', len(batch) - len(failed))
+        if len(failed) > 0:
+            self._overflow(failed, "Audit shipping failed")
+
+    def _overflow(self, records, reason):
+        if self.spill_path is not None:
+            try:
+                serializer = self.es.transport.serializer
+                with self._spill_lock, io.open(self.spill_path, 'a', encoding='utf-8') as fd:
+                    for index, body in records:
+                        fd.write(serializer.dumps(dict(index=dict(_index=index))) + '\n')
+                        fd.write(serializer.dumps(body) + '\n')
+                self._count('spilled', len(records))
+                return
+            except Exception:
+                _logger.exception("Failed to write audit spill file")
+
+        if self._count('dropped', len(records)) == len(records):
+            _logger.warning("%s, dropping audit records", reason)
+
+    def _count(self, key, value):
+        # Counters are updated from request threads and the shipper thread
+        with self._stats_lock:
+            self.stats[key] += value
+            return self.stats[key]
@@ -32,6 +32,7 @@ def delete_index(ngw_env, index):
 @pytest.mark.parametrize("method", ["GET", "POST", "PUT", "DELETE"])
 def test_audit_request_method(method, index, ngw_env, ngw_webtest_app):
     getattr(ngw_webtest_app, method.lower())("/api/resource/0", expect_errors=True)
+    ngw_env.audit.shipper.flush()
     ngw_env.audit.es.indices.refresh(index=index)
     assert one(ngw_env.audit.es, index)["request"]["method"] == method
 
@@ -39,12 +40,14 @@ def test_audit_request_method(method, index, ngw_env, ngw_webtest_app):
 @pytest.mark.parametrize("path", ["/api/resource/0", "/resource/0"])
 def test_audit_request_path(path, index, ngw_env, ngw_webtest_app):
     ngw_webtest_app.get(path, expect_errors=True)
+    ngw_env.audit.shipper.flush()
     ngw_env.audit.es.indices.refresh(index=index)
     assert one(ngw_env.audit.es, index)["request"]["path"] == path
 
 
 def test_audit_user(index, ngw_env, ngw_webtest_app):
     ngw_webtest_app.get("/api/resource/0", expect_errors=True)
+    ngw_env.audit.shipper.flush()
     ngw_env.audit.es.indices.refresh(index=index)
     assert one(ngw_env.audit.es, index)["user"]["id"] == 1
     assert one(ngw_env.audit.es, index)["user"]["keyname"] == "guest"
@@ -58,6 +61,7 @@ def test_audit_user(index, ngw_env, ngw_webtest_app):
 ])
 def test_audit_response_route_name(path, route_name, index, ngw_env, ngw_webtest_app):
     ngw_webtest_app.get(path, expect_errors=True)
+    ngw_env.audit.shipper.flush()
     ngw_env.audit.es.indices.refresh(index=index)
     assert one(ngw_env.audit.es, index)["response"].get("route_name") == route_name
 
@@ -65,5 +69,6 @@ def test_audit_response_route_name(path, route_name, index, ngw_env, ngw_webtest
 @pytest.mark.parametrize("path", ["/api/resource/0", "/api/resource/-1"])
 def test_audit_response_status_code(path, index, ngw_env, ngw_webtest_app):
     response = ngw_webtest_app.get(path, expect_errors=True)
+    ngw_env.audit.shipper.flush()
     ngw_env.audit.es.indices.refresh(index=index)
     assert one(ngw_env.audit.es, index)["response"]["status_code"] == response.status_code
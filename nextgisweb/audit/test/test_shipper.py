@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import io
+import json
+import os
+
+import pytest
+from elasticsearch.serializer import JSONSerializer
+
+from nextgisweb.audit import shipper as shipper_module
+from nextgisweb.audit.shipper import AuditShipper
+
+
+class FakeTransport(object):
+    serializer = JSONSerializer()
+
+
+class FakeES(object):
+    transport = FakeTransport()
+
+
+def spilled(path):
+    with io.open(path, 'r', encoding='utf-8') as fd:
+        lines = [json.loads(line) for line in fd]
+    return [(h['index']['_index'], b) for h, b in zip(lines[0::2], lines[1::2])]
+
+
+@pytest.fixture()
+def spill_path(tmp_path):
+    return str(tmp_path / 'spill.json')
+
+
+def test_overflow(spill_path):
+    shipper = AuditShipper(FakeES(), 1, 10, 1, spill_path=spill_path)
+
+    # Pretend the thread is started to keep records in the queue
+    shipper._pid = os.getpid()
+
+    shipper.put('index', dict(value=1))
+    shipper.put('index', dict(value=2))
+
+    assert shipper.stats == dict(shipped=0, spilled=1, dropped=0)
+    assert spilled(spill_path) == [('index', dict(value=2))]
+
+
+def test_overflow_drop():
+    shipper = AuditShipper(FakeES(), 1, 10, 1)
+    shipper._pid = os.getpid()
+
+    for value in range(3):
+        shipper.put('index', dict(value=value))
+
+    assert shipper.stats == dict(shipped=0, spilled=0, dropped=2)
+
+
+def test_spill_rejected(spill_path, monkeypatch):
+    def streaming_bulk(es, actions, raise_on_error=True):
+        assert not raise_on_error
+        for action in actions:
+            ok = action['_source']['value'] != 2
+            yield ok, dict(index=dict(status=201 if ok else 400))
+
+    monkeypatch.setattr(shipper_module, 'streaming_bulk', streaming_bulk)
+
+    shipper = AuditShipper(FakeES(), 10, 10, 1, spill_path=spill_path)
+    shipper._ship([('index', dict(value=value)) for value in range(4)])
+
+    assert shipper.stats == dict(shipped=3, spilled=1, dropped=0)
+    assert spilled(spill_path) == [('index', dict(value=2))]
+
+
+def test_spill_exception(spill_path, monkeypatch):
+    def streaming_bulk(es, actions, raise_on_error=True):
+        yield True, dict(index=dict(status=201))
+        raise RuntimeError("Connection lost")
+
+    monkeypatch.setattr(shipper_module, 'streaming_bulk', streaming_bulk)
+
+    shipper = AuditShipper(FakeES(), 10, 10, 1, spill_path=spill_path)
+    shipper._ship([('index', dict(value=value)) for value in range(3)])
+
+    assert shipper.stats == dict(shipped=1, spilled=2, dropped=0)
+    assert spilled(spill_path) == [
+        ('index', dict(value=1)), ('index', dict(value=2))]
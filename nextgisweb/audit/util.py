@@ -57,7 +57,7 @@ def elasticsearch_tween_factory(handler, registry):
             if context is not None:
                 body['context'] = OrderedDict(zip(('model', 'id'), context))
 
-            request.env.audit.es.index(index=index, body=body)
+            request.env.audit.shipper.put(index, body)
 
         return response
 
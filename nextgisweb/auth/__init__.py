@@ -9,6 +9,7 @@ from pyramid.httpexceptions import HTTPForbidden
 
 from ..lib.config import OptionAnnotations, Option
 from ..component import Component
+from ..core.notify import ProcessCache
 from ..models import DBSession
 from .. import db
 
@@ -32,6 +33,11 @@ class AuthComponent(Component):
         self.oauth = OAuthHelper(self.options.with_prefix('oauth')) \
             if self.options['oauth.enabled'] else None
 
+        # Group memberships of users, see User.member_of_ids
+        self.membership_cache = ProcessCache(
+            self.env.core.notify_listener, 'auth.membership',
+            maxsize=self.options['membership_cache.size'])
+
     def initialize_db(self):
         self.initialize_user(
             keyname='guest',
@@ -178,6 +184,10 @@ class AuthComponent(Component):
 
         Option('activity_delta', timedelta, default=timedelta(minutes=10),
                doc="User last activity update time delta in seconds."),
+
+        Option('membership_cache.size', int, default=4096,
+               doc="Maximum number of users with group memberships cached in "
+                   "process memory."),
     ))
 
     option_annotations += OAuthHelper.option_annotations.with_prefix('oauth')
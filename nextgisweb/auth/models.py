@@ -6,7 +6,8 @@ from passlib.hash import sha256_crypt
 import sqlalchemy as sa
 import sqlalchemy.orm as orm
 
-from ..models import declarative_base
+from ..env import env
+from ..models import DBSession, declarative_base
 from ..compat import lru_cache
 import six
 
@@ -96,6 +97,27 @@ class User(Principal):
         else:
             return a.principal_id == b.principal_id and a.principal_id is not None
 
+    @property
+    def member_of_ids(self):
+        """ Frozen set of identifiers of groups the user is member of.
+        Memberships are loaded with a single query and cached between
+        requests until group memberships are changed. """
+
+        result = self.__dict__.get('_member_of_ids')
+        if result is None:
+            user_id = self.principal_id
+            if user_id is None:
+                return frozenset()
+
+            def _load():
+                return frozenset(row.group_id for row in DBSession.query(
+                    tab_group_user.c.group_id
+                ).filter(tab_group_user.c.user_id == user_id))
+
+            result = env.auth.membership_cache.get(user_id, _load)
+            self._member_of_ids = result
+        return result
+
     @property
     def is_administrator(self):
         """ Is user member of 'administrators' """
@@ -107,9 +129,7 @@ class User(Principal):
         if not hasattr(self, '_admins'):
             self._admins = Group.filter_by(keyname='administrators').one()
 
-        return any([
-            user for user in self._admins.members
-            if user.principal_id == self.principal_id])
+        return self._admins.id in self.member_of_ids
 
     @property
     def password(self):
@@ -178,8 +198,11 @@ class Group(Principal):
         elif self.keyname == 'everyone':
             return user is not None
 
+        elif user is None:
+            return False
+
         else:
-            return user in self.members
+            return self.id in user.member_of_ids
 
     def serialize(self):
         return OrderedDict((
@@ -203,6 +226,20 @@ class Group(Principal):
                             for uid in data['members']]
 
 
+def _membership_changed(target, value, initiator):
+    # Group membership changes are tracked on both sides of the
+    # relationship, each event resets the memoized user memberships.
+    for obj in (target, value):
+        if isinstance(obj, User):
+            obj.__dict__.pop('_member_of_ids', None)
+    env.auth.membership_cache.changed()
+
+
+for _attr in (User.member_of, Group.members):
+    for _evt in ('append', 'remove'):
+        sa.event.listen(_attr, _evt, _membership_changed)
+
+
 @lru_cache(maxsize=256)
 def _password_hash_cache(a, b):
     result = sha256_crypt.verify(a, b)
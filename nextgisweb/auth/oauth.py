@@ -3,6 +3,7 @@ from __future__ import division, absolute_import, print_function, unicode_litera
 import re
 import itertools
 from datetime import datetime, timedelta
+from hashlib import sha256
 from collections import namedtuple
 from logging import getLogger
 import six
@@ -13,6 +14,7 @@ import zope.event
 
 from ..lib.config import OptionAnnotations, Option
 from ..compat import datetime_to_timestamp
+from ..lib.cache import TTLCache
 from .. import db
 from ..models import DBSession
 from ..core.exception import UserException
@@ -37,6 +39,8 @@ class OAuthHelper(object):
         if 'server.authorization_header' in options:
             self.server_headers['Authorization'] = options['server.authorization_header']
 
+        self.token_cache = TTLCache(maxsize=options['token_cache.size'])
+
     def authorization_code_url(self, redirect_uri, **kwargs):
         # TODO: Implement scope support
 
@@ -75,6 +79,17 @@ class OAuthHelper(object):
             raise exc
 
     def query_introspection(self, access_token):
+        # Process-local cache in front of the token table, access token
+        # itself is not kept in memory, only its hash.
+        cache_key = sha256(access_token.encode('utf-8')).hexdigest()
+        cached = self.token_cache.get(cache_key)
+        if cached is not None:
+            if cached is _INVALID_TOKEN:
+                _logger.debug("Access token was found invalid in memory cache")
+                return None
+            exp, sub, data = cached
+            return OAuthToken(id=access_token, exp=exp, sub=sub, data=data)
+
         with DBSession.no_autoflush:
             token = OAuthToken.filter_by(id=access_token).first()
 
@@ -87,6 +102,8 @@ class OAuthHelper(object):
             except requests.HTTPError as exc:
                 if 400 <= exc.response.status_code <= 403:
                     _logger.debug("Token verification failed: %s", exc.response.text)
+                    self.token_cache.put(cache_key, _INVALID_TOKEN, ttl=self.options[
+                        'token_cache.invalid_ttl'].total_seconds())
                     return None
                 raise exc
 
@@ -97,6 +114,11 @@ class OAuthHelper(object):
 
             _logger.debug("Adding access token to cache (%s)", access_token)
 
+        # Cached token must expire not later than the token itself
+        ttl = (token.exp - datetime.utcnow()).total_seconds()
+        self.token_cache.put(cache_key, (token.exp, token.sub, token.data), ttl=min(
+            ttl, self.options['token_cache.ttl'].total_seconds()))
+
         return token
 
     def access_token_to_user(self, access_token, merge_user=None):
@@ -258,6 +280,16 @@ class OAuthHelper(object):
         Option('server.authorization_header', default=None,
                doc="Add Authorization HTTP header to requests to OAuth server."),
 
+        Option('token_cache.size', int, default=4096,
+               doc="Maximum number of access tokens cached in process memory."),
+
+        Option('token_cache.ttl', timedelta, default=timedelta(hours=1),
+               doc="Maximum lifetime of access token in memory cache. Tokens are "
+                   "also evicted when expired."),
+
+        Option('token_cache.invalid_ttl', timedelta, default=timedelta(seconds=30),
+               doc="Lifetime of invalid access token in memory cache."),
+
         Option('profile.endpoint', default=None,
                doc="OpenID Connect endpoint URL"),
 
@@ -293,6 +325,9 @@ class OnAccessTokenToUser(object):
         return self._profile
 
 
+_INVALID_TOKEN = object()
+
+
 OAuthGrantResponse = namedtuple('OAuthGrantResponse', [
     'access_token', 'refresh_token', 'expires'])
 
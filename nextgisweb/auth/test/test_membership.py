@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+
+import pytest
+import transaction
+
+from nextgisweb.models import DBSession
+from nextgisweb.auth import User, Group
+
+
+@pytest.fixture()
+def user_group(ngw_env):
+    with transaction.manager:
+        user = User(keyname='test_membership_user', display_name="Test user").persist()
+        group = Group(keyname='test_membership_group', display_name="Test group").persist()
+        DBSession.flush()
+        user_id, group_id = user.id, group.id
+
+    yield user_id, group_id
+
+    with transaction.manager:
+        DBSession.delete(User.filter_by(id=user_id).one())
+        DBSession.delete(Group.filter_by(id=group_id).one())
+
+
+def test_member_of_ids(user_group):
+    user_id, group_id = user_group
+
+    with transaction.manager:
+        user = User.filter_by(id=user_id).one()
+        group = Group.filter_by(id=group_id).one()
+        assert user.member_of_ids == frozenset()
+        assert not group.is_member(user)
+
+        group.members.append(user)
+        assert group_id in user.member_of_ids
+        assert group.is_member(user)
+
+    DBSession.expunge_all()
+
+    with transaction.manager:
+        user = User.filter_by(id=user_id).one()
+        assert user.member_of_ids == frozenset((group_id, ))
+
+        user.member_of = []
+        assert user.member_of_ids == frozenset()
+
+    DBSession.expunge_all()
+
+    with transaction.manager:
+        user = User.filter_by(id=user_id).one()
+        assert user.member_of_ids == frozenset()
@@ -6,14 +6,17 @@ import io
 import json
 import re
 from collections import OrderedDict
+from copy import deepcopy
 from datetime import datetime
 
+import transaction
 from sqlalchemy import create_engine
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.engine.url import (
     URL as EngineURL,
     make_url as make_engine_url)
+from zope.sqlalchemy import mark_changed
 
 from .. import db
 from ..component import Component
@@ -23,11 +26,15 @@ from ..i18n import Localizer, Translations
 from ..compat import Path
 
 from .util import _
-from .model import Base, Setting
+from .model import Base, Setting, StorageStat
+from .notify import NotifyListener, ProcessCache
 from .command import BackupCommand  # NOQA
 from .backup import BackupBase, BackupMetadata  # NOQA
 
 
+_MISSING = object()
+
+
 class CoreComponent(Component):
     identity = 'core'
     metadata = Base.metadata
@@ -49,6 +56,12 @@ class CoreComponent(Component):
 
         self.DBSession = DBSession
 
+        self.notify_listener = NotifyListener(self.engine)
+
+        self.settings_cache = ProcessCache(
+            self.notify_listener, 'core.settings', maxsize=1024,
+            enabled=self.options['settings.cache'])
+
         # Methods for customization in components
         self.system_full_name_default = self.options.get(
             'system.full_name', self.localizer().translate(_('NextGIS geoinformation system')))
@@ -138,28 +151,37 @@ class CoreComponent(Component):
         return lobj
 
     def settings_exists(self, component, name):
-        return DBSession.query(db.exists().where(db.and_(
-            Setting.component == component, Setting.name == name
-        ))).scalar()
+        try:
+            self.settings_get(component, name)
+            return True
+        except KeyError:
+            return False
 
     def settings_get(self, component, name):
-        try:
-            obj = Setting.filter_by(component=component, name=name).one()
-            return json.loads(obj.value)
-        except NoResultFound:
+        def _load():
+            obj = Setting.filter_by(component=component, name=name).first()
+            return json.loads(obj.value) if obj is not None else _MISSING
+
+        value = self.settings_cache.get((component, name), _load)
+        if value is _MISSING:
             raise KeyError("Setting %s.%s not found!" % (component, name))
 
+        # Protect the cached value from modifications
+        return deepcopy(value)
+
     def settings_set(self, component, name, value):
         try:
             obj = Setting.filter_by(component=component, name=name).one()
         except NoResultFound:
             obj = Setting(component=component, name=name).persist()
         obj.value = json.dumps(value)
+        self.settings_cache.changed()
 
     def settings_delete(self, component, name):
         try:
             DBSession.delete(Setting.filter_by(
                 component=component, name=name).one())
+            self.settings_cache.changed()
         except NoResultFound:
             pass
 
@@ -172,11 +194,89 @@ class CoreComponent(Component):
     def query_stat(self):
         result = dict()
         result['full_name'] = self.system_full_name()
-        result['database_size'] = DBSession.query(db.func.pg_database_size(
-            db.func.current_database(),)).scalar()
+
+        storage = self.storage_stat()
+        if 'core.database' in storage:
+            result['database_size'] = storage['core.database']['size']
+        else:
+            # Accounting record is written by maintenance, which may not
+            # have run yet after upgrade.
+            result['database_size'] = DBSession.query(db.func.pg_database_size(
+                db.func.current_database(),)).scalar()
+        result['storage'] = storage
 
         return result
 
+    def storage_add(self, key, size, count=1, connection=None):
+        """ Add size and count delta to the storage accounting record. It
+        only inserts a row, so concurrent transactions don't block each
+        other. Connection should be passed from mapper events. """
+
+        if connection is None:
+            connection = DBSession.connection()
+            mark_changed(DBSession())
+        connection.execute(StorageStat.__table__.insert().values(
+            key=key, size=size, count=count))
+
+    def storage_set(self, key, size, count):
+        """ Replace the storage accounting record with precalculated value """
+
+        StorageStat.filter_by(key=key).delete(synchronize_session=False)
+        StorageStat(key=key, size=size, count=count).persist()
+
+    def storage_stat(self, prefix=None):
+        query = DBSession.query(
+            StorageStat.key,
+            db.func.sum(StorageStat.size),
+            db.func.sum(StorageStat.count),
+        ).group_by(StorageStat.key)
+
+        if prefix is not None:
+            query = query.filter(StorageStat.key.startswith(prefix))
+
+        return dict(
+            (key, dict(size=int(size), count=int(count)))
+            for key, size, count in query)
+
+    def storage_compact(self):
+        """ Replace delta records with their sums """
+
+        conn = DBSession.connection()
+        stat = StorageStat.__table__
+        rows = conn.execute(stat.delete().returning(
+            stat.c.key, stat.c.size, stat.c.count)).fetchall()
+
+        summary = OrderedDict()
+        for key, size, count in rows:
+            size_sum, count_sum = summary.get(key, (0, 0))
+            summary[key] = (size_sum + size, count_sum + count)
+
+        if len(summary) > 0:
+            conn.execute(stat.insert(), [
+                dict(key=key, size=size, count=count)
+                for key, (size, count) in summary.items()])
+        mark_changed(DBSession())
+
+    def schema_size(self, schema):
+        """ Total size and count of tables in the database schema """
+
+        size, count = DBSession.execute(db.text(
+            "SELECT coalesce(sum(pg_total_relation_size(c.oid)), 0), count(*) "
+            "FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = :schema AND c.relkind = 'r'"
+        ), dict(schema=schema)).fetchone()
+        return int(size), int(count)
+
+    def maintenance(self):
+        super(CoreComponent, self).maintenance()
+
+        with transaction.manager:
+            self.storage_compact()
+
+            database_size = DBSession.query(db.func.pg_database_size(
+                db.func.current_database(),)).scalar()
+            self.storage_set('core.database', database_size, 1)
+
     def system_full_name(self):
         try:
             return self.settings_get(self.identity, 'system.full_name')
@@ -239,6 +339,11 @@ class CoreComponent(Component):
         Option('sdir', required=True, doc="Path to filesytem data storage where data stored along "
                "with database. Other components file_upload create subdirectories in it."),
 
+        # Settings
+        Option('settings.cache', bool, default=True,
+               doc="Cache settings in process memory. Changes are propagated "
+                   "between processes with PostgreSQL LISTEN / NOTIFY."),
+
         # Backup storage
         Option('backup.path', doc="Path to directory in filesystem where backup created if "
                "target destination is not specified."),
@@ -246,6 +351,11 @@ class CoreComponent(Component):
         Option('backup.filename', default='%Y%m%d-%H%M%S.ngwbackup',
                doc="File name template (passed to strftime) for filename in backup.path if backup "
                "target destination is not specified"),
+        Option('backup.jobs', int, default=1,
+               doc="Number of parallel jobs for database dump and file storage "
+               "backup and restoration. File storage is backed up in parallel "
+               "only into a directory (--no-zip), ZIP archives are written "
+               "sequentially."),
 
         # Ignore packages and components
         Option('packages.ignore'),
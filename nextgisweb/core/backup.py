@@ -3,9 +3,14 @@ from __future__ import division, absolute_import, print_function, unicode_litera
 import os
 import re
 import logging
+import threading
 from contextlib import contextmanager
 from collections import namedtuple, OrderedDict
+from multiprocessing.pool import ThreadPool
+from shutil import copyfileobj, rmtree
 from subprocess import check_call, check_output
+from tempfile import mkdtemp
+from zipfile import ZipFile, is_zipfile
 import io
 import json
 from distutils.version import LooseVersion
@@ -23,11 +28,15 @@ logger = logging.getLogger(__name__)
 IR_FIELDS = ('id', 'identity', 'payload')
 IndexRecord = namedtuple('IndexRecord', IR_FIELDS)
 
+BUF_SIZE = 1024 * 1024
+POOL_CHUNK = 256
+
 
 class IndexFile(object):
 
-    def __init__(self, filename):
+    def __init__(self, filename, opener=None):
         self.filename = filename
+        self.opener = opener
 
     @contextmanager
     def writer(self):
@@ -52,7 +61,14 @@ class IndexFile(object):
 
     @contextmanager
     def reader(self):
-        with io.open(self.filename, 'r', newline='\n', encoding='utf-8') as fp:
+        if self.opener is not None:
+            fp = io.TextIOWrapper(
+                self.opener(self.filename),
+                newline='\n', encoding='utf-8')
+        else:
+            fp = io.open(self.filename, 'r', newline='\n', encoding='utf-8')
+
+        with fp:
             def read():
                 for line in fp:
                     data = json.loads(line)
@@ -63,6 +79,15 @@ class IndexFile(object):
 class BackupBase(object):
     registry = registry_maker()
 
+    concurrent = False
+    """ Blob backup and restoration can be executed in a thread pool
+    concurrently with other objects of the same class. Concurrent
+    objects must not use the database session. """
+
+    immutable = False
+    """ Blob content never changes for the same payload, so incremental
+    backups can reference the blob from the base backup. """
+
     def __init__(self, payload):
         self.payload = payload
         self.component = None
@@ -74,6 +99,11 @@ class BackupBase(object):
     def blob(self):
         return False
 
+    def filename(self):
+        """ Path to the existing file with the blob content, which can be
+        put into the backup directly, or None """
+        return None
+
     def backup(self, dst):
         raise NotImplementedError()
 
@@ -94,6 +124,246 @@ class BackupConfiguration(object):
         self._exclude_table_data.append('{}.{}'.format(schema, table))
 
 
+class DirectoryWriter(object):
+    """ Backup writer into the directory """
+
+    concurrent = True
+
+    def __init__(self, path):
+        self.path = path
+
+    @contextmanager
+    def stage_dir(self, name):
+        path = os.path.join(self.path, name)
+        os.makedirs(path)
+        yield path
+        if len(os.listdir(path)) == 0:
+            os.rmdir(path)
+
+    def write_file(self, name, src):
+        with io.open(src, 'rb') as fs, io.open(os.path.join(self.path, name), 'wb') as fd:
+            copyfileobj(fs, fd, length=BUF_SIZE)
+
+    def write_stream(self, name, callback):
+        with io.open(os.path.join(self.path, name), 'wb') as fd:
+            callback(fd)
+
+    def link(self, name, source, name_src):
+        if not isinstance(source, DirectorySource):
+            return False
+        try:
+            os.link(os.path.join(source.path, name_src), os.path.join(self.path, name))
+        except OSError:
+            # Different filesystems or hardlinks aren't supported
+            return False
+        return True
+
+
+class ZipWriter(object):
+    """ Backup writer into the ZIP archive. Files are streamed into the
+    archive without intermediate copies, only directories created by
+    external tools (like pg_dump) are staged in a temporary directory.
+    Blobs are stored uncompressed, so writing them from several threads
+    would only serialize on the archive and the writer isn't concurrent. """
+
+    concurrent = False
+
+    def __init__(self, zipf, tmp_root=None):
+        self.zipf = zipf
+        self.tmp_root = tmp_root
+
+    @contextmanager
+    def stage_dir(self, name):
+        tmp_dir = mkdtemp(dir=self.tmp_root)
+        try:
+            yield tmp_dir
+            for root, dirs, files in os.walk(tmp_dir):
+                for fn in sorted(files):
+                    filename = os.path.join(root, fn)
+                    arcname = os.path.join(name, os.path.relpath(filename, tmp_dir))
+                    self.zipf.write(filename, arcname)
+                    # Free disk space as soon as possible
+                    os.unlink(filename)
+        finally:
+            rmtree(tmp_dir)
+
+    def write_file(self, name, src):
+        self.zipf.write(src, name)
+
+    def write_stream(self, name, callback):
+        if six.PY3:
+            with self.zipf.open(name, 'w', force_zip64=True) as fd:
+                callback(fd)
+        else:
+            with self.stage_dir(os.path.dirname(name)) as tmp_dir:
+                with io.open(os.path.join(tmp_dir, os.path.basename(name)), 'wb') as fd:
+                    callback(fd)
+
+    def link(self, name, source, name_src):
+        return False
+
+
+def blob_name(comp_identity, seq):
+    return 'component/{}/{:08d}'.format(comp_identity, seq)
+
+
+def open_source(path):
+    if is_zipfile(path):
+        return ZipSource(path)
+    else:
+        return DirectorySource(path)
+
+
+class BackupSource(object):
+    """ Base class for backup readers. In incremental backups blobs of
+    immutable objects can be references to blobs of the base backup,
+    which are resolved here through the chain of base backups. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._base = None
+        self._refs = dict()
+        self._lookup = dict()
+
+    def base(self):
+        with self._lock:
+            if self._base is None and self.exists('$base'):
+                with self.open('$base') as fd:
+                    self._base = open_source(fd.read().decode('utf-8'))
+            return self._base
+
+    def refs(self, comp_identity):
+        with self._lock:
+            refs = self._refs.get(comp_identity)
+            if refs is None:
+                refs = self._refs[comp_identity] = dict()
+                refs_fn = 'component/{}/$refs'.format(comp_identity)
+                if self.exists(refs_fn):
+                    with IndexFile(refs_fn, opener=self.open).reader() as read:
+                        for record in read:
+                            refs[record.id] = record.payload
+            return refs
+
+    def locate(self, comp_identity, seq):
+        """ Find the backup (this or one of the base backups) which
+        physically contains the blob, returns the backup and blob name """
+
+        ref = self.refs(comp_identity).get(seq)
+        if ref is not None:
+            base = self.base()
+            if base is None:
+                raise RuntimeError("Base backup isn't available!")
+            return base.locate(comp_identity, ref['id'])
+        return self, blob_name(comp_identity, seq)
+
+    def open_blob(self, comp_identity, seq):
+        source, name = self.locate(comp_identity, seq)
+        return source.open(name)
+
+    def blob_size(self, comp_identity, seq):
+        ref = self.refs(comp_identity).get(seq)
+        if ref is not None:
+            return ref['size']
+        return self.size(blob_name(comp_identity, seq))
+
+    def lookup(self, comp_identity, itm):
+        """ Find the blob of the immutable object with the same payload,
+        returns its sequence number or None """
+
+        with self._lock:
+            lookup = self._lookup.get(comp_identity)
+            if lookup is None:
+                lookup = self._lookup[comp_identity] = dict()
+                idx_fn = 'component/{}/$index'.format(comp_identity)
+                if self.exists(idx_fn):
+                    with IndexFile(idx_fn, opener=self.open).reader() as read:
+                        for record in read:
+                            lookup[_lookup_key(record.identity, record.payload)] = record.id
+
+        return lookup.get(_lookup_key(itm.identity, itm.payload))
+
+
+def _lookup_key(identity, payload):
+    return (identity, json.dumps(payload, sort_keys=True))
+
+
+class DirectorySource(BackupSource):
+    """ Backup reader from the directory """
+
+    def __init__(self, path):
+        super(DirectorySource, self).__init__()
+        self.path = path
+
+    @contextmanager
+    def stage_dir(self, name):
+        yield os.path.join(self.path, name)
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.path, name))
+
+    def listdir(self, name):
+        path = os.path.join(self.path, name)
+        return os.listdir(path) if os.path.isdir(path) else []
+
+    def open(self, name):
+        return io.open(os.path.join(self.path, name), 'rb')
+
+    def size(self, name):
+        return os.path.getsize(os.path.join(self.path, name))
+
+
+class ZipSource(BackupSource):
+    """ Backup reader from the ZIP archive. Only directories required by
+    external tools (like pg_restore) are extracted, other files are read
+    from the archive directly. """
+
+    def __init__(self, filename, tmp_root=None):
+        super(ZipSource, self).__init__()
+        self.filename = filename
+        self.tmp_root = tmp_root
+        self._local = threading.local()
+        self._names = set(self._zipf().namelist())
+
+    def _zipf(self):
+        # ZipFile object can't be shared between threads
+        zipf = getattr(self._local, 'zipf', None)
+        if zipf is None:
+            zipf = self._local.zipf = ZipFile(self.filename, 'r')
+        return zipf
+
+    @contextmanager
+    def stage_dir(self, name):
+        tmp_dir = mkdtemp(dir=self.tmp_root)
+        try:
+            prefix = name + '/'
+            zipf = self._zipf()
+            for member in zipf.namelist():
+                if member.startswith(prefix) and not member.endswith('/'):
+                    zipf.extract(member, tmp_dir)
+            yield os.path.join(tmp_dir, name)
+        finally:
+            rmtree(tmp_dir)
+
+    def exists(self, name):
+        return name in self._names
+
+    def listdir(self, name):
+        prefix = name + '/'
+        result = set()
+        for member in self._names:
+            if member.startswith(prefix):
+                part = member[len(prefix):].split('/', 1)[0]
+                if part != '':
+                    result.add(part)
+        return list(result)
+
+    def open(self, name):
+        return self._zipf().open(name, 'r')
+
+    def size(self, name):
+        return self._zipf().getinfo(name).file_size
+
+
 BackupMetadata = namedtuple('BackupMetadata', ['filename', 'timestamp', 'size'])
 
 
@@ -116,7 +386,21 @@ def pg_connection_options(env):
     ], con_args['password']
 
 
-def backup(env, dst):
+def backup(env, dst, jobs=1, base=None):
+    """ Backup the database and component data into the directory path
+    or backup writer using the given number of parallel jobs. If the path
+    of the base backup is given, then blobs of immutable objects already
+    present there are hardlinked or referenced instead of copying, and
+    the base backup is required for restoration. """
+
+    writer = DirectoryWriter(dst) if isinstance(dst, six.string_types) else dst
+
+    if base is not None:
+        base = os.path.abspath(base)
+        logger.info("Making incremental backup based on %s", base)
+        writer.write_stream('$base', lambda fd: fd.write(base.encode('utf-8')))
+        base = open_source(base)
+
     # TRANSACTION AND CONNECTION
 
     con = DBSession.connection()
@@ -137,9 +421,89 @@ def backup(env, dst):
 
     logger.info("Dumping PostgreSQL database...")
 
-    pg_dir = os.path.join(dst, 'postgres')
-    os.mkdir(pg_dir)
+    with writer.stage_dir('postgres') as pg_dir:
+        _pg_dump(env, con, pg_dir, snapshot, config, jobs)
+
+    # CUSTOM COMPONENT DATA
+
+    logger.info("Dumping components data...")
+
+    if jobs > 1 and not writer.concurrent:
+        logger.info("Component data are written sequentially into the archive")
+
+    pool = ThreadPool(jobs) if jobs > 1 and writer.concurrent else None
+    try:
+        for comp in env.chain('backup_objects'):
+            _backup_component(comp, writer, pool, base)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def _backup_component(comp, writer, pool, base):
+    comp_dir = 'component/' + comp.identity
+    concurrent = list()
+    refs = list()
+
+    def write_blob(args):
+        itm, binfn = args
+        filename = itm.filename()
+        if filename is not None:
+            writer.write_file(binfn, filename)
+        else:
+            writer.write_stream(binfn, itm.backup)
+
+    def reference(seq, itm, binfn):
+        base_seq = base.lookup(comp.identity, itm)
+        if base_seq is None:
+            return False
+
+        # Verify the size if it's known for both blobs
+        filename = itm.filename()
+        size = os.path.getsize(filename) if filename is not None else None
+        base_size = base.blob_size(comp.identity, base_seq)
+        if size is not None and base_size is not None and size != base_size:
+            return False
+
+        source, name = base.locate(comp.identity, base_seq)
+        if not writer.link(binfn, source, name):
+            refs.append(IndexRecord(
+                id=seq, identity=itm.identity,
+                payload=dict(id=base_seq, size=base_size)))
+        return True
+
+    with writer.stage_dir(comp_dir) as stage_dir:
+        idx_file = IndexFile(os.path.join(stage_dir, '$index'))
+        with idx_file.writer() as idx_write:
+            for seq, itm in enumerate(comp.backup_objects(), start=1):
+                itm.bind(comp)
+                record = IndexRecord(id=seq, identity=itm.identity, payload=itm.payload)
+                if itm.blob:
+                    binfn = '{}/{:08d}'.format(comp_dir, seq)
+                    if base is not None and itm.immutable and reference(seq, itm, binfn):
+                        pass
+                    elif pool is not None and itm.concurrent:
+                        concurrent.append((itm, binfn))
+                        if len(concurrent) >= POOL_CHUNK:
+                            pool.map(write_blob, concurrent)
+                            del concurrent[:]
+                    else:
+                        write_blob((itm, binfn))
+
+                idx_write(record)
+
+        if len(concurrent) > 0:
+            pool.map(write_blob, concurrent)
+
+        if len(refs) > 0:
+            logger.debug("%d blobs of component %s referenced", len(refs), comp.identity)
+            with IndexFile(os.path.join(stage_dir, '$refs')).writer() as refs_write:
+                for record in refs:
+                    refs_write(record)
+
 
+def _pg_dump(env, con, pg_dir, snapshot, config, jobs):
     pgd_version = parse_pg_dump_version(check_output(
         ['/usr/bin/pg_dump', '--version']).decode('utf-8'))
 
@@ -160,13 +524,16 @@ def backup(env, dst):
         logger.debug("Excluding table data: %s", ', '.join(config._exclude_table_data))
         exc_opt += ['--exclude-table-data={}'.format(i) for i in config._exclude_table_data]
 
+    # Parallel dump uses the exported snapshot in all workers
+    jobs_opt = ['--jobs={}'.format(jobs), ] if jobs > 1 and snp_opt else []
+
     pg_copt, pg_pass = pg_connection_options(env)
     check_call([
         '/usr/bin/pg_dump',
         '--format=directory',
         '--compress=0',
         '--file={}'.format(pg_dir),
-    ] + snp_opt + exc_opt + pg_copt, env=dict(PGPASSWORD=pg_pass))
+    ] + snp_opt + jobs_opt + exc_opt + pg_copt, env=dict(PGPASSWORD=pg_pass))
 
     pg_listing = check_output([
         '/usr/bin/pg_restore',
@@ -220,35 +587,13 @@ def backup(env, dst):
     with io.open(pg_restore_list, 'w') as fd:
         fd.write('\n'.join(restore_list))
 
-    # CUSTOM COMPONENT DATA
-
-    logger.info("Dumping components data...")
-
-    comp_root = os.path.join(dst, 'component')
-    os.mkdir(comp_root)
-
-    for comp in env.chain('backup_objects'):
-        comp_dir = os.path.join(comp_root, comp.identity)
-        os.mkdir(comp_dir)
-
-        idx_file = IndexFile(os.path.join(comp_dir, '$index'))
-        with idx_file.writer() as idx_write:
-            for seq, itm in enumerate(comp.backup_objects(), start=1):
-                itm.bind(comp)
-                record = IndexRecord(id=seq, identity=itm.identity, payload=itm.payload)
-                if itm.blob:
-                    binfn = os.path.join(comp_dir, '{:08d}'.format(seq))
-                    with io.open(binfn, 'wb') as fd:
-                        itm.backup(fd)
-
-                idx_write(record)
 
-        # Remove empty component directory
-        if len(os.listdir(comp_dir)) == 0:
-            os.rmdir(comp_dir)
+def restore(env, src, jobs=1):
+    """ Restore the database and component data from the directory path
+    or backup source using the given number of parallel jobs """
 
+    source = open_source(src) if isinstance(src, six.string_types) else src
 
-def restore(env, src):
     con = DBSession.connection()
 
     con.execute('BEGIN')
@@ -263,39 +608,67 @@ def restore(env, src):
     # POSTGRES RESTORE
     logger.info("Restoring PostgreSQL dump...")
 
-    pg_dir = os.path.join(src, 'postgres')
-    pg_restore_list = os.path.join(pg_dir, 'restore')
+    jobs_opt = ['--jobs={}'.format(jobs), ] if jobs > 1 else []
 
-    pg_copt, pg_pass = pg_connection_options(env)
-    check_call([
-        '/usr/bin/pg_restore',
-        '--clean', '--if-exists',
-        '--no-owner', '--no-privileges',
-        '--exit-on-error',
-        '--use-list', pg_restore_list,
-    ] + pg_copt + [pg_dir, ], env=dict(PGPASSWORD=pg_pass))
+    with source.stage_dir('postgres') as pg_dir:
+        pg_restore_list = os.path.join(pg_dir, 'restore')
+
+        pg_copt, pg_pass = pg_connection_options(env)
+        check_call([
+            '/usr/bin/pg_restore',
+            '--clean', '--if-exists',
+            '--no-owner', '--no-privileges',
+            '--exit-on-error',
+            '--use-list', pg_restore_list,
+        ] + jobs_opt + pg_copt + [pg_dir, ], env=dict(PGPASSWORD=pg_pass))
 
     # CUSTOM COMPONENT DATA
     logger.info("Restoring component data...")
 
-    comp_root = os.path.join(src, 'component')
+    pool = ThreadPool(jobs) if jobs > 1 else None
+
     con.execute('BEGIN')
     try:
-        for comp_identity in os.listdir(comp_root):
+        for comp_identity in source.listdir('component'):
             comp = env._components[comp_identity]
-            comp_dir = os.path.join(comp_root, comp_identity)
-            idx_fn = os.path.join(comp_dir, '$index')
-            if os.path.exists(idx_fn):
-                idx_file = IndexFile(idx_fn)
-                with idx_file.reader() as read:
-                    for record in read:
-                        itm = BackupBase.registry[record.identity](record.payload)
-                        itm.bind(comp)
-                        if itm.blob:
-                            binfn = os.path.join(comp_dir, '{:08d}'.format(record.id))
-                            with io.open(binfn, 'rb') as fd:
-                                itm.restore(fd)
+            _restore_component(comp, source, pool)
         con.execute('COMMIT')
     except Exception:
         con.execute('ROLLBACK')
         raise
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def _restore_component(comp, source, pool):
+    comp_dir = 'component/' + comp.identity
+    idx_fn = comp_dir + '/$index'
+    if not source.exists(idx_fn):
+        return
+
+    concurrent = list()
+
+    def read_blob(args):
+        itm, seq = args
+        with source.open_blob(comp.identity, seq) as fd:
+            itm.restore(fd)
+
+    idx_file = IndexFile(idx_fn, opener=source.open)
+    with idx_file.reader() as read:
+        for record in read:
+            itm = BackupBase.registry[record.identity](record.payload)
+            itm.bind(comp)
+            if itm.blob:
+                task = (itm, record.id)
+                if pool is not None and itm.concurrent:
+                    concurrent.append(task)
+                    if len(concurrent) >= POOL_CHUNK:
+                        pool.map(read_blob, concurrent)
+                        del concurrent[:]
+                else:
+                    read_blob(task)
+
+    if len(concurrent) > 0:
+        pool.map(read_blob, concurrent)
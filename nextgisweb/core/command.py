@@ -11,8 +11,7 @@ from time import sleep
 from tempfile import NamedTemporaryFile, mkdtemp, mkstemp
 from shutil import rmtree
 from contextlib import contextmanager
-from backports.tempfile import TemporaryDirectory
-from zipfile import ZipFile, is_zipfile
+from zipfile import ZipFile
 
 import transaction
 import unicodecsv as csv
@@ -21,7 +20,7 @@ from .. import geojson
 from ..command import Command
 from ..models import DBSession
 
-from .backup import backup, restore
+from .backup import backup, restore, ZipWriter
 
 
 logger = logging.getLogger(__name__)
@@ -125,6 +124,18 @@ class BackupCommand(Command):
             '--no-zip', dest='nozip', action='store_true',
             help='use directory instead of zip-file as backup format')
 
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=None,
+            help='number of parallel jobs (default: backup.jobs option)')
+
+        parser.add_argument(
+            '--base', type=str, metavar='path', default=None,
+            help='make incremental backup based on the given backup')
+
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='make incremental backup based on the latest backup in backup.path')
+
         parser.add_argument(
             'target', type=str, metavar='path', nargs='?',
             help='backup destination path')
@@ -132,6 +143,15 @@ class BackupCommand(Command):
     @classmethod
     def execute(cls, args, env):
         target = args.target
+        jobs = args.jobs if args.jobs is not None else env.core.options['backup.jobs']
+
+        base = args.base
+        if args.incremental and base is None:
+            backups = env.core.get_backups() if env.core.options['backup.path'] else []
+            if len(backups) == 0:
+                raise RuntimeError("No backup found to make incremental backup!")
+            base = env.core.backup_filename(str(backups[0].filename))
+
         autoname = datetime.today().strftime(env.core.options['backup.filename'])
         if target is None:
             if env.core.options['backup.path']:
@@ -160,35 +180,22 @@ class BackupCommand(Command):
             @contextmanager
             def tgt_context():
                 tmp_root = os.path.split(target)[0]
-                with TemporaryDirectory(dir=tmp_root) as tmp_dir:
-                    yield tmp_dir
-                    tmp_arch = mkstemp(dir=tmp_root)[1]
+                tmp_arch = mkstemp(dir=tmp_root)[1]
+                try:
+                    # Files are streamed into the archive without staging
+                    with ZipFile(tmp_arch, 'w', allowZip64=True) as zipf:
+                        yield ZipWriter(zipf, tmp_root=tmp_root)
+                    logger.debug("Renaming [%s] to [%s]...", tmp_arch, target)
+                    os.rename(tmp_arch, target)
+                except Exception:
                     os.unlink(tmp_arch)
-                    try:
-                        cls.compress(tmp_dir, tmp_arch)
-                        logger.debug("Renaming [%s] to [%s]...", tmp_arch, target)
-                        os.rename(tmp_arch, target)
-                    except Exception:
-                        os.unlink(tmp_arch)
-                        raise
+                    raise
 
         with tgt_context() as tgt:
-            backup(env, tgt)
+            backup(env, tgt, jobs=jobs, base=base)
 
         print(target)
 
-    @classmethod
-    def compress(cls, src, dst):
-        logger.debug("Compressing '%s' to '%s'...", src, dst)
-        with ZipFile(dst, 'w', allowZip64=True) as zipf:
-            for root, dirs, files in os.walk(src):
-                zipf.write(root, os.path.relpath(root, src))
-                for fn in files:
-                    filename = os.path.join(root, fn)
-                    if os.path.isfile(filename):
-                        arcname = os.path.join(os.path.relpath(root, src), fn)
-                        zipf.write(filename, arcname)
-
 
 @Command.registry.register
 class RestoreCommand(Command):
@@ -200,27 +207,15 @@ class RestoreCommand(Command):
             'source', type=str, metavar='path',
             help="Path (file or directory) to restore backup from")
 
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=None,
+            help='number of parallel jobs (default: backup.jobs option)')
+
     @classmethod
     def execute(cls, args, env):
-        if is_zipfile(args.source):
-            @contextmanager
-            def src_context():
-                with TemporaryDirectory() as tmpdir:
-                    cls.decompress(args.source, tmpdir)
-                    yield tmpdir
-        else:
-            @contextmanager
-            def src_context():
-                yield args.source
+        jobs = args.jobs if args.jobs is not None else env.core.options['backup.jobs']
 
-        with src_context() as src:
-            restore(env, src)
-
-    @classmethod
-    def decompress(cls, src, dst):
-        logger.debug("Decompressing '%s' to '%s'...", src, dst)
-        with ZipFile(src, 'r') as zipf:
-            zipf.extractall(dst)
+        restore(env, args.source, jobs=jobs)
 
 
 @Command.registry.register
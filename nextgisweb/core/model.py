@@ -14,3 +14,16 @@ class Setting(Base):
     component = db.Column(db.Unicode, primary_key=True)
     name = db.Column(db.Unicode, primary_key=True)
     value = db.Column(db.Unicode, nullable=False)
+
+
+class StorageStat(Base):
+    """ Storage accounting record. Records with the same key are summed
+    up: components add delta records on changes, which are compacted
+    into a single record during maintenance. """
+
+    __tablename__ = 'core_storage_stat'
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.Unicode, nullable=False, index=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    count = db.Column(db.BigInteger, nullable=False)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import os
+import select
+import threading
+from logging import getLogger
+from time import sleep
+
+import transaction
+from zope.sqlalchemy import mark_changed
+
+from .. import db
+from ..lib.cache import TTLCache
+from ..models import DBSession
+
+CHANNEL = 'nextgisweb'
+
+_logger = getLogger(__name__)
+
+
+def notify(key):
+    """ Send notification about data change under the given key to all
+    processes. PostgreSQL delivers it only when current transaction is
+    committed, so other processes never see data which is not committed
+    yet. """
+
+    DBSession.execute(db.sql.text(
+        'SELECT pg_notify(:channel, :key)'
+    ), dict(channel=CHANNEL, key=key))
+    mark_changed(DBSession())
+
+
+class NotifyListener(object):
+    """ Background thread receiving PostgreSQL notifications sent with
+    :py:func:`notify` and dispatching them to subscribed callbacks.
+
+    Thread is started lazily in each process (uWSGI workers are forked
+    after application loading). Callbacks are also called with ``None``
+    key when the listener connects or disconnects, because notifications
+    could have been missed. Process-local caches should be used only while
+    :py:attr:`active` is true. """
+
+    reconnect_interval = 5
+
+    def __init__(self, engine):
+        self._engine = engine
+        self._callbacks = dict()
+        self._pid = None
+        self._lock = threading.Lock()
+        self.active = False
+
+    def subscribe(self, key, callback):
+        self._callbacks.setdefault(key, []).append(callback)
+
+    def ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        with self._lock:
+            if self._pid == pid:
+                return
+            self.active = False
+            self._pid = pid
+
+            thread = threading.Thread(
+                target=self._run, name='NotifyListener')
+            thread.daemon = True
+            thread.start()
+
+    def _dispatch(self, key):
+        if key is None:
+            callbacks = [c for cl in self._callbacks.values() for c in cl]
+        else:
+            callbacks = self._callbacks.get(key, ())
+
+        for callback in callbacks:
+            try:
+                callback(key)
+            except Exception:
+                _logger.exception("Notification callback failed for key: %s", key)
+
+    def _connect(self):
+        dialect = self._engine.dialect
+        cargs, cparams = dialect.create_connect_args(self._engine.url)
+        conn = dialect.connect(*cargs, **cparams)
+        conn.autocommit = True
+        conn.cursor().execute('LISTEN "{}"'.format(CHANNEL))
+        return conn
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            conn = None
+            try:
+                conn = self._connect()
+                self.active = True
+                self._dispatch(None)
+
+                while self._pid == pid:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+
+            except Exception:
+                _logger.exception("Notification listener failed, reconnecting...")
+
+            finally:
+                if self.active:
+                    self.active = False
+                    self._dispatch(None)
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+            sleep(self.reconnect_interval)
+
+
+_NOT_FOUND = object()
+
+
+class ProcessCache(object):
+    """ Process-local cache of database derived values invalidated with
+    notifications under the given key. Call :py:meth:`changed` when the
+    source data is modified in the current transaction: other processes
+    get notified on commit, and the cache is bypassed in the modifying
+    transaction until it's committed. """
+
+    def __init__(self, listener, key, maxsize, enabled=True):
+        self.listener = listener
+        self.key = key
+        self.enabled = enabled
+        self._data = TTLCache(maxsize=maxsize)
+        self._generation = 0
+        listener.subscribe(key, self.invalidate)
+
+    def get(self, key, loader):
+        enabled = self._enabled()
+        if enabled:
+            value = self._data.get(key, _NOT_FOUND)
+            if value is not _NOT_FOUND:
+                return value
+
+        generation = self._generation
+        value = loader()
+
+        # Don't cache the value if it was changed during loading
+        if enabled and generation == self._generation:
+            self._data.put(key, value)
+
+        return value
+
+    def changed(self):
+        txn = transaction.get()
+        try:
+            txn.data(self)
+        except KeyError:
+            txn.set_data(self, True)
+            txn.addBeforeCommitHook(notify, (self.key, ))
+
+            # Other processes are notified via the listener, and the
+            # current one is invalidated without waiting for it.
+            txn.addAfterCommitHook(lambda status: self.invalidate())
+
+    def invalidate(self, key=None):
+        self._generation += 1
+        self._data.clear()
+
+    def _enabled(self):
+        if not self.enabled:
+            return False
+
+        self.listener.ensure_started()
+        if not self.listener.active:
+            return False
+
+        # Bypass the cache in a transaction which changes the source
+        # data, so it sees its own uncommitted changes.
+        try:
+            return not transaction.get().data(self)
+        except KeyError:
+            return True
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
+import io
 from distutils.version import LooseVersion
+from zipfile import ZipFile
 import six
 
 import pytest
@@ -10,6 +12,12 @@ from nextgisweb.core.backup import (
     IndexRecord,
     parse_pg_dump_version,
     backup,
+    ZipWriter,
+    ZipSource,
+    DirectoryWriter,
+    BackupBase,
+    open_source,
+    _backup_component,
 )
 
 
@@ -30,6 +38,94 @@ def test_index_file_read_write(tmp_path):
         assert list(read) == data
 
 
+def test_zip_writer_source(tmp_path):
+    src = tmp_path / 'src'
+    src.write_bytes(b'file')
+
+    arch = six.text_type(tmp_path / 'backup.zip')
+    with ZipFile(arch, 'w', allowZip64=True) as zipf:
+        writer = ZipWriter(zipf, tmp_root=six.text_type(tmp_path))
+        with writer.stage_dir('component/test') as stage_dir:
+            with IndexFile(six.text_type(stage_dir) + '/$index').writer() as write:
+                write(IndexRecord(1, 'test', None))
+            writer.write_file('component/test/00000001', six.text_type(src))
+            writer.write_stream('component/test/00000002', lambda fd: fd.write(b'stream'))
+
+    source = ZipSource(arch)
+    assert source.listdir('component') == ['test', ]
+    assert source.exists('component/test/$index')
+
+    with IndexFile('component/test/$index', opener=source.open).reader() as read:
+        assert list(read) == [IndexRecord(1, 'test', None), ]
+
+    with source.open('component/test/00000001') as fd:
+        assert fd.read() == b'file'
+    with source.open('component/test/00000002') as fd:
+        assert fd.read() == b'stream'
+
+    with source.stage_dir('component') as stage_dir:
+        with io.open(stage_dir + '/test/00000002', 'rb') as fd:
+            assert fd.read() == b'stream'
+
+
+class BlobItem(BackupBase):
+    identity = 'test_blob'
+    immutable = True
+    blob = True
+
+    def backup(self, dst):
+        dst.write(self.payload['data'].encode('utf-8'))
+
+
+class BlobComponent(object):
+    identity = 'test'
+
+    def __init__(self, data):
+        self.data = data
+
+    def backup_objects(self):
+        for key, data in self.data:
+            yield BlobItem(dict(key=key, data=data))
+
+
+@pytest.mark.parametrize('fmt', ['zip', 'dir'])
+def test_incremental(fmt, tmp_path):
+    def make_backup(name, data, base=None):
+        path = six.text_type(tmp_path / name)
+
+        def write(writer):
+            if base is not None:
+                writer.write_stream('$base', lambda fd: fd.write(base.encode('utf-8')))
+            source = open_source(base) if base is not None else None
+            _backup_component(BlobComponent(data), writer, None, source)
+
+        if fmt == 'zip':
+            with ZipFile(path, 'w', allowZip64=True) as zipf:
+                write(ZipWriter(zipf, tmp_root=six.text_type(tmp_path)))
+        else:
+            (tmp_path / name).mkdir()
+            write(DirectoryWriter(path))
+
+        return path
+
+    first = make_backup('first', [('a', 'A'), ('b', 'B')])
+    second = make_backup('second', [('a', 'A'), ('c', 'C')], base=first)
+    third = make_backup('third', [('a', 'A'), ('c', 'C'), ('d', 'D')], base=second)
+
+    source = open_source(third)
+    if fmt == 'zip':
+        # Blobs are referenced through the chain of backups
+        assert set(source.refs('test').keys()) == {1, 2}
+        assert source.locate('test', 1) == (source.base().base(), 'component/test/00000001')
+    else:
+        # Blobs are hardlinked and don't depend on base backups
+        assert source.refs('test') == dict()
+
+    for seq, data in ((1, b'A'), (2, b'C'), (3, b'D')):
+        with source.open_blob('test', seq) as fd:
+            assert fd.read() == data
+
+
 @pytest.mark.parametrize('output, expected', [
     ('pg_dump (PostgreSQL) 10.10 (Ubuntu 10.10-0ubuntu0.18.04.1)', '10.10'),
     ('pg_dump (PostgreSQL) 9.3.22', '9.3.22'),
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+from time import sleep
+
+import pytest
+import transaction
+
+
+@pytest.fixture()
+def core(ngw_env):
+    core = ngw_env.core
+
+    # Wait for the notification listener to connect
+    core.notify_listener.ensure_started()
+    for i in range(50):
+        if core.notify_listener.active:
+            break
+        sleep(0.1)
+
+    yield core
+
+    with transaction.manager:
+        core.settings_delete('test', 'value')
+
+
+def test_settings_cache(core):
+    with pytest.raises(KeyError):
+        core.settings_get('test', 'value')
+    assert not core.settings_exists('test', 'value')
+
+    with transaction.manager:
+        core.settings_set('test', 'value', [1, 2])
+        assert core.settings_get('test', 'value') == [1, 2]
+
+    assert core.settings_get('test', 'value') == [1, 2]
+
+    # Cached value must not be affected by mutation of returned value
+    core.settings_get('test', 'value').append(3)
+    assert core.settings_get('test', 'value') == [1, 2]
+
+    with transaction.manager:
+        core.settings_set('test', 'value', 'changed')
+    assert core.settings_get('test', 'value') == 'changed'
+
+    with transaction.manager:
+        core.settings_delete('test', 'value')
+    assert not core.settings_exists('test', 'value')
+
+
+def test_settings_abort(core):
+    with transaction.manager:
+        core.settings_set('test', 'value', 'committed')
+
+    with transaction.manager as t:
+        core.settings_set('test', 'value', 'aborted')
+        assert core.settings_get('test', 'value') == 'aborted'
+        t.abort()
+
+    assert core.settings_get('test', 'value') == 'committed'
@@ -1,8 +1,17 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
+import os
+import os.path
+from itertools import groupby
 
+import transaction
+from PIL import Image
+
+from ..lib.config import Option
 from ..component import Component, require
+from ..file_storage import FileObj
 from .model import Base
+from .thumbnail import parse_size, image_orientation, render_thumbnail
 
 __all__ = ['FeatureAttachmentComponent', ]
 
@@ -15,6 +24,96 @@ class FeatureAttachmentComponent(Component):
     def initialize(self):
         from . import extension # NOQA
 
+        self.path = self.options['path'] or self.env.core.gtsdir(self)
+        self.thumbnail_sizes = [parse_size(v) for v in self.options['thumbnail.sizes']]
+
+    def initialize_db(self):
+        if 'path' not in self.options:
+            self.env.core.mksdir(self)
+
     def setup_pyramid(self, config):
         from . import api
         api.setup_pyramid(self, config)
+
+    def thumbnail_filename(self, fileobj, size=None, makedirs=False):
+        uuid = fileobj.uuid
+        path = os.path.join(self.path, 'thumbnail', uuid[0:2], uuid[2:4])
+
+        if makedirs and not os.path.isdir(path):
+            try:
+                os.makedirs(path)
+            except OSError:
+                if not os.path.isdir(path):
+                    raise
+
+        suffix = 'orig' if size is None else '%dx%d' % size
+        return os.path.join(path, '%s.%s' % (uuid, suffix))
+
+    def thumbnail_cached(self, size):
+        """ Only the original image and configured thumbnail sizes are
+        cached, so clients can't fill the disk with arbitrary sizes """
+        return size is None or size in self.thumbnail_sizes
+
+    def thumbnail(self, fileobj, size=None):
+        """ Get the filename of the cached image thumbnail rendering it if
+        it's missing. File storage objects are immutable, so thumbnails
+        are cached by the object's uuid and size. """
+
+        if not self.thumbnail_cached(size):
+            raise ValueError("Thumbnail size %dx%d isn't cached" % size)
+
+        src = self.env.file_storage.filename(fileobj)
+        fn = self.thumbnail_filename(fileobj, size)
+        if not os.path.isfile(fn):
+            # Original image doesn't need to be rendered again
+            if size is None and image_orientation(Image.open(src)) is None:
+                return src
+            render_thumbnail(src, self.thumbnail_filename(fileobj, size, makedirs=True), size)
+        return fn
+
+    def maintenance(self):
+        super(FeatureAttachmentComponent, self).maintenance()
+        self.cleanup()
+
+    def cleanup(self):
+        """ Remove thumbnails of deleted file storage objects """
+
+        self.logger.info("Cleaning up attachment thumbnails...")
+        path = os.path.join(self.path, 'thumbnail')
+
+        deleted = kept = 0
+        for dirpath, dirnames, filenames in os.walk(path, topdown=False):
+            def _uuid(fn):
+                return fn.split('.', 1)[0]
+
+            by_uuid = dict(
+                (uuid, list(fns)) for uuid, fns
+                in groupby(sorted(filenames), key=_uuid))
+
+            if len(by_uuid) > 0:
+                with transaction.manager:
+                    existing = set(uuid for uuid, in FileObj.query().with_entities(
+                        FileObj.uuid
+                    ).filter(
+                        FileObj.component == self.identity,
+                        FileObj.uuid.in_(list(by_uuid.keys()))))
+
+                for uuid, fns in by_uuid.items():
+                    if uuid in existing:
+                        kept += len(fns)
+                        continue
+                    for fn in fns:
+                        os.remove(os.path.join(dirpath, fn))
+                        deleted += 1
+
+            if dirpath != path and len(os.listdir(dirpath)) == 0:
+                os.rmdir(dirpath)
+
+        self.logger.info("Thumbnails deleted: %d, preserved: %d", deleted, kept)
+
+    option_annotations = (
+        Option('path', default=None),
+        Option('thumbnail.sizes', list, default=[],
+               doc="Thumbnail sizes (like 128x128) rendered on image upload "
+               "and cached, other sizes are rendered on each request."),
+    )
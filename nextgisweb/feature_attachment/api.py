@@ -1,19 +1,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
 import json
-from io import BytesIO
+from six import BytesIO
 
-from PIL import Image
+from pyramid.httpexceptions import HTTPNotModified
 from pyramid.response import Response, FileResponse
 
-from ..resource import DataScope, resource_factory
+from ..resource import DataScope, ValidationError, resource_factory
 from ..env import env
 from ..models import DBSession
+from ..feature_layer import IVersionedFeatureLayer
 from ..feature_layer.exception import FeatureNotFound
 
 from .exception import AttachmentNotFound
-from .exif import EXIF_ORIENTATION_TAG, ORIENTATIONS
 from .model import FeatureAttachment
+from .thumbnail import parse_size, thumbnail_image
+from .util import _
 
 
 def attachment_or_not_found(resource_id, feature_id, attachment_id):
@@ -30,6 +32,12 @@ def attachment_or_not_found(resource_id, feature_id, attachment_id):
     return obj
 
 
+def _feature_changed(resource, feature_id):
+    # Attachments are a part of feature data for versioned layers
+    if IVersionedFeatureLayer.providedBy(resource):
+        resource.feature_changed(feature_id)
+
+
 def download(resource, request):
     request.resource_permission(DataScope.read)
 
@@ -50,31 +58,31 @@ def image(resource, request):
         attachment_id=int(request.matchdict['aid'])
     )
 
-    image = Image.open(env.file_storage.filename(obj.fileobj))
-    ext = image.format
-
-    exif = None
-    try:
-        exif = image._getexif()
-    except Exception:
-        pass
-
-    if exif is not None:
-        otag = exif.get(EXIF_ORIENTATION_TAG)
-        if otag in (3, 6, 8):
-            orientation = ORIENTATIONS.get(otag)
-            image = image.transpose(orientation.degrees)
-
     if 'size' in request.GET:
-        image.thumbnail(
-            list(map(int, request.GET['size'].split('x'))),
-            Image.ANTIALIAS)
-
-    buf = BytesIO()
-    image.save(buf, ext)
-    buf.seek(0)
-
-    return Response(body_file=buf, content_type=obj.mime_type)
+        try:
+            size = parse_size(request.GET['size'])
+        except ValueError:
+            raise ValidationError(_("Invalid image size."))
+    else:
+        size = None
+
+    # Attachment file can't be changed, a new file storage object is
+    # created instead, so its uuid identifies the image.
+    etag = '%s-%s' % (obj.fileobj.uuid, 'orig' if size is None else '%dx%d' % size)
+    if etag in request.if_none_match:
+        return HTTPNotModified(etag=etag)
+
+    comp = env.feature_attachment
+    if comp.thumbnail_cached(size):
+        fn = comp.thumbnail(obj.fileobj, size)
+        response = FileResponse(fn, content_type=obj.mime_type, request=request)
+    else:
+        image, fmt = thumbnail_image(env.file_storage.filename(obj.fileobj), size)
+        buf = BytesIO()
+        image.save(buf, fmt)
+        response = Response(buf.getvalue(), content_type=obj.mime_type)
+    response.etag = etag
+    return response
 
 
 def iget(resource, request):
@@ -100,6 +108,7 @@ def idelete(resource, request):
     )
 
     DBSession.delete(obj)
+    _feature_changed(resource, obj.feature_id)
 
     return Response(
         json.dumps(None),
@@ -118,6 +127,7 @@ def iput(resource, request):
     obj.deserialize(request.json_body)
 
     DBSession.flush()
+    _feature_changed(resource, obj.feature_id)
 
     return Response(
         json.dumps(dict(id=obj.id)),
@@ -159,6 +169,7 @@ def cpost(resource, request):
 
     DBSession.add(obj)
     DBSession.flush()
+    _feature_changed(resource, feature.id)
 
     return Response(
         json.dumps(dict(id=obj.id)),
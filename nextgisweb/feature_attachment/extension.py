@@ -13,13 +13,22 @@ class FeatureAttachmentExtension(FeatureExtension):
     editor_widget = "ngw-feature-attachment/EditorWidget"
     display_widget = "ngw-feature-attachment/DisplayWidget"
 
-    def serialize(self, feature):
-        query = FeatureAttachment.filter_by(
-            resource_id=self.layer.id,
-            feature_id=feature.id)
-
-        result = list(map(lambda itm: itm.serialize(), query))
-        return result if len(result) > 0 else None
+    def serialize_many(self, features):
+        result = dict((feature.id, None) for feature in features)
+        if len(result) == 0:
+            return result
+
+        query = FeatureAttachment.filter(
+            FeatureAttachment.resource_id == self.layer.id,
+            FeatureAttachment.feature_id.in_(list(result.keys())),
+        ).order_by(FeatureAttachment.id)
+
+        for itm in query:
+            if result[itm.feature_id] is None:
+                result[itm.feature_id] = list()
+            result[itm.feature_id].append(itm.serialize())
+
+        return result
 
     def deserialize(self, feature, data):
         if data is None:
@@ -1,9 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
-import io
-
 from collections import OrderedDict
-from shutil import copyfileobj
 
 from .. import db
 from ..env import env
@@ -51,15 +48,22 @@ class FeatureAttachment(Base):
                 component='feature_attachment')
 
             srcfile, _ = env.file_upload.get_filename(file_upload['id'])
-            dstfile = env.file_storage.filename(self.fileobj, makedirs=True)
-
-            with io.open(srcfile, 'rb') as fs, io.open(dstfile, 'wb') as fd:
-                copyfileobj(fs, fd)
+            env.file_storage.write_file(self.fileobj, srcfile)
 
             for k in ('name', 'mime_type', 'size'):
                 if k in file_upload:
                     setattr(self, k, file_upload[k])
 
+            if self.is_image:
+                comp = env.feature_attachment
+                for size in comp.thumbnail_sizes:
+                    try:
+                        comp.thumbnail(self.fileobj, size)
+                    except Exception:
+                        comp.logger.warning(
+                            "Failed to render thumbnail for %s", self.fileobj.uuid,
+                            exc_info=True)
+
         for k in ('name', 'mime_type', 'description'):
             if k in data:
                 setattr(self, k, data[k])
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import six
+
+import pytest
+from PIL import Image
+
+from nextgisweb.feature_attachment.thumbnail import (
+    parse_size, render_thumbnail, thumbnail_image)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('128x128', (128, 128)),
+    ('640x480', (640, 480)),
+    ('0x10', None),
+    ('128', None),
+])
+def test_parse_size(value, expected):
+    if expected is None:
+        with pytest.raises(ValueError):
+            parse_size(value)
+    else:
+        assert parse_size(value) == expected
+
+
+@pytest.mark.parametrize('fmt', ['JPEG', 'PNG'])
+def test_render_thumbnail(fmt, tmp_path):
+    src = six.text_type(tmp_path / 'src')
+    Image.new('RGB', (1600, 1200), (255, 0, 0)).save(src, fmt)
+
+    dst = six.text_type(tmp_path / 'dst')
+    render_thumbnail(src, dst, (200, 200))
+
+    image = Image.open(dst)
+    assert image.format == fmt
+    assert image.size == (200, 150)
+
+    # No temporary files left
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['dst', 'src']
+
+
+def test_thumbnail_image(tmp_path):
+    src = six.text_type(tmp_path / 'src')
+    Image.new('RGB', (1600, 1200), (255, 0, 0)).save(src, 'PNG')
+
+    image, fmt = thumbnail_image(src, (100, 100))
+    assert fmt == 'PNG'
+    assert image.size == (100, 75)
+
+    # Nothing is written
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['src']
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import os
+from uuid import uuid4
+
+from PIL import Image
+
+from .exif import EXIF_ORIENTATION_TAG, ORIENTATIONS
+
+
+def parse_size(value):
+    """ Parse thumbnail size in WIDTHxHEIGHT format """
+
+    width, height = map(int, value.split('x'))
+    if width <= 0 or height <= 0:
+        raise ValueError("Invalid thumbnail size: %s" % value)
+    return width, height
+
+
+def image_orientation(image):
+    try:
+        exif = image._getexif()
+    except Exception:
+        exif = None
+
+    if exif is not None:
+        otag = exif.get(EXIF_ORIENTATION_TAG)
+        if otag in (3, 6, 8):
+            return ORIENTATIONS.get(otag)
+
+    return None
+
+
+def thumbnail_image(src, size=None):
+    """ Open the image from the file src applying EXIF orientation and
+    downscaling it to fit size (if given), returns the image and its
+    format """
+
+    image = Image.open(src)
+    fmt = image.format
+
+    orientation = image_orientation(image)
+    rotated = orientation is not None and orientation.degrees in (
+        Image.ROTATE_90, Image.ROTATE_270)
+
+    if size is not None:
+        # JPEG decoder can downscale image by 1/2, 1/4 or 1/8 while
+        # decoding, which is much faster than decoding the full image.
+        image.draft(image.mode, (size[1], size[0]) if rotated else size)
+
+    if orientation is not None:
+        image = image.transpose(orientation.degrees)
+
+    if size is not None:
+        image.thumbnail(size, Image.ANTIALIAS)
+
+    return image, fmt
+
+
+def render_thumbnail(src, dst, size=None):
+    """ Render the image from the file src into dst, see
+    :py:func:`thumbnail_image`. The file is written atomically, so
+    concurrent renders don't break it. """
+
+    image, fmt = thumbnail_image(src, size)
+
+    tmp = '{}.{}.tmp'.format(dst, uuid4().hex)
+    try:
+        image.save(tmp, fmt)
+        os.rename(tmp, dst)
+    except Exception:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
@@ -14,16 +14,22 @@ class FeatureDescriptionExtension(FeatureExtension):
     editor_widget = 'ngw-feature-description/EditorWidget'
     display_widget = 'ngw-feature-description/DisplayWidget'
 
-    def serialize(self, feature):
-        obj = FeatureDescription.filter_by(
-            resource_id=self.layer.id,
-            feature_id=feature.id
-        ).first()
-
-        if obj is None:
-            return None
-        else:
-            return obj.value
+    def serialize_many(self, features):
+        result = dict((feature.id, None) for feature in features)
+        if len(result) == 0:
+            return result
+
+        query = DBSession.query(
+            FeatureDescription.feature_id, FeatureDescription.value
+        ).filter(
+            FeatureDescription.resource_id == self.layer.id,
+            FeatureDescription.feature_id.in_(list(result.keys())),
+        )
+
+        for feature_id, value in query:
+            result[feature_id] = value
+
+        return result
 
     def deserialize(self, feature, data):
         obj = FeatureDescription.filter_by(
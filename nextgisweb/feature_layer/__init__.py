@@ -1,19 +1,28 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
+import os
+import threading
 from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 
 from ..lib.config import Option
 from ..component import Component, require
+from ..core.notify import ProcessCache
 
 from .feature import Feature, FeatureSet
+from .cache import ResultCache
 from .model import Base, LayerField, LayerFieldsMixin
 from .interface import (
     GEOM_TYPE,
     GEOM_TYPE_OGR,
     FIELD_TYPE,
     FIELD_TYPE_OGR,
+    FIELD_INDEX,
+    GEOM_FORMAT,
     IFeatureLayer,
     IFieldEditableFeatureLayer,
+    IFieldIndexedFeatureLayer,
+    IVersionedFeatureLayer,
     IWritableFeatureLayer,
     IFeatureQuery,
     IFeatureQueryFilter,
@@ -21,8 +30,12 @@ from .interface import (
     IFeatureQueryOrderBy,
     IFeatureQueryLike,
     IFeatureQueryIntersects,
+    IFeatureQueryOrderByDistance,
     IFeatureQueryClipByBox,
     IFeatureQuerySimplify,
+    IFeatureQueryGeomFormat,
+    IFeatureQueryAggregate,
+    IFeatureQueryCluster,
 )
 from .event import on_data_change
 from .extension import FeatureExtension
@@ -38,8 +51,12 @@ __all__ = [
     'GEOM_TYPE_OGR',
     'FIELD_TYPE',
     'FIELD_TYPE_OGR',
+    'FIELD_INDEX',
+    'GEOM_FORMAT',
     'IFeatureLayer',
     'IFieldEditableFeatureLayer',
+    'IFieldIndexedFeatureLayer',
+    'IVersionedFeatureLayer',
     'IWritableFeatureLayer',
     'IFeatureQuery',
     'IFeatureQueryFilter',
@@ -47,8 +64,12 @@ __all__ = [
     'IFeatureQueryOrderBy',
     'IFeatureQueryLike',
     'IFeatureQueryIntersects',
+    'IFeatureQueryOrderByDistance',
     'IFeatureQueryClipByBox',
     'IFeatureQuerySimplify',
+    'IFeatureQueryGeomFormat',
+    'IFeatureQueryAggregate',
+    'IFeatureQueryCluster',
     'on_data_change',
     'query_feature_or_not_found',
 ]
@@ -61,12 +82,41 @@ class FeatureLayerComponent(Component):
     def initialize(self):
         self.FeatureExtension = FeatureExtension
 
+        # Point clusters of layer tiles, see cluster.cluster_tile
+        self.cluster_cache = ProcessCache(
+            self.env.core.notify_listener, 'feature_layer.cluster',
+            maxsize=self.options['cluster.cache_size'])
+
+        # Feature API results of versioned layers, see cache.ResultCache
+        self.result_cache = ResultCache(
+            maxsize=self.options['result_cache.size'],
+            maxweight=self.options['result_cache.memory'],
+            enabled=self.options['result_cache.enabled'])
+
+        self._identify_pool = None
+        self._identify_pool_pid = None
+        self._identify_pool_lock = threading.Lock()
+
     @require('resource')
     def setup_pyramid(self, config):
         from . import view, api
         view.setup_pyramid(self, config)
         api.setup_pyramid(self, config)
 
+    def identify_pool(self):
+        """ Thread pool for fetching features of several layers
+        concurrently. It's shared between requests and created on the
+        first use in each process, as uWSGI workers are forked after
+        application loading. """
+
+        pid = os.getpid()
+        if self._identify_pool_pid != pid:
+            with self._identify_pool_lock:
+                if self._identify_pool_pid != pid:
+                    self._identify_pool = ThreadPool(self.options['identify.threads'])
+                    self._identify_pool_pid = pid
+        return self._identify_pool
+
     def client_settings(self, request):
         editor_widget = OrderedDict()
         for k, ecls in FeatureExtension.registry._dict.items():
@@ -93,7 +143,22 @@ class FeatureLayerComponent(Component):
         Option(
             'identify.attributes', bool, default=True,
             doc="Show attributes in identification."),
+        Option(
+            'identify.threads', int, default=8,
+            doc="Maximum number of layers identified concurrently in separate threads."),
         Option(
             'search.nominatim', bool, default=True,
-            doc="Use Nominatim while searching")
+            doc="Use Nominatim while searching"),
+        Option(
+            'cluster.cache_size', int, default=4096,
+            doc="Maximum number of tiles with feature clusters cached in process memory."),
+        Option(
+            'result_cache.enabled', bool, default=True,
+            doc="Cache feature API results of layers tracking data versions."),
+        Option(
+            'result_cache.size', int, default=1024,
+            doc="Maximum number of feature API results cached in process memory."),
+        Option(
+            'result_cache.memory', int, default=64 * 1024 * 1024,
+            doc="Maximum total size of cached feature API results in bytes."),
     )
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+
+from .. import db
+from .interface import FIELD_TYPE
+
+AGGREGATE_STATS = ('count', 'min', 'max', 'sum', 'avg')
+HISTOGRAM_TYPES = ('equal', 'quantile')
+
+NUMERIC_FIELD_TYPES = (FIELD_TYPE.INTEGER, FIELD_TYPE.BIGINT, FIELD_TYPE.REAL)
+
+# Aggregates available only for numeric fields
+NUMERIC_ONLY = ('sum', 'avg')
+
+
+def aggregate(conn, source, stats=(), distinct=None, histogram=None, bins=10):
+    """ Calculate statistics of values selected by the source query, which
+    has a single column labeled ``value``. Used by feature query
+    implementations, see :py:class:`IFeatureQueryAggregate`. """
+
+    src = source.alias('src')
+    value = src.c.value
+    result = dict()
+
+    if stats:
+        funcs = dict(
+            count=db.func.count, min=db.func.min, max=db.func.max,
+            sum=db.func.sum, avg=db.func.avg)
+        row = conn.execute(db.select([
+            funcs[s](value).label(s) for s in stats])).fetchone()
+        result['stats'] = dict((s, row[s]) for s in stats)
+
+    if distinct:
+        count = db.func.count().label('count')
+        query = db.select([value, count]).group_by(value) \
+            .order_by(db.desc(count), value).limit(distinct)
+        result['distinct'] = [
+            dict(value=row['value'], count=row['count'])
+            for row in conn.execute(query)]
+
+    if histogram == 'equal':
+        result['histogram'] = _histogram_equal(conn, value, bins)
+    elif histogram == 'quantile':
+        result['histogram'] = _histogram_quantile(conn, value, bins)
+
+    return result
+
+
+def _histogram_equal(conn, value, bins):
+    vmin, vmax, count = conn.execute(db.select([
+        db.func.min(value), db.func.max(value), db.func.count(value),
+    ])).fetchone()
+
+    if count == 0:
+        return []
+    elif vmin == vmax:
+        return [dict(min=vmin, max=vmax, count=count)]
+
+    vmin, vmax = float(vmin), float(vmax)
+
+    # WIDTH_BUCKET returns bins + 1 for the upper bound
+    bucket = db.func.least(db.func.width_bucket(
+        db.cast(value, db.Float), vmin, vmax, bins), bins).label('bucket')
+    counts = dict(conn.execute(
+        db.select([bucket, db.func.count()])
+        .where(value.isnot(None)).group_by(bucket)).fetchall())
+
+    step = (vmax - vmin) / bins
+    return [dict(
+        min=vmin + step * i,
+        max=vmin + step * (i + 1) if i < bins - 1 else vmax,
+        count=counts.get(i + 1, 0),
+    ) for i in range(bins)]
+
+
+def _histogram_quantile(conn, value, bins):
+    ranked = db.select([
+        value, db.func.ntile(bins).over(order_by=value).label('bucket'),
+    ]).where(value.isnot(None)).alias('ranked')
+
+    query = db.select([
+        db.func.min(ranked.c.value).label('min'),
+        db.func.max(ranked.c.value).label('max'),
+        db.func.count().label('count'),
+    ]).group_by(ranked.c.bucket).order_by(ranked.c.bucket)
+
+    return [dict(min=row['min'], max=row['max'], count=row['count'])
+            for row in conn.execute(query)]
@@ -1,32 +1,37 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
+import base64
+import io
+import itertools
 import json
 import os
 import re
 import uuid
 import zipfile
-import itertools
+import tempfile
+from shutil import rmtree
+from tempfile import mkdtemp
 from six.moves.urllib.parse import unquote
 
-import tempfile
-import backports.tempfile
+import six
 from collections import OrderedDict
 from datetime import datetime, date, time
 
 from osgeo import ogr, gdal
-from pyproj import CRS
 from pyramid.response import Response, FileResponse
-from pyramid.httpexceptions import HTTPNoContent
+from pyramid.httpexceptions import HTTPNoContent, HTTPNotModified
 from sqlalchemy.orm.exc import NoResultFound
 
 from ..geometry import (
     geom_from_geojson, geom_to_geojson,
     geom_from_wkt, geom_to_wkt,
-    geom_transform, box,
+    geom_transform_with, box,
 )
+from ..env import env
 from ..resource import DataScope, ValidationError, Resource, resource_factory
 from ..resource.exception import ResourceNotFound
 from ..spatial_ref_sys import SRS
+from ..jobs.api import job_response
 from .. import geojson
 
 from .interface import (
@@ -35,21 +40,43 @@ from .interface import (
     IWritableFeatureLayer,
     IFeatureQueryClipByBox,
     IFeatureQuerySimplify,
-    FIELD_TYPE)
+    IFeatureQueryGeomFormat,
+    IFeatureQueryAggregate,
+    IFeatureQueryCluster,
+    IFeatureQueryOrderByDistance,
+    IVersionedFeatureLayer,
+    FIELD_TYPE,
+    GEOM_TYPE,
+    GEOM_FORMAT)
+from .aggregate import AGGREGATE_STATS, HISTOGRAM_TYPES, NUMERIC_FIELD_TYPES, NUMERIC_ONLY
+from .cluster import CLUSTER_FUNCTIONS, cluster_tile, cluster_ogr_layer
+from .geomformat import BINARY_FORMATS, PRECISION_MAX, TWKB_PRECISION_MAX, geom_encode
 from .feature import Feature
 from .extension import FeatureExtension
 from .ogrdriver import EXPORT_FORMAT_OGR
 from .exception import FeatureNotFound
+from .job import ExportJob
 from .util import _
 
 
 PERM_READ = DataScope.read
 PERM_WRITE = DataScope.write
 
+BUF_SIZE = 1024 * 1024
+EXPORT_BATCH_SIZE = 1000
+SERIALIZE_BATCH_SIZE = 1000
+AGGREGATE_DISTINCT_MAX = 1000
+AGGREGATE_BINS_MAX = 100
+NEAREST_LIMIT_MAX = 100
+CHANGES_LIMIT_DEFAULT = 1000
+CHANGES_LIMIT_MAX = 10000
 
-def _ogr_memory_ds():
-    return gdal.GetDriverByName(b'Memory').Create(
-        b'', 0, 0, 0, gdal.GDT_Unknown)
+# Request headers of dojo/store/JsonRest affecting store results
+STORE_HEADERS = ('range', 'x-field-prefix', 'x-field-list', 'x-feature-box')
+
+CLUSTER_GEOM_TYPES = (
+    GEOM_TYPE.POINT, GEOM_TYPE.MULTIPOINT,
+    GEOM_TYPE.POINTZ, GEOM_TYPE.MULTIPOINTZ)
 
 
 def _ogr_ds(driver, options):
@@ -94,12 +121,12 @@ def export(request):
     srs = int(
         request.GET.get("srs", request.context.srs.id)
     )
-    srs = SRS.filter_by(id=srs).one()
     fid = request.GET.get("fid")
     format = request.GET.get("format")
     encoding = request.GET.get("encoding")
     zipped = request.GET.get("zipped", "true")
     zipped = zipped.lower() == "true"
+    precision = _precision(request)
 
     if format is None:
         raise ValidationError(
@@ -111,6 +138,45 @@ def export(request):
             _("Format '%s' is not supported.") % (format,)
         )
 
+    if request.GET.get("async", "false").lower() == "true":
+        job = ExportJob.submit(
+            user=request.user, resource_id=request.context.id,
+            srs=srs, fid=fid, format=format, encoding=encoding, zipped=zipped,
+            precision=precision)
+        return job_response(request, job)
+
+    driver = EXPORT_FORMAT_OGR[format]
+    tmp_dir = mkdtemp()
+    try:
+        filename = export_ogr(
+            request.context, tmp_dir, srs=srs, fid=fid, format=format,
+            encoding=encoding, precision=precision)
+
+        if zipped or not driver.single_file:
+            # Temporary directory is removed by the iterator
+            response = Response(
+                app_iter=_zip_stream(tmp_dir, cleanup=True),
+                content_type="application/zip")
+            response.content_disposition = "attachment; filename=%s.zip" % filename
+            tmp_dir = None
+        else:
+            # Opened file remains available after removal
+            response = FileResponse(
+                os.path.join(tmp_dir, filename),
+                content_type=driver.mime or "application/octet-stream")
+            response.content_disposition = "attachment; filename=%s" % filename
+        return response
+    finally:
+        if tmp_dir is not None:
+            rmtree(tmp_dir)
+
+
+def export_ogr(resource, path, srs, fid, format, encoding, precision=None):
+    """ Export features of the layer into the directory writing them
+    directly from the feature query, returns the file name. Coordinates
+    are rounded to ``precision`` decimal digits if it's given. """
+
+    srs = SRS.filter_by(id=srs).one()
     driver = EXPORT_FORMAT_OGR[format]
 
     # layer creation options
@@ -119,52 +185,160 @@ def export(request):
     if encoding is not None:
         lco.append("ENCODING=%s" % encoding)
 
-    query = request.context.feature_query()
+    if precision is not None and driver.name == "GeoJSON":
+        lco.append("COORDINATE_PRECISION=%d" % precision)
+
+    filename = "%d.%s" % (
+        resource.id,
+        driver.extension,
+    )
+
+    # Features are transformed and encoded into WKB by the database
+    query = resource.feature_query()
     query.geom()
+    query.srs(srs)
+    geom_encoded = IFeatureQueryGeomFormat.providedBy(query)
+    if geom_encoded:
+        query.geom_format(GEOM_FORMAT.WKB, precision)
+
+    ogr_ds = ogr.GetDriverByName(str(driver.name)).CreateDataSource(
+        os.path.join(path, filename))
+    ogr_layer = resource.to_ogr(
+        ogr_ds, name=str(resource.id), fid=fid, srs=srs, options=lco)
+    layer_defn = ogr_layer.GetLayerDefn()
 
-    ogr_ds = _ogr_memory_ds()
-    ogr_layer = _ogr_layer_from_features(  # NOQA: 841
-        request.context, query(), ds=ogr_ds, fid=fid)
+    # Fields are created by to_ogr in order of layer fields followed by the
+    # FID field, but drivers can truncate or launder their names (like
+    # Shapefile does), so values are set by index.
+    keynames = [field.keyname for field in resource.fields]
+    if fid is not None:
+        keynames.append(fid)
+    if layer_defn.GetFieldCount() == len(keynames):
+        field_index = dict((k, i) for i, k in enumerate(keynames))
+    else:
+        # Drivers can skip unsupported fields (like DXF does)
+        field_index = dict(
+            (six.ensure_text(layer_defn.GetFieldDefn(i).GetName()), i)
+            for i in range(layer_defn.GetFieldCount()))
+    preserve_fid = driver.fid_support and fid is None
+
+    # Write in batches of features for drivers like GPKG, which are
+    # extremely slow without transactions
+    transactions = ogr_ds.TestCapability(ogr.ODsCTransactions)
+    idx = -1
+    for idx, feature in enumerate(query()):
+        if transactions and idx % EXPORT_BATCH_SIZE == 0:
+            if idx > 0:
+                ogr_ds.CommitTransaction()
+            ogr_ds.StartTransaction()
+
+        ogr_feature = ogr.Feature(layer_defn)
+        if preserve_fid:
+            ogr_feature.SetFID(feature.id)
+        if geom_encoded:
+            if feature.geom_encoded is not None:
+                ogr_feature.SetGeometry(ogr.CreateGeometryFromWkb(feature.geom_encoded))
+        elif feature.geom is not None:
+            ogr_feature.SetGeometry(ogr.CreateGeometryFromWkb(
+                geom_encode(feature.geom, GEOM_FORMAT.WKB, precision)))
+
+        for k, v in feature.fields.items():
+            if k in field_index:
+                ogr_feature[field_index[k]] = v
+
+        if fid is not None and fid in field_index:
+            ogr_feature[field_index[fid]] = feature.id
+
+        if ogr_layer.CreateFeature(ogr_feature) != 0:
+            raise RuntimeError(gdal.GetLastErrorMsg())
+
+    if transactions and idx >= 0:
+        ogr_ds.CommitTransaction()
+
+    # Close the datasource to flush data
+    ogr_layer = ogr_ds = None
+
+    return filename
+
+
+def export_file(resource, tmp_dir, srs, fid, format, encoding, zipped, precision=None):
+    """ Export features of the layer into the file in the given directory,
+    returns the path, the file name and the content type """
 
-    with backports.tempfile.TemporaryDirectory() as tmp_dir:
-        filename = "%d.%s" % (
-            request.context.id,
-            driver.extension,
-        )
+    driver = EXPORT_FORMAT_OGR[format]
 
-        vtopts = [
-            '-f', driver.name,
-            '-t_srs', srs.wkt,
-        ] + list(itertools.chain(*[('-lco', o) for o in lco]))
+    ogr_dir = os.path.join(tmp_dir, 'export')
+    os.mkdir(ogr_dir)
 
-        if driver.fid_support and fid is None:
-            vtopts.append('-preserve_fid')
+    filename = export_ogr(
+        resource, ogr_dir, srs=srs, fid=fid, format=format,
+        encoding=encoding, precision=precision)
 
-        gdal.VectorTranslate(
-            os.path.join(tmp_dir, filename), ogr_ds,
-            options=gdal.VectorTranslateOptions(options=vtopts)
-        )
+    if zipped or not driver.single_file:
+        zip_filename = os.path.join(tmp_dir, "%s.zip" % filename)
+        with io.open(zip_filename, 'wb') as fd:
+            for chunk in _zip_stream(ogr_dir):
+                fd.write(chunk)
+        return zip_filename, "%s.zip" % filename, "application/zip"
+    else:
+        return (
+            os.path.join(ogr_dir, filename), filename,
+            driver.mime or "application/octet-stream")
 
-        if zipped or not driver.single_file:
-            content_type = "application/zip"
-            content_disposition = b"attachment; filename=%s" % ("%s.zip" % (filename,))
-            with tempfile.NamedTemporaryFile(suffix=".zip") as tmp_file:
-                with zipfile.ZipFile(tmp_file, "w", zipfile.ZIP_DEFLATED) as zipf:
-                    for root, dirs, files in os.walk(tmp_dir):
-                        for file in files:
-                            path = os.path.join(root, file)
-                            zipf.write(path, os.path.basename(path))
-                response = FileResponse(tmp_file.name, content_type=content_type)
-                response.content_disposition = content_disposition
-                return response
-        else:
-            content_type = driver.mime or "application/octet-stream"
-            content_disposition = b"attachment; filename=%s" % filename
-            response = FileResponse(
-                os.path.join(tmp_dir, filename), content_type=content_type
-            )
-            response.content_disposition = content_disposition
-            return response
+
+class _ZipBuffer(object):
+    """ Write-only stream for ZipFile without seek() support, so ZIP
+    archive can be streamed as it's produced """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        result = b''.join(self._chunks)
+        self._chunks = []
+        return result
+
+
+def _zip_stream(path, cleanup=False):
+    try:
+        files = sorted(os.listdir(path))
+        if six.PY2:
+            # Python 2 ZipFile requires seekable stream
+            with tempfile.TemporaryFile() as tmp_file:
+                with zipfile.ZipFile(tmp_file, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zipf:
+                    for fn in files:
+                        zipf.write(os.path.join(path, fn), fn)
+                tmp_file.seek(0)
+                for chunk in iter(lambda: tmp_file.read(BUF_SIZE), b''):
+                    yield chunk
+            return
+
+        buf = _ZipBuffer()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zipf:
+            for fn in files:
+                with io.open(os.path.join(path, fn), 'rb') as src, \
+                        zipf.open(fn, 'w', force_zip64=True) as dst:
+                    for chunk in iter(lambda: src.read(BUF_SIZE), b''):
+                        dst.write(chunk)
+                        data = buf.pop()
+                        if len(data) > 0:
+                            yield data
+        yield buf.pop()
+    finally:
+        if cleanup:
+            rmtree(path)
 
 
 def mvt(request):
@@ -187,6 +361,12 @@ def mvt(request):
     # 5% padding by default
     padding = float(request.GET.get("padding", 0.05))
 
+    # Point layers are clustered by grid cells of the given size in pixels
+    cluster_size = request.GET.get("cluster")
+    if cluster_size is not None:
+        cluster_size = _cluster_size(cluster_size)
+    cluster_aggregate = request.GET.get("cluster_aggregate")
+
     bbox = (
         minx - (maxx - minx) * padding,
         miny - (maxy - miny) * padding,
@@ -216,6 +396,15 @@ def mvt(request):
 
         request.resource_permission(PERM_READ, obj)
 
+        if (
+            cluster_size is not None and obj.geometry_type in CLUSTER_GEOM_TYPES
+            and IFeatureQueryCluster.providedBy(obj.feature_query())
+        ):
+            aggregates = _cluster_aggregates(cluster_aggregate, obj)
+            clusters = cluster_tile(obj, z, x, y, cluster_size, aggregates)
+            cluster_ogr_layer(ds, b"ngw:%d" % obj.id, clusters, aggregates)
+            continue
+
         query = obj.feature_query()
         query.intersects(bbox)
         query.geom()
@@ -261,16 +450,64 @@ def mvt(request):
         gdal.Unlink(b"%s" % (vsibuf,))
 
 
+def _cluster_size(value):
+    size = int(value)
+    if not 0 < size <= 256:
+        raise ValidationError(_("Cluster size should be between 1 and 256 pixels."))
+    return size
+
+
+def _cluster_aggregates(value, resource):
+    aggregates = []
+    for item in filter(None, (value or '').split(',')):
+        fn, _sep, keyname = item.partition(':')
+        if fn not in CLUSTER_FUNCTIONS:
+            raise ValidationError(_("Invalid aggregate function: %s.") % fn)
+        try:
+            field = resource.field_by_keyname(keyname)
+        except KeyError:
+            raise ValidationError(_("Field '%s' not found.") % keyname)
+        # Aggregated values are written into MVT as real numbers
+        if field.datatype not in NUMERIC_FIELD_TYPES:
+            raise ValidationError(
+                _("Aggregate '%s' is available only for numeric fields.") % fn)
+        aggregates.append((fn, keyname))
+    return aggregates
+
+
+def cluster(resource, request):
+    request.resource_permission(PERM_READ)
+
+    if not IFeatureQueryCluster.providedBy(resource.feature_query()):
+        raise ValidationError(_("Feature clustering is not supported by the layer."))
+
+    z = int(request.GET["z"])
+    x = int(request.GET["x"])
+    y = int(request.GET["y"])
+    size = _cluster_size(request.GET.get("size", 64))
+    aggregates = _cluster_aggregates(request.GET.get("aggregate"), resource)
+    geom_format = request.GET.get("geom_format", 'wkt').lower()
+
+    result = []
+    for c in cluster_tile(resource, z, x, y, size, aggregates):
+        result.append(OrderedDict((
+            ('id', c['id']), ('count', c['count']),
+            ('geom', geom_to_geojson(c['geom']) if geom_format == 'geojson'
+             else geom_to_wkt(c['geom'])),
+            ('fields', c['fields']),
+        )))
+
+    return Response(
+        json.dumps(result, cls=geojson.Encoder),
+        content_type='application/json', charset='utf-8')
+
+
 def get_transformer(srs_from_id, srs_to_id):
-    if srs_from_id is None or srs_to_id is None or srs_from_id == srs_to_id:
+    if srs_from_id is None or srs_to_id is None or int(srs_from_id) == int(srs_to_id):
         return None
 
-    srs_from = SRS.filter_by(id=int(srs_from_id)).one()
-    srs_to = SRS.filter_by(id=int(srs_to_id)).one()
-    crs_from = CRS.from_wkt(srs_from.wkt)
-    crs_to = CRS.from_wkt(srs_to.wkt)
-
-    return lambda g: geom_transform(g, crs_from, crs_to)
+    transformer = env.spatial_ref_sys.transformer(srs_from_id, srs_to_id)
+    return lambda g: geom_transform_with(g, transformer)
 
 
 def deserialize(feat, data, geom_format='wkt', transformer=None):
@@ -329,17 +566,20 @@ def deserialize(feat, data, geom_format='wkt', transformer=None):
                 ext.deserialize(feat, data['extensions'][cls.identity])
 
 
-def serialize(feat, keys=None, geom_format='wkt', extensions=[]):
+def serialize(feat, keys=None, geom_format='wkt', extensions=[], extension_data=None,
+              precision=None):
     result = OrderedDict(id=feat.id)
 
-    if feat.geom is not None:
-        if geom_format == 'wkt':
-            geom = geom_to_wkt(feat.geom)
-        elif geom_format == 'geojson':
-            geom = geom_to_geojson(feat.geom)
-        else:
+    # Geometry is encoded by the layer for queries which support it
+    geom = feat.geom_encoded
+    if geom is None and feat.geom is not None:
+        if geom_format not in (GEOM_FORMAT.WKT, GEOM_FORMAT.GEOJSON, GEOM_FORMAT.WKB):
             raise ValidationError(_("Geometry format '%s' is not supported.") % geom_format)
+        geom = geom_encode(feat.geom, geom_format, precision)
 
+    if geom is not None:
+        if geom_format in BINARY_FORMATS:
+            geom = base64.b64encode(geom).decode('ascii')
         result['geom'] = geom
 
     result['fields'] = OrderedDict()
@@ -380,11 +620,77 @@ def serialize(feat, keys=None, geom_format='wkt', extensions=[]):
 
     result['extensions'] = OrderedDict()
     for identity, ext in extensions:
-        result['extensions'][identity] = ext.serialize(feat)
+        if extension_data is not None:
+            result['extensions'][identity] = extension_data[identity][feat.id]
+        else:
+            result['extensions'][identity] = ext.serialize(feat)
 
     return result
 
 
+def serialize_many(features, keys=None, geom_format='wkt', extensions=[], precision=None):
+    """ Serialize features loading extension data in batches, so it
+    takes a query per batch and extension instead of per feature """
+
+    features = iter(features)
+    while True:
+        batch = list(itertools.islice(features, SERIALIZE_BATCH_SIZE))
+        if len(batch) == 0:
+            break
+
+        extension_data = dict(
+            (identity, ext.serialize_many(batch))
+            for identity, ext in extensions)
+
+        for feat in batch:
+            yield serialize(
+                feat, keys, geom_format=geom_format, extensions=extensions,
+                extension_data=extension_data, precision=precision)
+
+
+def _geom_format(request):
+    """ Geometry format and coordinate precision from request parameters """
+
+    geom_format = request.GET.get('geom_format', GEOM_FORMAT.WKT).lower()
+    if geom_format not in GEOM_FORMAT.enum:
+        raise ValidationError(_("Geometry format '%s' is not supported.") % geom_format)
+
+    precision = _precision(request, maximum=(
+        TWKB_PRECISION_MAX if geom_format == GEOM_FORMAT.TWKB else PRECISION_MAX))
+
+    return geom_format, precision
+
+
+def _precision(request, maximum=PRECISION_MAX):
+    """ Number of decimal digits to round coordinates to, if requested """
+
+    precision = request.GET.get('precision')
+    if precision is None:
+        return None
+
+    try:
+        precision = int(precision)
+    except ValueError:
+        precision = -1
+
+    if not 0 <= precision <= maximum:
+        raise ValidationError(_("Precision should be between 0 and %d.") % maximum)
+
+    return precision
+
+
+def _query_geom(query, geom_format, precision):
+    """ Select feature geometries encoded by the layer if it's supported,
+    otherwise they are encoded while serializing """
+
+    query.geom()
+    if IFeatureQueryGeomFormat.providedBy(query):
+        query.geom_format(geom_format, precision)
+    elif geom_format == GEOM_FORMAT.TWKB:
+        raise ValidationError(
+            _("Geometry format '%s' is not supported by the layer.") % geom_format)
+
+
 def query_feature_or_not_found(query, resource_id, feature_id):
     """ Query one feature by id or return FeatureNotFound exception. """
 
@@ -399,9 +705,12 @@ def query_feature_or_not_found(query, resource_id, feature_id):
 
 def iget(resource, request):
     request.resource_permission(PERM_READ)
+    return _cached_json(resource, request, lambda: _iget(resource, request))
 
+
+def _iget(resource, request):
     geom_skip = request.GET.get("geom", 'yes').lower() == 'no'
-    geom_format = request.GET.get("geom_format", 'wkt').lower()
+    geom_format, precision = _geom_format(request)
     srs = request.GET.get("srs")
     extensions = _extensions(request.GET.get("extensions"), resource)
 
@@ -409,20 +718,21 @@ def iget(resource, request):
     if not geom_skip:
         if srs is not None:
             query.srs(SRS.filter_by(id=int(srs)).one())
-        query.geom()
+        _query_geom(query, geom_format, precision)
 
     feature = query_feature_or_not_found(query, resource.id, int(request.matchdict['fid']))
 
-    result = serialize(feature, geom_format=geom_format, extensions=extensions)
-
-    return Response(
-        json.dumps(result, cls=geojson.Encoder),
-        content_type='application/json', charset='utf-8')
+    result = serialize(
+        feature, geom_format=geom_format, extensions=extensions, precision=precision)
+    return json.dumps(result, cls=geojson.Encoder)
 
 
 def item_extent(resource, request):
     request.resource_permission(PERM_READ)
+    return _cached_json(resource, request, lambda: _item_extent(resource, request))
 
+
+def _item_extent(resource, request):
     feature_id = int(request.matchdict['fid'])
     query = resource.feature_query()
     query.srs(SRS.filter_by(id=4326).one())
@@ -436,9 +746,7 @@ def item_extent(resource, request):
         maxLon=maxLon,
         maxLat=maxLat
     )
-    return Response(
-        json.dumps(dict(extent=extent)),
-        content_type='application/json', charset='utf-8')
+    return json.dumps(dict(extent=extent))
 
 
 def iput(resource, request):
@@ -471,21 +779,9 @@ def idelete(resource, request):
     return Response(json.dumps(None), content_type='application/json', charset='utf-8')
 
 
-def cget(resource, request):
-    request.resource_permission(PERM_READ)
-
-    geom_skip = request.GET.get("geom", 'yes') == 'no'
-    geom_format = request.GET.get("geom_format", 'wkt').lower()
-    srs = request.GET.get("srs")
-    extensions = _extensions(request.GET.get("extensions"), resource)
-
-    query = resource.feature_query()
-
-    # Paging
-    limit = request.GET.get('limit')
-    offset = request.GET.get('offset', 0)
-    if limit is not None:
-        query.limit(int(limit), int(offset))
+def _query_filter(resource, request, query):
+    """ Apply attribute, substring and extent filters from request
+    parameters to the feature query """
 
     # Filtering by attributes
     filter_ = []
@@ -507,6 +803,34 @@ def cget(resource, request):
     if like is not None and IFeatureQueryLike.providedBy(query):
         query.like(like)
 
+    # Filtering by extent
+    wkt = request.GET.get('intersects')
+    if wkt is not None:
+        geom = geom_from_wkt(wkt, srid=resource.srs.id)
+        query.intersects(geom)
+
+
+def cget(resource, request):
+    request.resource_permission(PERM_READ)
+    return _cached_json(resource, request, lambda: _cget(resource, request))
+
+
+def _cget(resource, request):
+    geom_skip = request.GET.get("geom", 'yes') == 'no'
+    geom_format, precision = _geom_format(request)
+    srs = request.GET.get("srs")
+    extensions = _extensions(request.GET.get("extensions"), resource)
+
+    query = resource.feature_query()
+
+    # Paging
+    limit = request.GET.get('limit')
+    offset = request.GET.get('offset', 0)
+    if limit is not None:
+        query.limit(int(limit), int(offset))
+
+    _query_filter(resource, request, query)
+
     # Ordering
     order_by = request.GET.get('order_by')
     order_by_ = []
@@ -520,13 +844,8 @@ def cget(resource, request):
     if order_by_:
         query.order_by(*order_by_)
 
-    # Filtering by extent
-    wkt = request.GET.get('intersects')
-    if wkt is not None:
-        geom = geom_from_wkt(wkt, srid=resource.srs.id)
-        query.intersects(geom)
-
     # Selected fields
+    keys = [fld.keyname for fld in resource.fields]
     fields = request.GET.get('fields')
     if fields is not None:
         field_list = fields.split(',')
@@ -538,12 +857,189 @@ def cget(resource, request):
     if not geom_skip:
         if srs is not None:
             query.srs(SRS.filter_by(id=int(srs)).one())
-        query.geom()
+        _query_geom(query, geom_format, precision)
+
+        # Simplification tolerance in units of the output SRS
+        simplify = request.GET.get('simplify')
+        if simplify is not None and IFeatureQuerySimplify.providedBy(query):
+            query.simplify(float(simplify))
+
+    result = list(serialize_many(
+        query(), fields, geom_format=geom_format, extensions=extensions,
+        precision=precision))
+    return json.dumps(result, cls=geojson.Encoder)
 
-    result = [
-        serialize(feature, fields, geom_format=geom_format, extensions=extensions)
-        for feature in query()
-    ]
+
+def aggregate(resource, request):
+    request.resource_permission(PERM_READ)
+
+    query = resource.feature_query()
+    if not IFeatureQueryAggregate.providedBy(query):
+        raise ValidationError(_("Feature aggregation is not supported by the layer."))
+
+    keyname = request.GET.get('field')
+    try:
+        field = resource.field_by_keyname(keyname)
+    except KeyError:
+        raise ValidationError(_("Field '%s' not found.") % keyname)
+    numeric = field.datatype in NUMERIC_FIELD_TYPES
+
+    stats = request.GET.get('stats')
+    stats = stats.split(',') if stats else []
+    for s in stats:
+        if s not in AGGREGATE_STATS:
+            raise ValidationError(_("Invalid statistics: %s.") % s)
+        if s in NUMERIC_ONLY and not numeric:
+            raise ValidationError(_("Statistics '%s' is available only for numeric fields.") % s)
+
+    distinct = request.GET.get('distinct')
+    if distinct is not None:
+        distinct = int(distinct)
+        if not 0 < distinct <= AGGREGATE_DISTINCT_MAX:
+            raise ValidationError(_("Number of distinct values should be between 1 and %d.")
+                                  % AGGREGATE_DISTINCT_MAX)
+
+    histogram = request.GET.get('histogram')
+    bins = int(request.GET.get('bins', 10))
+    if histogram is not None:
+        if histogram not in HISTOGRAM_TYPES:
+            raise ValidationError(_("Invalid histogram type: %s.") % histogram)
+        if not numeric:
+            raise ValidationError(_("Histogram is available only for numeric fields."))
+        if not 0 < bins <= AGGREGATE_BINS_MAX:
+            raise ValidationError(_("Number of bins should be between 1 and %d.")
+                                  % AGGREGATE_BINS_MAX)
+
+    _query_filter(resource, request, query)
+
+    result = query.aggregate(
+        keyname, stats=stats, distinct=distinct,
+        histogram=histogram, bins=bins)
+
+    return Response(
+        json.dumps(result, cls=geojson.Encoder),
+        content_type='application/json', charset='utf-8')
+
+
+def nearest(resource, request):
+    """ Features nearest to the geometry (in ``srs``, layer SRS by
+    default) within optional ``distance`` from it, for snapping and
+    identification. Geometries are returned in the same SRS, both the
+    ``distance`` parameter and returned distances are in layer SRS
+    units. """
+
+    request.resource_permission(PERM_READ)
+
+    query = resource.feature_query()
+    if not IFeatureQueryOrderByDistance.providedBy(query):
+        raise ValidationError(_("Nearest features search is not supported by the layer."))
+
+    srs_id = int(request.GET.get('srs', resource.srs_id))
+    try:
+        srs = SRS.filter_by(id=srs_id).one()
+    except NoResultFound:
+        raise ValidationError(_("Spatial reference system %d not found.") % srs_id)
+
+    wkt = request.GET.get('geom')
+    if wkt is None:
+        raise ValidationError(_("Parameter 'geom' is required."))
+    geom = geom_from_wkt(wkt, srid=srs.id)
+
+    geom_format, precision = _geom_format(request)
+
+    limit = int(request.GET.get('limit', 1))
+    if not 0 < limit <= NEAREST_LIMIT_MAX:
+        raise ValidationError(_("Limit should be between 1 and %d.") % NEAREST_LIMIT_MAX)
+
+    distance = request.GET.get('distance')
+    if distance is not None:
+        distance = float(distance)
+
+    query.order_by_distance(geom, max_distance=distance)
+    query.limit(limit)
+    query.srs(srs)
+    _query_geom(query, geom_format, precision)
+
+    result = []
+    for feat in query():
+        item = serialize(feat, geom_format=geom_format, precision=precision)
+        item['distance'] = feat.calculations['distance']
+        result.append(item)
+
+    return Response(
+        json.dumps(result, cls=geojson.Encoder),
+        content_type='application/json', charset='utf-8')
+
+
+def changes(resource, request):
+    """ Features changed after the ``since`` version, so clients can sync
+    only deltas. Changes are returned in pages of ``limit`` records and
+    collapsed by feature, created and updated features are returned in
+    their current state. The ``reset`` flag means that the changes are not
+    available anymore and the layer data should be reloaded. """
+
+    request.resource_permission(PERM_READ)
+
+    if not IVersionedFeatureLayer.providedBy(resource):
+        raise ValidationError(_("Changes are not tracked by the layer."))
+
+    try:
+        since = int(request.GET['since'])
+    except (KeyError, ValueError):
+        raise ValidationError(_("Parameter 'since' should be a version number."))
+
+    limit = int(request.GET.get('limit', CHANGES_LIMIT_DEFAULT))
+    if not 0 < limit <= CHANGES_LIMIT_MAX:
+        raise ValidationError(_("Limit should be between 1 and %d.") % CHANGES_LIMIT_MAX)
+
+    geom_format, precision = _geom_format(request)
+    srs = request.GET.get('srs')
+    extensions = _extensions(request.GET.get('extensions'), resource)
+
+    records = resource.changes(since, limit + 1)
+    if records is None:
+        return Response(
+            json.dumps(dict(version=resource.version, reset=True)),
+            content_type='application/json', charset='utf-8')
+
+    more = len(records) > limit
+    records = records[:limit]
+
+    delete_all = False
+    actions = OrderedDict()
+    for version, action, fid in records:
+        if action == 'delete_all':
+            delete_all = True
+            actions.clear()
+        elif action == 'update' and actions.get(fid) == 'create':
+            pass
+        else:
+            actions[fid] = action
+
+    upsert = [fid for fid, action in six.iteritems(actions) if action != 'delete']
+    features = dict()
+    if len(upsert) > 0:
+        query = resource.feature_query()
+        query.filter(('id', 'in', ','.join(map(str, upsert))))
+        if srs is not None:
+            query.srs(SRS.filter_by(id=int(srs)).one())
+        _query_geom(query, geom_format, precision)
+        for item in serialize_many(
+            query(), geom_format=geom_format, extensions=extensions, precision=precision
+        ):
+            features[item['id']] = item
+
+    # Features missing here were deleted by later changes
+    result = OrderedDict((
+        ('version', records[-1][0] if len(records) > 0 else since),
+        ('more', more), ('reset', False), ('delete_all', delete_all),
+        ('create', [features[fid] for fid, action in six.iteritems(actions)
+                    if action == 'create' and fid in features]),
+        ('update', [features[fid] for fid, action in six.iteritems(actions)
+                    if action == 'update' and fid in features]),
+        ('delete', [fid for fid, action in six.iteritems(actions)
+                    if action == 'delete']),
+    ))
 
     return Response(
         json.dumps(result, cls=geojson.Encoder),
@@ -620,17 +1116,21 @@ def cdelete(resource, request):
 def count(resource, request):
     request.resource_permission(PERM_READ)
 
-    query = resource.feature_query()
-    total_count = query().total_count
+    def _load():
+        total_count = resource.feature_query()().total_count
+        return json.dumps(dict(total_count=total_count))
 
-    return Response(
-        json.dumps(dict(total_count=total_count)),
-        content_type='application/json', charset='utf-8')
+    return _cached_json(resource, request, _load)
 
 
 def store_collection(layer, request):
     request.resource_permission(PERM_READ)
+    return _cached_json(
+        layer, request, lambda: _store_collection(layer, request),
+        *(request.headers.get(h) for h in STORE_HEADERS))
 
+
+def _store_collection(layer, request):
     query = layer.feature_query()
 
     http_range = request.headers.get('range')
@@ -677,14 +1177,40 @@ def store_collection(layer, request):
         result.append(fdata)
 
     headers = dict()
-    headers[str('Content-Type')] = str('application/json')
-
     if http_range:
         total = features.total_count
         last = min(total - 1, last)
         headers[str('Content-Range')] = str('items %d-%s/%d' % (first, last, total))
 
-    return Response(json.dumps(result, cls=geojson.Encoder), headers=headers)
+    return json.dumps(result, cls=geojson.Encoder), headers
+
+
+def _cached_json(resource, request, loader, *key):
+    """ JSON response with the body returned by the loader, optionally
+    with a dict of additional headers. Bodies of versioned layers are
+    cached by data version and request parameters, and ETag is derived
+    from the cache key, see :py:class:`ResultCache`. """
+
+    result_cache = env.feature_layer.result_cache
+    key = result_cache.key(
+        resource, request.matched_route.name, request.matchdict.get('fid'),
+        tuple(sorted(request.GET.items())), *key)
+
+    etag = None
+    if key is not None:
+        etag = result_cache.etag(key)
+        if etag in request.if_none_match:
+            return HTTPNotModified(etag=etag)
+
+    value = result_cache.get(key, loader)
+    body, headers = value if isinstance(value, tuple) else (value, None)
+
+    response = Response(body, content_type='application/json', charset='utf-8')
+    if headers:
+        response.headers.update(headers)
+    if etag is not None:
+        response.etag = etag
+    return response
 
 
 def setup_pyramid(comp, config):
@@ -704,6 +1230,27 @@ def setup_pyramid(comp, config):
         'feature_layer.mvt', '/api/component/feature_layer/mvt') \
         .add_view(mvt, request_method='GET')
 
+    # Should be registered before feature item route
+    config.add_route(
+        'feature_layer.feature.aggregate', '/api/resource/{id}/feature/aggregate',
+        factory=resource_factory) \
+        .add_view(aggregate, context=IFeatureLayer, request_method='GET')
+
+    config.add_route(
+        'feature_layer.feature.cluster', '/api/resource/{id}/feature/cluster',
+        factory=resource_factory) \
+        .add_view(cluster, context=IFeatureLayer, request_method='GET')
+
+    config.add_route(
+        'feature_layer.feature.nearest', '/api/resource/{id}/feature/nearest',
+        factory=resource_factory) \
+        .add_view(nearest, context=IFeatureLayer, request_method='GET')
+
+    config.add_route(
+        'feature_layer.feature.changes', '/api/resource/{id}/feature/changes',
+        factory=resource_factory) \
+        .add_view(changes, context=IFeatureLayer, request_method='GET')
+
     config.add_route(
         'feature_layer.feature.item', '/api/resource/{id}/feature/{fid}',
         factory=resource_factory) \
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import hashlib
+import sys
+
+import six
+import transaction
+
+from ..lib.cache import TTLCache
+
+from .interface import IVersionedFeatureLayer
+
+_NOT_FOUND = object()
+
+
+class ResultCache(object):
+    """ Process-local cache of feature query results of versioned layers,
+    see :py:class:`IVersionedFeatureLayer`. Keys include the layer data
+    version, so results of changed layers are never hit again and get
+    evicted as least recently used. Call :py:meth:`changed` when layer
+    data are modified: the cache is bypassed in the modifying transaction,
+    because its uncommitted version may be rolled back and reused. """
+
+    def __init__(self, maxsize, maxweight, enabled=True):
+        self.enabled = enabled
+        self._data = TTLCache(maxsize=maxsize, maxweight=maxweight, weigher=_weight)
+
+    def key(self, resource, *args):
+        """ Cache key for the layer and query parameters or None if
+        results of the layer can't be cached """
+
+        if not IVersionedFeatureLayer.providedBy(resource):
+            return None
+
+        # Label field isn't a part of layer data, but labels are returned
+        structure = tuple((f.id, f.keyname, f.datatype) for f in resource.fields)
+        return (
+            resource.id, resource.version, resource.srs_id, structure,
+            resource.feature_label_field_id,
+        ) + args
+
+    def etag(self, key):
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def get(self, key, loader):
+        if key is None or not self._enabled():
+            return loader()
+
+        value = self._data.get(key, _NOT_FOUND)
+        if value is _NOT_FOUND:
+            value = loader()
+            self._data.put(key, value)
+        return value
+
+    def changed(self):
+        transaction.get().set_data(self, True)
+
+    def _enabled(self):
+        if not self.enabled:
+            return False
+
+        try:
+            return not transaction.get().data(self)
+        except KeyError:
+            return True
+
+
+def _weight(value):
+    # Approximate size of JSON texts and containers of them
+    if isinstance(value, (six.text_type, six.binary_type)):
+        return len(value)
+    elif isinstance(value, (tuple, list)):
+        return sum(_weight(v) for v in value)
+    return sys.getsizeof(value)
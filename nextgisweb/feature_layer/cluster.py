@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+
+from osgeo import ogr, osr
+
+from ..env import env
+from ..geometry import box
+from ..spatial_ref_sys import SRS
+
+from .event import on_data_change
+
+CLUSTER_FUNCTIONS = ('min', 'max', 'sum', 'avg')
+
+# Nominal tile size in pixels
+TILE_SIZE = 256
+
+
+def cluster_tile(resource, z, x, y, size, aggregates=()):
+    """ Clusters of layer features in the web mercator tile, grid cells are
+    aligned to the tile bounds and have the given size in pixels. Results
+    are cached until layer data are changed. """
+
+    cells = max(1, int(round(TILE_SIZE / size)))
+    aggregates = tuple(aggregates)
+
+    def _load():
+        merc = SRS.filter_by(id=3857).one()
+        minx, miny, maxx, maxy = merc.tile_extent((z, x, y))
+        step = (maxx - minx) / cells
+
+        query = resource.feature_query()
+        query.srs(merc)
+        query.intersects(box(minx, miny, maxx, maxy, srid=merc.id))
+
+        # ST_SnapToGrid rounds to the nearest grid node, so nodes are
+        # shifted by half a cell to put cell bounds onto tile bounds.
+        return query.cluster(
+            step, origin=(minx + step / 2, miny + step / 2),
+            aggregates=aggregates)
+
+    key = (resource.id, z, x, y, cells, aggregates)
+    return env.feature_layer.cluster_cache.get(key, _load)
+
+
+def cluster_ogr_layer(ds, name, clusters, aggregates=()):
+    """ Write clusters into a new OGR layer in web mercator """
+
+    osr_srs = osr.SpatialReference()
+    osr_srs.ImportFromEPSG(3857)
+    ogr_layer = ds.CreateLayer(name, srs=osr_srs, geom_type=ogr.wkbPoint)
+
+    ogr_layer.CreateField(ogr.FieldDefn(b'count', ogr.OFTInteger))
+    ogr_layer.CreateField(ogr.FieldDefn(b'id', ogr.OFTInteger64))
+    labels = ['%s_%s' % a for a in aggregates]
+    for label in labels:
+        ogr_layer.CreateField(ogr.FieldDefn(label.encode('utf-8'), ogr.OFTReal))
+
+    layer_defn = ogr_layer.GetLayerDefn()
+    for cluster in clusters:
+        feature = ogr.Feature(layer_defn)
+        feature.SetGeometry(ogr.CreateGeometryFromWkb(cluster['geom'].wkb))
+        feature[b'count'] = cluster['count']
+        if cluster['id'] is not None:
+            feature[b'id'] = cluster['id']
+        for label in labels:
+            value = cluster['fields'][label]
+            if value is not None:
+                feature[label.encode('utf-8')] = float(value)
+        ogr_layer.CreateFeature(feature)
+
+    return ogr_layer
+
+
+@on_data_change.connect
+def on_data_change_handler(resource, geom):
+    env.feature_layer.cluster_cache.changed()
@@ -13,3 +13,14 @@ class FeatureExtension(object):
     @property
     def layer(self):
         return self._layer
+
+    def serialize(self, feature):
+        """ Serialize extension data of the feature, subclasses should
+        override this method or :py:meth:`serialize_many` """
+        return self.serialize_many([feature, ]).get(feature.id)
+
+    def serialize_many(self, features):
+        """ Serialize extension data of multiple features at once, returns
+        a dictionary keyed by feature id. Subclasses should override it
+        to load the data with a single query. """
+        return dict((feature.id, self.serialize(feature)) for feature in features)
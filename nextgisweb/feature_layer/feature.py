@@ -6,12 +6,14 @@ from osgeo import ogr
 
 class Feature(object):
 
-    def __init__(self, layer=None, id=None, fields=None, geom=None, box=None, calculations=None):
+    def __init__(self, layer=None, id=None, fields=None, geom=None, box=None,
+                 calculations=None, geom_encoded=None):
         self._layer = layer
 
         self._id = int(id) if id is not None else None
 
         self._geom = geom
+        self._geom_encoded = geom_encoded
         self._box = box
 
         self._fields = dict(fields) if fields is not None else dict()
@@ -60,6 +62,12 @@ class Feature(object):
     def geom(self, value):
         self._geom = value
 
+    @property
+    def geom_encoded(self):
+        """ Geometry encoded by the data source, see
+        :py:meth:`IFeatureQueryGeomFormat.geom_format` """
+        return self._geom_encoded
+
     @property
     def box(self):
         return self._box
@@ -93,6 +101,20 @@ class Feature(object):
 
 class FeatureSet(object):
 
+    # Iteration doesn't use the database session, so feature sets can be
+    # fetched concurrently in separate threads
+    concurrent = False
+
+    def union_select(self):
+        """ Select of features from the main database with ``layer_id``,
+        ``id``, ``fields`` (JSON object) and ``rank`` columns. Such selects of
+        different layers are combined with UNION ALL and rows are converted
+        with :py:meth:`union_feature`. Returns ``None`` if not supported. """
+        return None
+
+    def union_feature(self, row):
+        raise NotImplementedError()
+
     def one(self):
         data = list(self.__iter__())
         return data[0]
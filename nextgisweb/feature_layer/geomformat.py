@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import json
+
+import six
+
+from .. import db
+from ..geometry import geom_to_wkt, geom_to_geojson, geom_round
+from .interface import GEOM_FORMAT
+
+BINARY_FORMATS = (GEOM_FORMAT.WKB, GEOM_FORMAT.TWKB)
+
+# Double precision values have no more than 15 significant digits
+PRECISION_MAX = 15
+
+# TWKB stores coordinates as integers scaled by 10^precision
+TWKB_PRECISION_MAX = 7
+
+
+def geom_format_expr(geomexpr, format, precision=None):
+    """ SQL expression encoding the geometry in the format with coordinates
+    rounded to the number of decimal digits. Used by feature query
+    implementations, see :py:class:`IFeatureQueryGeomFormat`. """
+
+    if format == GEOM_FORMAT.GEOJSON:
+        return db.func.st_asgeojson(
+            geomexpr, PRECISION_MAX if precision is None else precision)
+
+    elif format == GEOM_FORMAT.TWKB:
+        return db.func.st_astwkb(
+            geomexpr, TWKB_PRECISION_MAX if precision is None else precision)
+
+    if precision is not None:
+        # Unlike ST_QuantizeCoordinates, snapped coordinates have short
+        # decimal representations and it's available in PostGIS 2.4.
+        geomexpr = db.func.st_snaptogrid(geomexpr, 10 ** -precision)
+
+    if format == GEOM_FORMAT.WKT:
+        return db.func.st_astext(geomexpr)
+    elif format == GEOM_FORMAT.WKB:
+        return db.func.st_asbinary(geomexpr)
+
+    raise ValueError("Unsupported geometry format: %s" % format)
+
+
+def geom_format_value(value, format):
+    """ Convert the result of :py:func:`geom_format_expr` to the value
+    returned in ``Feature.geom_encoded`` """
+
+    if value is None:
+        return None
+    elif format == GEOM_FORMAT.GEOJSON:
+        return json.loads(value)
+    elif format in BINARY_FORMATS:
+        return value.tobytes() if six.PY3 else six.binary_type(value)
+    return value
+
+
+def geom_encode(geom, format, precision=None):
+    """ Encode the geometry object in Python for feature layers which
+    don't support :py:class:`IFeatureQueryGeomFormat` """
+
+    if format == GEOM_FORMAT.WKT:
+        return geom_to_wkt(geom, precision)
+
+    if precision is not None:
+        geom = geom_round(geom, precision)
+
+    if format == GEOM_FORMAT.GEOJSON:
+        return geom_to_geojson(geom)
+    elif format == GEOM_FORMAT.WKB:
+        return geom.wkb
+
+    raise ValueError("Unsupported geometry format: %s" % format)
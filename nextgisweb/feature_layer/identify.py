@@ -3,9 +3,10 @@ from __future__ import division, absolute_import, print_function, unicode_litera
 
 from pyramid.response import Response
 
-from .interface import IFeatureLayer
-from .. import geojson
-from ..geometry import geom_from_wkt
+from .interface import IFeatureLayer, IFeatureQueryOrderByDistance
+from .. import db, geojson
+from ..env import env
+from ..geometry import geom_from_wkt, geom_transform_with
 from ..models import DBSession
 from ..resource import (
     Resource,
@@ -15,6 +16,90 @@ from ..resource import (
 PR_R = ResourceScope.read
 
 
+def _preload_acl(resources):
+    """ Load parents of resources up to the root with their ACL rules,
+    so permission checks don't issue queries per resource """
+
+    ids = [res.id for res in resources]
+    if len(ids) == 0:
+        return
+
+    tab = Resource.__table__
+    cte = db.select([tab.c.id, tab.c.parent_id]).where(
+        tab.c.id.in_(ids)).cte('ancestors', recursive=True)
+    cte = cte.union_all(db.select([tab.c.id, tab.c.parent_id]).where(
+        tab.c.id == cte.c.parent_id))
+
+    DBSession.query(Resource).filter(Resource.id.in_(
+        db.select([cte.c.id]))).options(db.selectinload(Resource.acl)).all()
+
+
+def identify_filter(query, layer, geom):
+    """ Filter features of the query by the click geometry (a box around
+    the click point). If the query supports ordering by distance, features
+    within the tolerance (distance from the box center to its farthest
+    vertex) are selected with the nearest first, otherwise features
+    intersecting the box are selected. """
+
+    if not IFeatureQueryOrderByDistance.providedBy(query):
+        query.intersects(geom)
+        return
+
+    # Maximum distance is given in layer SRS units
+    if geom.srid is not None and geom.srid != layer.srs_id:
+        geom = geom_transform_with(geom, env.spatial_ref_sys.transformer(
+            geom.srid, layer.srs_id))
+
+    center = geom_from_wkt(geom.centroid.wkt, srid=layer.srs_id)
+    query.order_by_distance(center, max_distance=geom.hausdorff_distance(center))
+
+
+def _fetch_features(feature_sets):
+    """ Fetch features of layers: layers in the main database with a single
+    UNION ALL query, concurrent feature sets in separate threads and the
+    rest sequentially. Returns lists of features in the same order. """
+
+    result = [None] * len(feature_sets)
+
+    union = []
+    concurrent = []
+    for idx, fset in enumerate(feature_sets):
+        select = fset.union_select()
+        if select is not None:
+            union.append((idx, select))
+        elif fset.concurrent:
+            concurrent.append(idx)
+
+    async_result = None
+    if len(concurrent) > 0:
+        async_result = env.feature_layer.identify_pool().map_async(
+            lambda idx: list(feature_sets[idx]), concurrent)
+
+    if len(union) > 0:
+        by_layer = dict()
+        for idx, select in union:
+            result[idx] = []
+            by_layer[feature_sets[idx].layer.id] = idx
+
+        query = db.union_all(*[
+            db.select([select.alias()]) for idx, select in union]).alias('u')
+        rows = DBSession.connection().execute(
+            db.select([query]).order_by(query.c.layer_id, query.c.rank))
+        for row in rows:
+            idx = by_layer[row['layer_id']]
+            result[idx].append(feature_sets[idx].union_feature(row))
+
+    for idx, fset in enumerate(feature_sets):
+        if result[idx] is None and idx not in concurrent:
+            result[idx] = list(fset)
+
+    if async_result is not None:
+        for idx, features in zip(concurrent, async_result.get()):
+            result[idx] = features
+
+    return result
+
+
 def identify(request):
     """
     ---
@@ -55,13 +140,15 @@ def identify(request):
     geom = geom_from_wkt(request.json_body['geom'], srid=srs)
     layers = map(int, request.json_body['layers'])
 
-    layer_list = DBSession.query(Resource).filter(Resource.id.in_(layers))
+    layer_list = DBSession.query(Resource).filter(Resource.id.in_(layers)).all()
+    _preload_acl(layer_list)
 
     result = dict()
 
     # Number of features in all layers
     feature_count = 0
 
+    queried = []
     for layer in layer_list:
         if not layer.has_permission(DataScope.read, request.user):
             result[layer.id] = dict(error="Forbidden")
@@ -71,32 +158,37 @@ def identify(request):
 
         else:
             query = layer.feature_query()
-            query.intersects(geom)
+            identify_filter(query, layer, geom)
 
             # Limit number of identifyable features by 10 per layer,
             # otherwise the response might be too big.
             query.limit(10)
 
-            features = [
-                dict(id=f.id, layerId=layer.id,
-                     label=f.label, fields=f.fields)
-                for f in query()
-            ]
+            queried.append((layer, query()))
+
+    fetched = _fetch_features([fset for layer, fset in queried])
+
+    for (layer, fset), layer_features in zip(queried, fetched):
+        features = [
+            dict(id=f.id, layerId=layer.id,
+                 label=f.label, fields=f.fields)
+            for f in layer_features
+        ]
 
-            # Add name of parent resource to identification results,
-            # if there is no way to get layer name by id on the client
-            allow = layer.parent.has_permission(PR_R, request.user)
+        # Add name of parent resource to identification results,
+        # if there is no way to get layer name by id on the client
+        allow = layer.parent.has_permission(PR_R, request.user)
 
-            if allow:
-                for feature in features:
-                    feature['parent'] = layer.parent.display_name
+        if allow:
+            for feature in features:
+                feature['parent'] = layer.parent.display_name
 
-            result[layer.id] = dict(
-                features=features,
-                featureCount=len(features)
-            )
+        result[layer.id] = dict(
+            features=features,
+            featureCount=len(features)
+        )
 
-            feature_count += len(features)
+        feature_count += len(features)
 
     result['featureCount'] = feature_count
 
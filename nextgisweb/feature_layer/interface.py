@@ -73,6 +73,22 @@ class FIELD_TYPE(object):
     enum = (INTEGER, BIGINT, REAL, STRING, DATE, TIME, DATETIME)
 
 
+class FIELD_INDEX(object):
+    BTREE = 'btree'
+    TRIGRAM = 'trigram'
+
+    enum = (BTREE, TRIGRAM)
+
+
+class GEOM_FORMAT(object):
+    WKT = 'wkt'
+    GEOJSON = 'geojson'
+    WKB = 'wkb'
+    TWKB = 'twkb'
+
+    enum = (WKT, GEOJSON, WKB, TWKB)
+
+
 class IFeatureLayer(IResourceBase):
 
     geometry_type = Attribute(""" Layer geometry type GEOM_TYPE """)
@@ -95,6 +111,32 @@ class IFieldEditableFeatureLayer(IFeatureLayer):
         """ Remove field """
 
 
+class IFieldIndexedFeatureLayer(IFeatureLayer):
+    """ Feature layer that supports managed field indexes """
+
+    def field_indexes(self):
+        """ Return a dict of index kinds (see ``FIELD_INDEX``) by field """
+
+    def field_index(self, field, kinds):
+        """ Create missing and drop unlisted indexes of the field """
+
+
+class IVersionedFeatureLayer(IFeatureLayer):
+    """ Feature layer that records data changes """
+
+    version = Attribute(""" Data version incremented by each change """)
+
+    def changes(self, since, limit):
+        """ Return a list of (version, action, feature_id) tuples for changes
+        after the given version ordered by version. Actions are ``create``,
+        ``update``, ``delete`` and ``delete_all`` (without feature_id). None
+        is returned if the changes are not available anymore. """
+
+    def feature_changed(self, feature_id):
+        """ Record a change of feature data stored outside of the layer,
+        for example feature attachments """
+
+
 class IWritableFeatureLayer(IFeatureLayer):
     """ Feature layer that supports writing """
 
@@ -172,6 +214,15 @@ class IFeatureQueryIntersects(IFeatureQuery):
         """ Set query by spatial intersection """
 
 
+class IFeatureQueryOrderByDistance(IFeatureQuery):
+
+    def order_by_distance(self, geom, max_distance=None):
+        """ Order features by distance to the geometry, nearest first.
+        Distance in layer SRS units is returned in ``distance`` feature
+        calculation. Features farther than ``max_distance`` (in layer SRS
+        units too) are skipped if it's given. """
+
+
 class IFeatureQueryClipByBox(IFeatureQuery):
 
     def clip_by_box(self, box):
@@ -182,3 +233,35 @@ class IFeatureQuerySimplify(IFeatureQuery):
 
     def simplify(self, tolerance):
         """ Simplify geometry by the given tolerance """
+
+
+class IFeatureQueryGeomFormat(IFeatureQuery):
+
+    def geom_format(self, format, precision=None):
+        """ Encode geometries in the given format (one of GEOM_FORMAT) by
+        the data source instead of returning geometry objects. Coordinates
+        are rounded to the given number of decimal digits. Encoded values
+        (text, dict for GeoJSON or bytes for binary formats) are returned
+        in ``Feature.geom_encoded``. """
+
+
+class IFeatureQueryAggregate(IFeatureQuery):
+
+    def aggregate(self, keyname, stats=(), distinct=None, histogram=None, bins=10):
+        """ Calculate statistics of the field values for features matching
+        the query filters. Returns a dict with ``stats`` (values of
+        count, min, max, sum or avg), ``distinct`` (the most frequent
+        values with counts) and ``histogram`` (equal interval or quantile
+        bins) keys for requested calculations. """
+
+
+class IFeatureQueryCluster(IFeatureQuery):
+
+    def cluster(self, size, origin=(0, 0), aggregates=()):
+        """ Group features matching the query filters by cells of the
+        regular grid with the given cell size and origin (in query SRS
+        units). Returns a list of clusters as dicts with ``geom`` (centroid
+        point), ``count``, ``id`` (feature ID for single feature clusters)
+        and ``fields`` with values of requested aggregates. Aggregates are
+        ``(function, keyname)`` pairs, where function is one of min, max,
+        sum or avg, and they are named as ``function_keyname``. """
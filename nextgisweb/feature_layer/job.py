@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import backports.tempfile
+
+from ..jobs import JobHandler
+from ..resource import Resource
+
+
+@JobHandler.registry.register
+class ExportJob(JobHandler):
+    identity = 'feature_layer.export'
+
+    def run(self, ctx):
+        from .api import export_file
+
+        params = dict(ctx.params)
+        resource = Resource.filter_by(id=params.pop('resource_id')).one()
+
+        with backports.tempfile.TemporaryDirectory() as tmp_dir:
+            ctx.progress(0, "Exporting features")
+            path, filename, content_type = export_file(resource, tmp_dir, **params)
+            ctx.result_file(path, filename, content_type)
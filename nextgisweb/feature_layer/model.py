@@ -18,7 +18,9 @@ from ..resource.exception import ValidationError
 
 from .interface import (
     FIELD_TYPE,
-    FIELD_TYPE_OGR)
+    FIELD_TYPE_OGR,
+    FIELD_INDEX,
+    IFieldIndexedFeatureLayer)
 
 from .util import _
 
@@ -103,10 +105,13 @@ class LayerFieldsMixin(object):
             post_update=True
         )
 
-    def to_ogr(self, ogr_ds, name=r'', fid=None):
-        srs = osr.SpatialReference()
-        srs.ImportFromEPSG(self.srs.id)
-        ogr_layer = ogr_ds.CreateLayer(name, srs=srs)
+    def to_ogr(self, ogr_ds, name=r'', fid=None, srs=None, options=None):
+        osr_srs = osr.SpatialReference()
+        if srs is None:
+            osr_srs.ImportFromEPSG(self.srs.id)
+        else:
+            osr_srs.ImportFromWkt(srs.wkt)
+        ogr_layer = ogr_ds.CreateLayer(name, srs=osr_srs, options=options or [])
         for field in self.fields:
             ogr_layer.CreateField(
                 ogr.FieldDefn(
@@ -127,13 +132,20 @@ class LayerFieldsMixin(object):
 class _fields_attr(SP):
 
     def getter(self, srlzr):
-        return [OrderedDict((
-                ('id', f.id), ('keyname', f.keyname),
-                ('datatype', f.datatype), ('typemod', None),
-                ('display_name', f.display_name),
-                ('label_field', f == srlzr.obj.feature_label_field),
-                ('grid_visibility', f.grid_visibility)))
-                for f in srlzr.obj.fields]
+        result = [OrderedDict((
+                  ('id', f.id), ('keyname', f.keyname),
+                  ('datatype', f.datatype), ('typemod', None),
+                  ('display_name', f.display_name),
+                  ('label_field', f == srlzr.obj.feature_label_field),
+                  ('grid_visibility', f.grid_visibility)))
+                  for f in srlzr.obj.fields]
+
+        if IFieldIndexedFeatureLayer.providedBy(srlzr.obj):
+            indexes = srlzr.obj.field_indexes()
+            for f, item in zip(srlzr.obj.fields, result):
+                item['index'] = indexes.get(f, [])
+
+        return result
 
     def setter(self, srlzr, value):
         obj = srlzr.obj
@@ -171,6 +183,14 @@ class _fields_attr(SP):
             if fld.get('label_field', False):
                 obj.feature_label_field = mfld
 
+            if 'index' in fld:
+                if not IFieldIndexedFeatureLayer.providedBy(obj):
+                    raise ValidationError(_("Field indexes are not supported by the layer."))
+                for kind in fld['index']:
+                    if kind not in FIELD_INDEX.enum:
+                        raise ValidationError(_("Unknown field index '%s'.") % kind)
+                obj.field_index(mfld, fld['index'])
+
             new_fields.append(mfld)
 
         for mfld in fldmap.values():
@@ -122,7 +122,7 @@ def test_geom_edit(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
     feature_url = '/api/resource/%d/feature/1' % vector_layer_id
 
     feature = ngw_webtest_app.get(feature_url).json
-    assert feature['geom'] == 'POINT (0.0000000000000000 0.0000000000000000)'
+    assert feature['geom'] == 'POINT(0 0)'
 
     feature = ngw_webtest_app.get(feature_url + '?geom_format=geojson').json
     assert feature['geom'] == dict(type='Point', coordinates=[0.0, 0.0])
@@ -130,14 +130,14 @@ def test_geom_edit(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
     feature['geom'] = 'POINT (1 0)'
     ngw_webtest_app.put_json(feature_url, feature)
     feature = ngw_webtest_app.get(feature_url).json
-    assert feature['geom'] == 'POINT (1.0000000000000000 0.0000000000000000)'
+    assert feature['geom'] == 'POINT(1 0)'
 
     feature['geom'] = dict(type='Point', coordinates=[1, 2])
     ngw_webtest_app.put_json(feature_url + '?geom_format=geojson', feature)
     assert feature == ngw_webtest_app.get(feature_url + '?geom_format=geojson').json
 
     feature = ngw_webtest_app.get(feature_url).json
-    assert feature['geom'] == 'POINT (1.0000000000000000 2.0000000000000000)'
+    assert feature['geom'] == 'POINT(1 2)'
 
     feature['geom'] = dict(type='Point', coordinates=[90, 45])
     ngw_webtest_app.put_json(feature_url + '?geom_format=geojson&srs=4326', feature)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import json
+import six
+from uuid import uuid4
+
+import pytest
+import transaction
+from osgeo import ogr
+
+from nextgisweb.models import DBSession
+
+from nextgisweb.vector_layer import VectorLayer
+from nextgisweb.spatial_ref_sys.models import SRS
+from nextgisweb.auth import User
+
+
+VALUES = [(1, 'foo', 0), (1, 'foo', 1), (2, 'foo', 2), (0, 'bar', 3), (-3, 'baz', 4)]
+
+
+@pytest.fixture(scope='module')
+def vector_layer_id(ngw_resource_group):
+    with transaction.manager:
+        obj = VectorLayer(
+            parent_id=ngw_resource_group, display_name='vector_layer',
+            owner_user=User.by_keyname('administrator'),
+            srs=SRS.filter_by(id=3857).one(),
+            tbl_uuid=six.text_type(uuid4().hex),
+        ).persist()
+
+        geojson = {
+            'type': 'FeatureCollection',
+            'features': [{
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [x, 0.0]},
+                'properties': {'int': num, 'string': text},
+            } for num, text, x in VALUES]
+        }
+        dsource = ogr.Open(json.dumps(geojson))
+        layer = dsource.GetLayer(0)
+
+        obj.setup_from_ogr(layer, lambda x: x)
+        obj.load_from_ogr(layer, lambda x: x)
+
+        DBSession.flush()
+        DBSession.expunge(obj)
+
+    yield obj.id
+
+    with transaction.manager:
+        DBSession.delete(VectorLayer.filter_by(id=obj.id).one())
+
+
+def test_stats(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/resource/%d/feature/aggregate' % vector_layer_id
+
+    resp = ngw_webtest_app.get(url, dict(field='int', stats='count,min,max,sum,avg'))
+    assert resp.json['stats'] == dict(count=5, min=-3, max=2, sum=1, avg=pytest.approx(0.2))
+
+    resp = ngw_webtest_app.get(url, dict(field='int', stats='count', fld_string='foo'))
+    assert resp.json['stats'] == dict(count=3)
+
+    resp = ngw_webtest_app.get(url, dict(
+        field='int', stats='max', intersects='POLYGON((2.5 -1,2.5 1,5 1,5 -1,2.5 -1))'))
+    assert resp.json['stats'] == dict(max=0)
+
+    ngw_webtest_app.get(url, dict(field='string', stats='sum'), status=422)
+    ngw_webtest_app.get(url, dict(field='missing', stats='count'), status=422)
+
+
+def test_distinct(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    resp = ngw_webtest_app.get(
+        '/api/resource/%d/feature/aggregate' % vector_layer_id,
+        dict(field='string', distinct=2))
+    assert resp.json['distinct'] == [
+        dict(value='foo', count=3), dict(value='bar', count=1)]
+
+
+def test_histogram(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/resource/%d/feature/aggregate' % vector_layer_id
+
+    resp = ngw_webtest_app.get(url, dict(field='int', histogram='equal', bins=5))
+    assert [b['count'] for b in resp.json['histogram']] == [1, 0, 0, 1, 3]
+    assert resp.json['histogram'][0]['min'] == -3
+    assert resp.json['histogram'][-1]['max'] == 2
+
+    resp = ngw_webtest_app.get(url, dict(field='int', histogram='quantile', bins=2))
+    assert resp.json['histogram'] == [
+        dict(min=-3, max=1, count=3), dict(min=1, max=2, count=2)]
+
+    ngw_webtest_app.get(url, dict(field='string', histogram='equal'), status=422)
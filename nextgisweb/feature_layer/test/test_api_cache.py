@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import json
+import six
+from uuid import uuid4
+
+import pytest
+import transaction
+from osgeo import ogr
+from zope.sqlalchemy import mark_changed
+
+from nextgisweb.models import DBSession
+
+from nextgisweb.vector_layer import VectorLayer
+from nextgisweb.spatial_ref_sys.models import SRS
+from nextgisweb.auth import User
+
+
+@pytest.fixture(scope='module')
+def vector_layer_id(ngw_resource_group):
+    with transaction.manager:
+        obj = VectorLayer(
+            parent_id=ngw_resource_group, display_name='vector_layer',
+            owner_user=User.by_keyname('administrator'),
+            srs=SRS.filter_by(id=3857).one(),
+            tbl_uuid=six.text_type(uuid4().hex),
+        ).persist()
+
+        geojson = {
+            'type': 'FeatureCollection',
+            'features': [{
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [x, 0.0]},
+                'properties': {'name': 'feature%d' % x},
+            } for x in range(3)]
+        }
+        dsource = ogr.Open(json.dumps(geojson))
+        layer = dsource.GetLayer(0)
+
+        obj.setup_from_ogr(layer, lambda x: x)
+        obj.load_from_ogr(layer, lambda x: x)
+
+        DBSession.flush()
+        DBSession.expunge(obj)
+
+    yield obj.id
+
+    with transaction.manager:
+        DBSession.delete(VectorLayer.filter_by(id=obj.id).one())
+
+
+def test_cache(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/resource/%d/feature/' % vector_layer_id
+
+    resp = ngw_webtest_app.get(url, dict(fields='name'))
+    etag = resp.headers['ETag']
+    assert len(resp.json) == 3
+
+    ngw_webtest_app.get(url, dict(fields='name'), headers={
+        'If-None-Match': etag}, status=304)
+
+    # Data changed bypassing the layer aren't visible until the next version
+    with transaction.manager:
+        obj = VectorLayer.filter_by(id=vector_layer_id).one()
+        DBSession.execute("UPDATE vector_layer.%s SET fld_%s = 'direct'" % (
+            obj._tablename, obj.fields[0].fld_uuid))
+        mark_changed(DBSession())
+
+    resp = ngw_webtest_app.get(url, dict(fields='name'))
+    assert resp.headers['ETag'] == etag
+    assert 'direct' not in [f['fields']['name'] for f in resp.json]
+
+    ngw_webtest_app.post_json(url, dict(geom='POINT (5 0)', fields=dict(name='new')))
+
+    resp = ngw_webtest_app.get(url, dict(fields='name'))
+    assert resp.headers['ETag'] != etag
+    names = [f['fields']['name'] for f in resp.json]
+    assert len(names) == 4 and 'direct' in names
+
+    resp = ngw_webtest_app.get('/api/resource/%d/feature_count' % vector_layer_id)
+    assert resp.json['total_count'] == 4
+    count_etag = resp.headers['ETag']
+    assert count_etag != etag
+
+    ngw_webtest_app.delete(url + '1')
+    resp = ngw_webtest_app.get('/api/resource/%d/feature_count' % vector_layer_id, headers={
+        'If-None-Match': count_etag})
+    assert resp.json['total_count'] == 3
+
+
+def test_cache_label_field(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/resource/%d/store/' % vector_layer_id
+
+    resp = ngw_webtest_app.get(url)
+    etag = resp.headers['ETag']
+
+    with transaction.manager:
+        obj = VectorLayer.filter_by(id=vector_layer_id).one()
+        obj.feature_label_field = obj.fields[0]
+
+    resp = ngw_webtest_app.get(url)
+    assert resp.headers['ETag'] != etag
+    assert all(item['label'] == item['name'] for item in resp.json)
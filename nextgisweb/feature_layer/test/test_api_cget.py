@@ -14,6 +14,7 @@ from nextgisweb.models import DBSession
 from nextgisweb.vector_layer import VectorLayer
 from nextgisweb.spatial_ref_sys.models import SRS
 from nextgisweb.auth import User
+from nextgisweb.feature_description import FeatureDescription
 
 
 check_list = [
@@ -104,3 +105,26 @@ def test_cget_extensions(ngw_webtest_app, vector_layer_id, ngw_auth_administrato
 
     resp = ngw_webtest_app.get('/api/resource/%d/feature/?extensions=description,attachment' % vector_layer_id)
     assert resp.json[0]['extensions'] == dict(description=None, attachment=None)
+
+
+def test_cget_extensions_batch(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    with transaction.manager:
+        for fid in (1, 3):
+            FeatureDescription(
+                resource_id=vector_layer_id, feature_id=fid,
+                value='description %d' % fid).persist()
+
+    try:
+        resp = ngw_webtest_app.get(
+            '/api/resource/%d/feature/?extensions=description' % vector_layer_id)
+        descriptions = dict(
+            (f['id'], f['extensions']['description']) for f in resp.json)
+        assert descriptions == {
+            1: 'description 1', 2: None, 3: 'description 3', 4: None, 5: None}
+
+        resp = ngw_webtest_app.get(
+            '/api/resource/%d/feature/3?extensions=description' % vector_layer_id)
+        assert resp.json['extensions']['description'] == 'description 3'
+    finally:
+        with transaction.manager:
+            FeatureDescription.filter_by(resource_id=vector_layer_id).delete()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import json
+import six
+from uuid import uuid4
+
+import pytest
+import transaction
+from osgeo import ogr
+
+from nextgisweb.models import DBSession
+
+from nextgisweb.vector_layer import VectorLayer
+from nextgisweb.spatial_ref_sys.models import SRS
+from nextgisweb.auth import User
+
+
+@pytest.fixture(scope='module')
+def vector_layer_id(ngw_resource_group):
+    with transaction.manager:
+        obj = VectorLayer(
+            parent_id=ngw_resource_group, display_name='vector_layer',
+            owner_user=User.by_keyname('administrator'),
+            srs=SRS.filter_by(id=3857).one(),
+            tbl_uuid=six.text_type(uuid4().hex),
+        ).persist()
+
+        geojson = {
+            'type': 'FeatureCollection',
+            'features': [{
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [x, 0.0]},
+                'properties': {'name': 'feature%d' % x},
+            } for x in range(3)]
+        }
+        dsource = ogr.Open(json.dumps(geojson))
+        layer = dsource.GetLayer(0)
+
+        obj.setup_from_ogr(layer, lambda x: x)
+        obj.load_from_ogr(layer, lambda x: x)
+
+        DBSession.flush()
+        DBSession.expunge(obj)
+
+    yield obj.id
+
+    with transaction.manager:
+        DBSession.delete(VectorLayer.filter_by(id=obj.id).one())
+
+
+def test_changes(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/resource/%d' % vector_layer_id
+    changes_url = url + '/feature/changes'
+
+    since = ngw_webtest_app.get(url).json['vector_layer']['version']
+
+    resp = ngw_webtest_app.get(changes_url, dict(since=since))
+    assert resp.json['version'] == since
+    assert not resp.json['more'] and not resp.json['reset']
+    assert resp.json['create'] == [] and resp.json['update'] == [] and resp.json['delete'] == []
+
+    fid = ngw_webtest_app.post_json(url + '/feature/', dict(
+        geom='POINT (5 0)', fields=dict(name='new'))).json['id']
+    ngw_webtest_app.put_json(url + '/feature/1', dict(fields=dict(name='updated')))
+    ngw_webtest_app.put_json(url + '/feature/%d' % fid, dict(fields=dict(name='new updated')))
+    ngw_webtest_app.delete(url + '/feature/2')
+
+    resp = ngw_webtest_app.get(changes_url, dict(since=since))
+    assert resp.json['version'] == since + 4
+    assert not resp.json['more'] and not resp.json['delete_all']
+    assert [(f['id'], f['fields']['name']) for f in resp.json['create']] \
+        == [(fid, 'new updated')]
+    assert [(f['id'], f['fields']['name']) for f in resp.json['update']] \
+        == [(1, 'updated')]
+    assert resp.json['delete'] == [2]
+
+    resp = ngw_webtest_app.get(changes_url, dict(since=since, limit=1))
+    assert resp.json['version'] == since + 1
+    assert resp.json['more']
+    assert [f['id'] for f in resp.json['create']] == [fid]
+
+    resp = ngw_webtest_app.get(changes_url, dict(since=since + 4))
+    assert resp.json['version'] == since + 4
+    assert resp.json['create'] == [] and resp.json['update'] == [] and resp.json['delete'] == []
+
+    resp = ngw_webtest_app.get(changes_url, dict(since=since + 100))
+    assert resp.json == dict(version=since + 4, reset=True)
+
+    ngw_webtest_app.delete(url + '/feature/')
+    resp = ngw_webtest_app.get(changes_url, dict(since=since + 4))
+    assert resp.json['version'] == since + 5
+    assert resp.json['delete_all']
+
+    ngw_webtest_app.get(changes_url, status=422)
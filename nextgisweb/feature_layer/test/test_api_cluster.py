@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import json
+import six
+from uuid import uuid4
+
+import pytest
+import transaction
+from osgeo import ogr
+
+from nextgisweb.models import DBSession
+
+from nextgisweb.vector_layer import VectorLayer
+from nextgisweb.spatial_ref_sys.models import SRS
+from nextgisweb.auth import User
+
+
+POINTS = [(1000, 1000, 1), (2000, 2000, 2), (-1000, -1000, 5)]
+
+
+@pytest.fixture(scope='module')
+def vector_layer_id(ngw_resource_group):
+    with transaction.manager:
+        obj = VectorLayer(
+            parent_id=ngw_resource_group, display_name='vector_layer',
+            owner_user=User.by_keyname('administrator'),
+            srs=SRS.filter_by(id=3857).one(),
+            tbl_uuid=six.text_type(uuid4().hex),
+        ).persist()
+
+        geojson = {
+            'type': 'FeatureCollection',
+            'features': [{
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [x, y]},
+                'properties': {'int': num, 'str': 'value%d' % num},
+            } for x, y, num in POINTS]
+        }
+        dsource = ogr.Open(json.dumps(geojson))
+        layer = dsource.GetLayer(0)
+
+        obj.setup_from_ogr(layer, lambda x: x)
+        obj.load_from_ogr(layer, lambda x: x)
+
+        DBSession.flush()
+        DBSession.expunge(obj)
+
+    yield obj.id
+
+    with transaction.manager:
+        DBSession.delete(VectorLayer.filter_by(id=obj.id).one())
+
+
+def test_cluster(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/resource/%d/feature/cluster' % vector_layer_id
+
+    def clusters():
+        resp = ngw_webtest_app.get(url, dict(
+            z=0, x=0, y=0, size=128, aggregate='sum:int,max:int'))
+        return sorted(resp.json, key=lambda c: c['count'])
+
+    single, double = clusters()
+    assert single['count'] == 1 and single['id'] == 3
+    assert single['fields'] == dict(sum_int=5, max_int=5)
+    assert double['count'] == 2 and double['id'] is None
+    assert double['fields'] == dict(sum_int=3, max_int=2)
+
+    # Cached clusters are invalidated on data changes
+    ngw_webtest_app.post_json('/api/resource/%d/feature/' % vector_layer_id, dict(
+        geom='POINT (-2000 -2000)', fields=dict(int=10)))
+
+    result = clusters()
+    assert [c['count'] for c in result] == [2, 2]
+    assert sorted(c['fields']['sum_int'] for c in result) == [3, 15]
+
+    ngw_webtest_app.get(url, dict(z=0, x=0, y=0, aggregate='sum:missing'), status=422)
+    ngw_webtest_app.get(url, dict(z=0, x=0, y=0, aggregate='max:str'), status=422)
+
+
+def test_cluster_mvt(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    resp = ngw_webtest_app.get('/api/component/feature_layer/mvt', dict(
+        resource=vector_layer_id, z=0, x=0, y=0, cluster=128), status=200)
+    assert resp.content_type == 'application/vnd.mapbox-vector-tile'
+
+
+def test_cluster_mvt_aggregate(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/component/feature_layer/mvt'
+    params = dict(resource=vector_layer_id, z=0, x=0, y=0, cluster=128)
+
+    resp = ngw_webtest_app.get(url, dict(params, cluster_aggregate='max:int'), status=200)
+    assert resp.content_type == 'application/vnd.mapbox-vector-tile'
+
+    # Min and max of non-numeric values can't be written as real numbers
+    ngw_webtest_app.get(url, dict(params, cluster_aggregate='max:str'), status=422)
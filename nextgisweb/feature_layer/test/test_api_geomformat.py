@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import base64
+import json
+import six
+from uuid import uuid4
+
+import pytest
+import transaction
+from osgeo import ogr
+from sqlalchemy import text
+
+from nextgisweb.models import DBSession
+
+from nextgisweb.vector_layer import VectorLayer
+from nextgisweb.spatial_ref_sys.models import SRS
+from nextgisweb.auth import User
+
+
+@pytest.fixture(scope='module')
+def vector_layer_id(ngw_resource_group):
+    with transaction.manager:
+        obj = VectorLayer(
+            parent_id=ngw_resource_group, display_name='vector_layer',
+            owner_user=User.by_keyname('administrator'),
+            srs=SRS.filter_by(id=3857).one(),
+            tbl_uuid=six.text_type(uuid4().hex),
+        ).persist()
+
+        geojson = {
+            'type': 'FeatureCollection',
+            'crs': {'type': 'name', 'properties': {'name': 'urn:ogc:def:crs:EPSG::3857'}},
+            'features': [{
+                'type': 'Feature',
+                'geometry': {'type': 'LineString', 'coordinates': [
+                    [0.123456789, 1.987654321], [2.555555555, 3.444444444]]},
+                'properties': {'name': 'line'},
+            }]
+        }
+        dsource = ogr.Open(json.dumps(geojson))
+        layer = dsource.GetLayer(0)
+
+        obj.setup_from_ogr(layer, lambda x: x)
+        obj.load_from_ogr(layer, lambda x: x)
+
+        DBSession.flush()
+        DBSession.expunge(obj)
+
+    yield obj.id
+
+    with transaction.manager:
+        DBSession.delete(VectorLayer.filter_by(id=obj.id).one())
+
+
+def test_precision(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/resource/%d/feature/1' % vector_layer_id
+
+    resp = ngw_webtest_app.get(url, dict(precision=2))
+    assert resp.json['geom'] == 'LINESTRING(0.12 1.99,2.56 3.44)'
+
+    resp = ngw_webtest_app.get(url, dict(geom_format='geojson', precision=3))
+    assert resp.json['geom']['coordinates'] == [[0.123, 1.988], [2.556, 3.444]]
+
+    resp = ngw_webtest_app.get('/api/resource/%d/feature/' % vector_layer_id, dict(
+        geom_format='geojson', precision=0))
+    assert resp.json[0]['geom']['coordinates'] == [[0, 2], [3, 3]]
+
+    ngw_webtest_app.get(url, dict(precision=16), status=422)
+    ngw_webtest_app.get(url, dict(precision='foo'), status=422)
+    ngw_webtest_app.get(url, dict(geom_format='twkb', precision=8), status=422)
+    ngw_webtest_app.get(url, dict(geom_format='gml'), status=422)
+
+
+def test_binary(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/resource/%d/feature/1' % vector_layer_id
+
+    resp = ngw_webtest_app.get(url, dict(geom_format='wkb', precision=1))
+    geom = ogr.CreateGeometryFromWkb(base64.b64decode(resp.json['geom']))
+    assert geom.GetPoints() == [(0.1, 2.0), (2.6, 3.4)]
+
+    resp = ngw_webtest_app.get(url, dict(geom_format='twkb'))
+    twkb = base64.b64decode(resp.json['geom'])
+    wkt = DBSession.connection().execute(
+        text("SELECT ST_AsText(ST_GeomFromTWKB(:twkb))"), twkb=twkb).scalar()
+    assert wkt == 'LINESTRING(0.1234568 1.9876543,2.5555556 3.4444444)'
+
+
+def test_export(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    resp = ngw_webtest_app.get('/api/resource/%d/geojson' % vector_layer_id, dict(precision=2))
+    assert resp.json['features'][0]['geometry']['coordinates'] == [
+        [0.12, 1.99], [2.56, 3.44]]
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import json
+import math
+import six
+from uuid import uuid4
+
+import pytest
+import transaction
+from osgeo import ogr
+
+from nextgisweb.models import DBSession
+
+from nextgisweb.vector_layer import VectorLayer
+from nextgisweb.spatial_ref_sys.models import SRS
+from nextgisweb.auth import User
+
+
+POINTS = [(0, 0), (100, 0), (10, 10), (-50, 0)]
+
+
+def _vector_layer(ngw_resource_group, points):
+    with transaction.manager:
+        obj = VectorLayer(
+            parent_id=ngw_resource_group, display_name='vector_layer',
+            owner_user=User.by_keyname('administrator'),
+            srs=SRS.filter_by(id=3857).one(),
+            tbl_uuid=six.text_type(uuid4().hex),
+        ).persist()
+
+        geojson = {
+            'type': 'FeatureCollection',
+            'features': [{
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [x, y]},
+                'properties': {'int': idx},
+            } for idx, (x, y) in enumerate(points)]
+        }
+        dsource = ogr.Open(json.dumps(geojson))
+        layer = dsource.GetLayer(0)
+
+        obj.setup_from_ogr(layer, lambda x: x)
+        obj.load_from_ogr(layer, lambda x: x)
+
+        DBSession.flush()
+        DBSession.expunge(obj)
+
+    return obj.id
+
+
+def _delete_vector_layer(layer_id):
+    with transaction.manager:
+        DBSession.delete(VectorLayer.filter_by(id=layer_id).one())
+
+
+@pytest.fixture(scope='module')
+def vector_layer_id(ngw_resource_group):
+    layer_id = _vector_layer(ngw_resource_group, POINTS)
+    yield layer_id
+    _delete_vector_layer(layer_id)
+
+
+@pytest.fixture(scope='module')
+def vector_layer_id_other(ngw_resource_group):
+    layer_id = _vector_layer(ngw_resource_group, [(20, 0), (0, 30)])
+    yield layer_id
+    _delete_vector_layer(layer_id)
+
+
+def test_nearest(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/resource/%d/feature/nearest' % vector_layer_id
+
+    resp = ngw_webtest_app.get(url, dict(geom='POINT (60 0)', limit=3))
+    assert [f['id'] for f in resp.json] == [2, 3, 1]
+    assert resp.json[0]['distance'] == pytest.approx(40)
+
+    resp = ngw_webtest_app.get(url, dict(geom='POINT (60 0)', limit=3, distance=55))
+    assert [f['id'] for f in resp.json] == [2, 3]
+
+
+def test_nearest_srs(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/resource/%d/feature/nearest' % vector_layer_id
+
+    # The same point as POINT (60 0) in web mercator, distances are still
+    # in layer SRS units (metres).
+    lon = math.degrees(60 / 6378137)
+    resp = ngw_webtest_app.get(url, dict(
+        geom='POINT (%.12f 0)' % lon, srs=4326, limit=3, distance=55))
+    assert [f['id'] for f in resp.json] == [2, 3]
+    assert resp.json[0]['distance'] == pytest.approx(40)
+
+    ngw_webtest_app.get(url, dict(srs=4326), status=422)
+    ngw_webtest_app.get(url, dict(geom='POINT (60 0)', srs=-1), status=422)
+
+
+def test_identify_nearest(
+    ngw_webtest_app, vector_layer_id, ngw_resource_group, ngw_auth_administrator
+):
+    resp = ngw_webtest_app.post_json('/api/feature_layer/identify', dict(
+        srs=3857, layers=[vector_layer_id, ngw_resource_group],
+        geom='POLYGON((-100 -100,-100 100,100 100,100 -100,-100 -100))'))
+    features = resp.json[str(vector_layer_id)]['features']
+    assert [f['id'] for f in features] == [1, 3, 4, 2]
+    assert [f['fields'] for f in features] == [
+        dict(int=0), dict(int=2), dict(int=3), dict(int=1)]
+    assert resp.json[str(ngw_resource_group)] == dict(error="Not implemented")
+    assert resp.json['featureCount'] == 4
+
+
+def test_identify_tolerance(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    # POINT (100 0) is outside of the click box, but it's within the
+    # tolerance (distance from the center to box corners).
+    resp = ngw_webtest_app.post_json('/api/feature_layer/identify', dict(
+        srs=3857, layers=[vector_layer_id],
+        geom='POLYGON((-80 -80,-80 80,80 80,80 -80,-80 -80))'))
+    features = resp.json[str(vector_layer_id)]['features']
+    assert [f['id'] for f in features] == [1, 3, 4, 2]
+
+    resp = ngw_webtest_app.post_json('/api/feature_layer/identify', dict(
+        srs=3857, layers=[vector_layer_id],
+        geom='POLYGON((-60 -60,-60 60,60 60,60 -60,-60 -60))'))
+    features = resp.json[str(vector_layer_id)]['features']
+    assert [f['id'] for f in features] == [1, 3, 4]
+
+
+def test_identify_union(
+    ngw_webtest_app, vector_layer_id, vector_layer_id_other, ngw_auth_administrator
+):
+    # Features of both vector layers are fetched with a single UNION ALL
+    # query, but they are ordered by distance within each layer.
+    resp = ngw_webtest_app.post_json('/api/feature_layer/identify', dict(
+        srs=3857, layers=[vector_layer_id, vector_layer_id_other],
+        geom='POLYGON((-40 -40,-40 40,40 40,40 -40,-40 -40))'))
+
+    features = resp.json[str(vector_layer_id)]['features']
+    assert [f['id'] for f in features] == [1, 3, 4]
+
+    features = resp.json[str(vector_layer_id_other)]['features']
+    assert [f['id'] for f in features] == [1, 2]
+    assert [f['fields'] for f in features] == [dict(int=0), dict(int=1)]
+
+    assert resp.json['featureCount'] == 5
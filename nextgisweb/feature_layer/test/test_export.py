@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import io
+import json
+import zipfile
+from uuid import uuid4
+
+import pytest
+import six
+import transaction
+from osgeo import ogr, gdal
+
+from nextgisweb.auth import User
+from nextgisweb.models import DBSession
+from nextgisweb.spatial_ref_sys import SRS
+from nextgisweb.vector_layer import VectorLayer
+
+
+@pytest.fixture(autouse=True)
+def auth_administrator(ngw_auth_administrator):
+    pass
+
+
+@pytest.fixture(scope='module')
+def vector_layer_id(ngw_resource_group):
+    with transaction.manager:
+        obj = VectorLayer(
+            parent_id=ngw_resource_group, display_name='feature_layer.test:export',
+            owner_user=User.by_keyname('administrator'),
+            srs=SRS.filter_by(id=3857).one(),
+            tbl_uuid=six.text_type(uuid4().hex),
+        ).persist()
+
+        geojson = {
+            'type': 'FeatureCollection',
+            'crs': {'type': 'name', 'properties': {'name': 'urn:ogc:def:crs:EPSG::3857'}},
+            'features': [{
+                'type': 'Feature',
+                'properties': {'name': 'feature%d' % i, 'description': 'text%d' % i},
+                'geometry': {'type': 'Point', 'coordinates': [i * 1000, 0]}
+            } for i in range(3)]
+        }
+        dsource = ogr.Open(json.dumps(geojson))
+        layer = dsource.GetLayer(0)
+
+        obj.setup_from_ogr(layer, lambda x: x)
+        obj.load_from_ogr(layer, lambda x: x)
+
+        DBSession.flush()
+        DBSession.expunge(obj)
+
+    yield obj.id
+
+    with transaction.manager:
+        DBSession.delete(VectorLayer.filter_by(id=obj.id).one())
+
+
+def test_export_geojson_srs(ngw_webtest_app, vector_layer_id):
+    resp = ngw_webtest_app.get('/api/resource/%d/export' % vector_layer_id, params=dict(
+        format='GeoJSON', srs=4326, zipped='false'), status=200)
+
+    data = json.loads(resp.body)
+    assert len(data['features']) == 3
+    lon, lat = data['features'][1]['geometry']['coordinates']
+    assert lon == pytest.approx(0.008983, abs=1e-6)
+    assert lat == pytest.approx(0)
+
+
+@pytest.mark.parametrize('format, ext', [
+    ('GPKG', 'gpkg'),
+    ('ESRI Shapefile', 'shp'),
+])
+def test_export_zipped(format, ext, ngw_webtest_app, vector_layer_id, tmp_path):
+    resp = ngw_webtest_app.get('/api/resource/%d/export' % vector_layer_id, params=dict(
+        format=format, fid='ngw_id'), status=200)
+    assert resp.content_type == 'application/zip'
+
+    with zipfile.ZipFile(io.BytesIO(resp.body)) as zipf:
+        zipf.extractall(str(tmp_path))
+
+    ds = gdal.OpenEx(str(tmp_path / ('%d.%s' % (vector_layer_id, ext))))
+    layer = ds.GetLayer(0)
+    assert layer.GetFeatureCount() == 3
+    assert sorted(f.GetField('name') for f in layer) == [
+        'feature0', 'feature1', 'feature2']
+
+
+def test_export_long_field_name(ngw_webtest_app, vector_layer_id, tmp_path):
+    resp = ngw_webtest_app.get('/api/resource/%d/export' % vector_layer_id, params=dict(
+        format='ESRI Shapefile', zipped='true'), status=200)
+
+    with zipfile.ZipFile(io.BytesIO(resp.body)) as zipf:
+        zipf.extractall(str(tmp_path))
+
+    # Shapefile field names are truncated to 10 characters
+    ds = gdal.OpenEx(str(tmp_path / ('%d.shp' % vector_layer_id)))
+    layer = ds.GetLayer(0)
+    assert sorted(f.GetField('descriptio') for f in layer) == [
+        'text0', 'text1', 'text2']
@@ -3,15 +3,22 @@ from __future__ import division, absolute_import, print_function, unicode_litera
 
 import os
 import os.path
+import errno
 import logging
 from collections import OrderedDict, defaultdict
 from datetime import datetime as dt, timedelta
+from hashlib import sha256
 from shutil import copyfileobj
 from operator import itemgetter
 
+import six
+import transaction
+
+from .. import db
 from ..lib.config import Option
 from ..component import Component
 from ..core import BackupBase
+from ..models import DBSession
 
 from .models import Base, FileObj
 from . import command  # NOQA
@@ -20,6 +27,9 @@ __all__ = ['FileStorageComponent', 'FileObj']
 
 BUF_SIZE = 1024 * 1024
 
+# Directory for content-addressed blobs, see FileStorageComponent.dedup
+BLOB_DIR = '.blob'
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,10 +37,15 @@ logger = logging.getLogger(__name__)
 class FileObjBackup(BackupBase):
     identity = 'fileobj'
     plget = itemgetter('component', 'uuid')
+    concurrent = True
+    immutable = True
 
     def blob(self):
         return True
 
+    def filename(self):
+        return self.component.filename(self.plget(self.payload))
+
     def backup(self, dst):
         with open(self.component.filename(self.plget(self.payload)), 'rb') as fd:
             copyfileobj(fd, dst, length=BUF_SIZE)
@@ -80,13 +95,59 @@ class FileStorageComponent(Component):
 
         # Create folders if needed
         if makedirs and not os.path.isdir(path):
-            os.makedirs(path)
+            try:
+                os.makedirs(path)
+            except OSError as exc:
+                # Directory can be created concurrently (backup restoration
+                # is executed in a thread pool)
+                if exc.errno != errno.EEXIST:
+                    raise
 
         return os.path.join(path, str(uuid))
 
+    def write_file(self, fileobj, src):
+        """ Copy the file or file-like object into the storage recording
+        its size and SHA-256 hash """
+
+        dst = self.filename(fileobj, makedirs=True)
+        h = sha256()
+        size = 0
+
+        fd_src = open(src, 'rb') if isinstance(src, six.string_types) else src
+        try:
+            with open(dst, 'wb') as fd_dst:
+                for chunk in iter(lambda: fd_src.read(BUF_SIZE), b''):
+                    h.update(chunk)
+                    size += len(chunk)
+                    fd_dst.write(chunk)
+        finally:
+            if fd_src is not src:
+                fd_src.close()
+
+        fileobj.size = size
+        fileobj.sha256 = h.hexdigest()
+
+        if self.options['dedup']:
+            self._link_blob(dst, fileobj.sha256)
+
+        return fileobj
+
+    def update_stat(self, fileobj):
+        """ Record size and SHA-256 hash of a file written into the storage
+        by other means, for example by GDAL """
+
+        fn = self.filename(fileobj)
+        fileobj.size = os.stat(fn).st_size
+        fileobj.sha256 = _file_sha256(fn)
+
+        if self.options['dedup']:
+            self._link_blob(fn, fileobj.sha256)
+
+        return fileobj
+
     def query_stat(self):
-        # Traverse all objects in file storage and calculate total
-        # and per component size in filesystem
+        # Storage accounting records are incrementally updated on
+        # objects creation and deletion, see file_storage.models
 
         def itm():
             return OrderedDict(size=0, count=0)
@@ -94,20 +155,49 @@ class FileStorageComponent(Component):
         result = OrderedDict(
             total=itm(), component=defaultdict(itm))
 
-        def add_item(itm, size):
+        def add_item(itm, size, count):
             itm['size'] += size
-            itm['count'] += 1
+            itm['count'] += count
 
-        for fileobj in FileObj.query():
-            statres = os.stat(self.filename(fileobj))
-            add_item(result['total'], statres.st_size)
-            add_item(result['component'][fileobj.component], statres.st_size)
+        prefix = self.identity + '.'
+        for key, value in self.env.core.storage_stat(prefix).items():
+            add_item(result['total'], value['size'], value['count'])
+            add_item(result['component'][key[len(prefix):]], value['size'], value['count'])
 
         return result
 
+    def estimate(self):
+        """ Record missing file sizes and recalculate storage accounting
+        records from the table """
+
+        with transaction.manager:
+            query = FileObj.filter(FileObj.size.is_(None))
+            for fileobj in query.yield_per(BUF_SIZE // 64):
+                try:
+                    fileobj.size = os.stat(self.filename(fileobj)).st_size
+                except OSError as exc:
+                    if exc.errno != errno.ENOENT:
+                        raise
+
+        with transaction.manager:
+            prefix = self.identity + '.'
+            stat = dict((key, None) for key in self.env.core.storage_stat(prefix))
+            for component, size, count in DBSession.query(
+                FileObj.component,
+                db.func.coalesce(db.func.sum(FileObj.size), 0),
+                db.func.count(FileObj.id),
+            ).group_by(FileObj.component):
+                stat[prefix + component] = (int(size), count)
+
+            for key, value in stat.items():
+                self.env.core.storage_set(key, *(value or (0, 0)))
+
     def maintenance(self):
         super(FileStorageComponent, self).maintenance()
+        if self.options['dedup']:
+            self.dedup()
         self.cleanup()
+        self.estimate()
 
     def cleanup(self):
         self.logger.info('Cleaning up file storage...')
@@ -117,31 +207,45 @@ class FileStorageComponent(Component):
 
         delta = self.options['cleanup_keep_interval']
 
-        for (dirpath, dirnames, filenames) in os.walk(self.path, topdown=False):
-            relist = False
+        def remove_file(fullfn, stat):
+            if dt.utcnow() - dt.utcfromtimestamp(stat.st_ctime) > delta:
+                os.remove(fullfn)
+                return True
+            return False
 
-            for fn in filenames:
-                obj = FileObj.filter_by(uuid=fn).first()
-                fullfn = os.path.join(dirpath, fn)
-                stat = os.stat(fullfn)
+        def remove_dir(dirpath):
+            if len(os.listdir(dirpath)) == 0:
+                os.rmdir(dirpath)
+                return True
+            return False
+
+        # Blobs go last as they become unreferenced after files removal
+        for component in sorted(os.listdir(self.path), key=lambda c: (c == BLOB_DIR, c)):
+            cpath = os.path.join(self.path, component)
+            if not os.path.isdir(cpath):
+                continue
+
+            if component == BLOB_DIR:
+                # Blob is unreferenced when the only hardlink left is
+                # the blob itself.
+                files = ((fn, fn.nlink == 1) for fn in _walk_sorted(cpath))
+            else:
+                files = _merge_unknown(_walk_sorted(cpath), self._query_uuids(component))
 
-                if obj is None and (dt.utcnow() - dt.utcfromtimestamp(stat.st_ctime) > delta):
-                    os.remove(fullfn)
-                    relist = True
+            for fn, unknown in files:
+                stat = os.stat(fn.path)
+                if unknown and remove_file(fn.path, stat):
                     deleted_files += 1
                     deleted_bytes += stat.st_size
                 else:
                     kept_files += 1
                     kept_bytes += stat.st_size
 
-            if (
-                (not relist and len(filenames) == 0 and len(dirnames) == 0)
-                or len(os.listdir(dirpath)) == 0  # NOQA: W503
-            ):
-                os.rmdir(dirpath)
-                deleted_dirs += 1
-            else:
-                kept_dirs += 1
+            for dirpath in _walk_dirs(cpath):
+                if remove_dir(dirpath):
+                    deleted_dirs += 1
+                else:
+                    kept_dirs += 1
 
         self.logger.info(
             "Deleted: %d files, %d directories, %d bytes",
@@ -151,7 +255,154 @@ class FileStorageComponent(Component):
             "Preserved: %d files, %d directories, %d bytes",
             kept_files, kept_dirs, kept_bytes)
 
+    def _query_uuids(self, component):
+        """ Stream uuids of the component's objects ordered by bytes (same
+        order as Python string comparison) using server-side cursor """
+
+        query = DBSession.query(FileObj.uuid).filter_by(
+            component=component
+        ).order_by(FileObj.uuid.collate('C')).execution_options(
+            stream_results=True)
+
+        for row in query.yield_per(BUF_SIZE // 64):
+            yield row.uuid
+
+    def dedup(self, batch_size=1000):
+        """ Deduplicate objects having the same content. Each object which
+        isn't processed yet gets its SHA-256 hash recorded and becomes a
+        hardlink to the blob ``BLOB_DIR/hh/hh/<sha256>``. Number of links
+        to the blob is its reference count, unreferenced blobs are removed
+        on cleanup. Objects must not be modified after creation. """
+
+        self.logger.info("Deduplicating file storage...")
+        processed, linked, linked_bytes = 0, 0, 0
+        last_id = None
+
+        while True:
+            with transaction.manager:
+                query = FileObj.filter(FileObj.sha256.is_(None))
+                if last_id is not None:
+                    query = query.filter(FileObj.id > last_id)
+                batch = query.order_by(FileObj.id).limit(batch_size).all()
+                if len(batch) == 0:
+                    break
+
+                for fileobj in batch:
+                    last_id = fileobj.id
+                    fn = self.filename(fileobj)
+                    try:
+                        digest = _file_sha256(fn)
+                    except (IOError, OSError) as exc:
+                        if exc.errno != errno.ENOENT:
+                            raise
+                        self.logger.warning("File %s not found, skipping", fn)
+                        continue
+
+                    if self._link_blob(fn, digest):
+                        linked += 1
+                        linked_bytes += os.stat(fn).st_size
+                    fileobj.sha256 = digest
+                    processed += 1
+
+        self.logger.info(
+            "Processed: %d files, replaced with existing blobs: %d files, %d bytes",
+            processed, linked, linked_bytes)
+
+    def _link_blob(self, fn, digest):
+        """ Link the file to the blob or create the blob if it doesn't
+        exist. Returns true if the file was replaced by existing blob. """
+
+        levels = (digest[0:2], digest[2:4])
+        blob_path = os.path.join(self.path, BLOB_DIR, *levels)
+        if not os.path.isdir(blob_path):
+            os.makedirs(blob_path)
+        blob_fn = os.path.join(blob_path, digest)
+
+        try:
+            os.link(fn, blob_fn)
+            return False
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+
+        if os.path.samefile(fn, blob_fn):
+            return False
+
+        # Replace the file atomically, so readers see the old or the new
+        # file, which have the same content.
+        tmp_fn = fn + '.tmp'
+        os.link(blob_fn, tmp_fn)
+        os.rename(tmp_fn, fn)
+        return True
+
     option_annotations = (
         Option('path', default=None),
-        Option('cleanup_keep_interval', default=timedelta(hours=4))
+        Option('cleanup_keep_interval', default=timedelta(hours=4)),
+        Option('dedup', bool, default=False,
+               doc="Deduplicate files with the same content on maintenance."),
     )
+
+
+def _file_sha256(fn):
+    h = sha256()
+    with open(fn, 'rb') as fd:
+        for chunk in iter(lambda: fd.read(BUF_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class _WalkFile(object):
+    __slots__ = ('name', 'path', 'misplaced')
+
+    def __init__(self, name, path, misplaced=False):
+        self.name = name
+        self.path = path
+        self.misplaced = misplaced
+
+    @property
+    def nlink(self):
+        return os.stat(self.path).st_nlink
+
+
+def _walk_sorted(path):
+    """ Yield files of two level storage directory ordered by name. As
+    files are placed by first characters of their names, this is the
+    same order as ordering by name. Files placed elsewhere are yielded
+    with misplaced flag and break the order. """
+
+    for l1 in sorted(os.listdir(path)):
+        p1 = os.path.join(path, l1)
+        if not os.path.isdir(p1):
+            yield _WalkFile(l1, p1, True)
+            continue
+        for l2 in sorted(os.listdir(p1)):
+            p2 = os.path.join(p1, l2)
+            if not os.path.isdir(p2):
+                yield _WalkFile(l2, p2, True)
+                continue
+            for fn in sorted(os.listdir(p2)):
+                misplaced = fn[0:2] != l1 or fn[2:4] != l2
+                yield _WalkFile(fn, os.path.join(p2, fn), misplaced)
+
+
+def _walk_dirs(path):
+    """ Yield storage subdirectories bottom-up """
+
+    for (dirpath, dirnames, filenames) in os.walk(path, topdown=False):
+        if dirpath != path:
+            yield dirpath
+
+
+def _merge_unknown(files, uuids):
+    """ Merge join of sorted files and uuids iterators yielding pairs of
+    file and flag which is true when the file name isn't in uuids """
+
+    current = next(uuids, None)
+    for fn in files:
+        if fn.misplaced:
+            # Can't be read with FileStorageComponent.filename
+            yield fn, True
+            continue
+        while current is not None and current < fn.name:
+            current = next(uuids, None)
+        yield fn, current != fn.name
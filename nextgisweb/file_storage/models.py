@@ -5,6 +5,7 @@ import six
 
 import sqlalchemy as sa
 
+from ..env import env
 from ..models import declarative_base
 
 Base = declarative_base()
@@ -16,6 +17,8 @@ class FileObj(Base):
     id = sa.Column(sa.Integer, primary_key=True)
     component = sa.Column(sa.Unicode, nullable=False)
     uuid = sa.Column(sa.Unicode(32), nullable=False)
+    size = sa.Column(sa.BigInteger)
+    sha256 = sa.Column(sa.Unicode(64))
 
     __table_args__ = (
         sa.Index('fileobj_uuid_component_idx', uuid, component, unique=True),
@@ -24,3 +27,33 @@ class FileObj(Base):
     def __init__(self, *args, **kwargs):
         Base.__init__(self, *args, **kwargs)
         self.uuid = six.text_type(uuid.uuid4().hex)
+
+
+# Incremental storage accounting, see CoreComponent.storage_add
+
+def _stat_key(target):
+    return 'file_storage.' + target.component
+
+
+@sa.event.listens_for(FileObj, 'after_insert')
+def _fileobj_after_insert(mapper, connection, target):
+    env.core.storage_add(
+        _stat_key(target), target.size or 0, 1,
+        connection=connection)
+
+
+@sa.event.listens_for(FileObj, 'after_update')
+def _fileobj_after_update(mapper, connection, target):
+    history = sa.inspect(target).attrs.size.history
+    if history.has_changes():
+        old = history.deleted[0] if len(history.deleted) > 0 else None
+        env.core.storage_add(
+            _stat_key(target), (target.size or 0) - (old or 0), 0,
+            connection=connection)
+
+
+@sa.event.listens_for(FileObj, 'after_delete')
+def _fileobj_after_delete(mapper, connection, target):
+    env.core.storage_add(
+        _stat_key(target), -(target.size or 0), -1,
+        connection=connection)
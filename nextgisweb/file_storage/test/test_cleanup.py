@@ -6,6 +6,7 @@ import io
 from datetime import timedelta
 
 import pytest
+import transaction
 
 from nextgisweb.models import DBSession
 from nextgisweb.file_storage import FileObj
@@ -38,3 +39,39 @@ def test_keep_delete(ngw_env, ngw_txn):
     assert not os.path.isfile(fn_delete)
 
     os.unlink(fn_keep)
+
+
+@pytest.fixture()
+def dedup_fileobjs(ngw_env):
+    content = b'duplicated content'
+
+    with transaction.manager:
+        fileobjs = [FileObj(component='test').persist() for i in range(2)]
+        DBSession.flush()
+        ids = [fo.id for fo in fileobjs]
+        for fo in fileobjs:
+            with io.open(ngw_env.file_storage.filename(fo, makedirs=True), 'wb') as fd:
+                fd.write(content)
+
+    yield ids
+
+    with transaction.manager:
+        FileObj.filter(FileObj.id.in_(ids)).delete(synchronize_session=False)
+    ngw_env.file_storage.cleanup()
+
+
+def test_dedup(ngw_env, dedup_fileobjs):
+    fs = ngw_env.file_storage
+    fs.dedup()
+
+    with transaction.manager:
+        fileobjs = FileObj.filter(FileObj.id.in_(dedup_fileobjs)).all()
+        assert fileobjs[0].sha256 == fileobjs[1].sha256
+        fn1, fn2 = [fs.filename(fo) for fo in fileobjs]
+
+    assert os.path.samefile(fn1, fn2)
+    assert os.stat(fn1).st_nlink == 3
+
+    # Referenced blob must survive cleanup
+    fs.cleanup()
+    assert os.path.isfile(fn1) and os.path.isfile(fn2)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import io
+from hashlib import sha256
+
+from nextgisweb.models import DBSession
+from nextgisweb.file_storage import FileObj
+
+
+def test_write_file(ngw_env, ngw_txn):
+    fs = ngw_env.file_storage
+    content = b'test content'
+
+    def component_stat():
+        return fs.query_stat()['component'].get('test_stat', dict(size=0, count=0))
+
+    before = component_stat()
+
+    fileobj = FileObj(component='test_stat')
+    fs.write_file(fileobj, io.BytesIO(content))
+    assert fileobj.size == len(content)
+    assert fileobj.sha256 == sha256(content).hexdigest()
+
+    with io.open(fs.filename(fileobj), 'rb') as fd:
+        assert fd.read() == content
+
+    fileobj.persist()
+    DBSession.flush()
+
+    after = component_stat()
+    assert after['size'] == before['size'] + len(content)
+    assert after['count'] == before['count'] + 1
+
+    DBSession.delete(fileobj)
+    DBSession.flush()
+    assert component_stat() == before
@@ -2,12 +2,12 @@
 from __future__ import division, unicode_literals, print_function, absolute_import
 from inspect import isclass
 
+import numpy
 import shapely.geometry
 from shapely.geometry import base, mapping, shape
-from shapely.ops import transform as map_coords
 from shapely import wkt, wkb
 from pyproj import Transformer
-from sqlalchemy import func
+from sqlalchemy import func, text
 
 from .models import DBSession
 
@@ -60,8 +60,10 @@ def geom_from_wkt(data, srid=None):
     return g
 
 
-def geom_to_wkt(g):
-    return wkt.dumps(g)
+def geom_to_wkt(g, precision=None):
+    if precision is None:
+        return wkt.dumps(g)
+    return wkt.dumps(g, rounding_precision=precision, trim=True)
 
 
 def geom_from_wkb(data, srid=None):
@@ -73,8 +75,105 @@ def geom_from_wkb(data, srid=None):
 
 def geom_transform(g, crs_from, crs_to):
     transformer = Transformer.from_crs(crs_from, crs_to, always_xy=True)
-    g = map_coords(transformer.transform, g)
-    return g
+    return geom_transform_with(g, transformer)
+
+
+def geom_transform_with(g, transformer):
+    """ Transform geometry with prebuilt pyproj transformer, see
+    :py:meth:`SpatialRefSysComponent.transformer` """
+    return geom_transform_many((g, ), transformer)[0]
+
+
+def geom_transform_many(geoms, transformer):
+    """ Transform geometries with a single call of the transformer on
+    coordinate arrays of all of them """
+
+    geoms = list(geoms)
+    arrays = list()
+    for g in geoms:
+        _coords_collect(g, arrays)
+
+    if len(arrays) == 0:
+        return list(geoms)
+
+    # Coordinates with and without Z can't be stacked together
+    by_dim = dict()
+    for a in arrays:
+        by_dim.setdefault(a.shape[1], []).append(a)
+
+    for dim, group in by_dim.items():
+        stacked = numpy.concatenate(group)
+        result = transformer.transform(*stacked.T)
+        stacked = numpy.column_stack(result)
+        offset = 0
+        for a in group:
+            a[:] = stacked[offset:offset + len(a)]
+            offset += len(a)
+
+    arrays.reverse()
+    return [_coords_rebuild(g, arrays) for g in geoms]
+
+
+def geom_round(g, precision):
+    """ Round coordinates of geometry to the number of decimal digits """
+
+    arrays = list()
+    _coords_collect(g, arrays)
+    for a in arrays:
+        a[:] = numpy.round(a, precision)
+
+    arrays.reverse()
+    return _coords_rebuild(g, arrays)
+
+
+def _coords_collect(g, arrays):
+    if g.is_empty:
+        return
+    gtype = g.geom_type
+    if gtype in ('Point', 'LineString', 'LinearRing'):
+        arrays.append(numpy.array(g.coords, dtype=numpy.float64))
+    elif gtype == 'Polygon':
+        for ring in (g.exterior, ) + tuple(g.interiors):
+            arrays.append(numpy.array(ring.coords, dtype=numpy.float64))
+    else:
+        for part in g.geoms:
+            _coords_collect(part, arrays)
+
+
+def _coords_rebuild(g, arrays):
+    # Arrays are popped from the end in the order of _coords_collect
+    if g.is_empty:
+        return g
+    gtype = g.geom_type
+    if gtype == 'Point':
+        return type(g)(arrays.pop()[0])
+    elif gtype in ('LineString', 'LinearRing'):
+        return type(g)(arrays.pop())
+    elif gtype == 'Polygon':
+        shell = arrays.pop()
+        holes = [arrays.pop() for i in range(len(g.interiors))]
+        return type(g)(shell, holes)
+    else:
+        return type(g)([_coords_rebuild(part, arrays) for part in g.geoms])
+
+
+def geom_calc_many(geoms, crs, prop, srid):
+    """ Calculate length or area of geometries, geodesic values are
+    calculated with a single PostGIS query """
+
+    if prop not in ('length', 'area'):
+        return None
+
+    if crs.is_geographic:
+        fun = dict(length='ST_Length', area='ST_Area')[prop]
+        query = text(
+            "SELECT {}(geography(ST_GeomFromText(t.wkt, :srid))) "
+            "FROM unnest(:wkts) WITH ORDINALITY AS t(wkt, n) "
+            "ORDER BY t.n".format(fun))
+        return [row[0] for row in DBSession.execute(query, dict(
+            wkts=[geom_to_wkt(g) for g in geoms], srid=srid))]
+
+    return [geom_calc(g, crs, prop, srid) for g in geoms]
 
 
 def geom_calc(g, crs, prop, srid):
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import threading
+from datetime import datetime, timedelta
+
+import transaction
+
+from .. import db
+from ..lib.config import Option
+from ..component import Component
+from ..core.exception import UserException
+from ..core.notify import notify
+from ..models import DBSession
+
+from .model import Base, Job
+from .handler import JobHandler, JobContext
+from .util import COMP_ID
+from . import command  # NOQA
+
+__all__ = ['JobsComponent', 'Job', 'JobHandler', 'JobContext']
+
+
+class JobsComponent(Component):
+    identity = COMP_ID
+    metadata = Base.metadata
+
+    def initialize(self):
+        super(JobsComponent, self).initialize()
+        self.poll_interval = self.options['worker.poll_interval']
+        self.heartbeat_interval = self.options['heartbeat_interval']
+        self.progress_interval = self.options['progress_interval']
+        self.stale_timeout = self.options['stale_timeout']
+        self.ttl = self.options['ttl']
+
+    def setup_pyramid(self, config):
+        from . import api
+        api.setup_pyramid(self, config)
+
+    def submit(self, handler, params, user=None):
+        """ Put the job into the queue and notify workers. The job is
+        visible to workers only after the current transaction is
+        committed. """
+
+        if handler not in JobHandler.registry:
+            raise ValueError("Job handler '%s' not found!" % handler)
+
+        job = Job(
+            handler=handler, params=params, status='pending',
+            created=datetime.utcnow(),
+            user_id=user.id if user is not None else None,
+        ).persist()
+        DBSession.flush()
+
+        notify(self._notify_key)
+        return job
+
+    def claim(self):
+        """ Lock the oldest pending job and mark it running. Concurrent
+        workers skip jobs locked by each other. """
+
+        with transaction.manager:
+            job = Job.filter_by(status='pending').order_by(Job.id) \
+                .with_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+
+            now = datetime.utcnow()
+            job.status = 'running'
+            job.started = now
+            job.heartbeat = now
+            return job.id
+
+    def execute(self, job_id):
+        self.logger.info("Executing job %d...", job_id)
+
+        try:
+            with transaction.manager:
+                job = Job.filter_by(id=job_id).one()
+                handler = JobHandler.registry[job.handler]()
+                ctx = JobContext(self, job)
+
+            if handler.manage_transaction:
+                with ctx:
+                    try:
+                        result = handler.run(ctx)
+                    except Exception:
+                        transaction.abort()
+                        raise
+                with transaction.manager:
+                    self._succeeded(job_id, ctx, result)
+            else:
+                with transaction.manager:
+                    with ctx:
+                        result = handler.run(ctx)
+                    self._succeeded(job_id, ctx, result)
+
+        except Exception as exc:
+            self.logger.exception("Job %d failed", job_id)
+            if isinstance(exc, UserException) and exc.message is not None:
+                error = exc.message
+            else:
+                error = exc.__class__.__name__
+            self._update(job_id, status='failed', error=error, finished=datetime.utcnow())
+            return False
+
+        self.logger.info("Job %d succeeded", job_id)
+        return True
+
+    def _succeeded(self, job_id, ctx, result):
+        # The job record is modified only here because the progress is
+        # updated in separate transactions. It's reloaded as handlers
+        # managing transactions expire previously loaded objects.
+        job = Job.filter_by(id=job_id).one()
+        job.status = 'succeeded'
+        job.finished = datetime.utcnow()
+        job.progress = 1
+        job.result = result
+        if ctx.fileobj is not None:
+            job.fileobj = ctx.fileobj
+            job.filename = ctx.filename
+            job.content_type = ctx.content_type
+
+    def worker(self, once=False):
+        """ Execute jobs from the queue. Workers are waked up with
+        notifications on new jobs and poll the queue periodically. """
+
+        event = threading.Event()
+        listener = self.env.core.notify_listener
+        listener.subscribe(self._notify_key, lambda key: event.set())
+        listener.ensure_started()
+
+        while True:
+            event.clear()
+            job_id = self.claim()
+            if job_id is not None:
+                self.execute(job_id)
+            elif once:
+                break
+            else:
+                event.wait(self.poll_interval.total_seconds())
+
+    def maintenance(self):
+        super(JobsComponent, self).maintenance()
+        self.cleanup()
+
+    def cleanup(self):
+        self.logger.info("Cleaning up jobs...")
+        now = datetime.utcnow()
+
+        with transaction.manager:
+            stale = Job.filter(
+                Job.status == 'running',
+                Job.heartbeat < now - self.stale_timeout,
+            ).update(dict(
+                status='failed', finished=now,
+                error="Job was abandoned by the worker",
+            ), synchronize_session=False)
+
+            deleted = 0
+            for job in Job.filter(
+                Job.status.in_(('succeeded', 'failed')),
+                Job.finished < now - self.ttl,
+            ):
+                fileobj = job.fileobj
+                DBSession.delete(job)
+                if fileobj is not None:
+                    DBSession.delete(fileobj)
+                deleted += 1
+
+        self.logger.info("Jobs failed as stale: %d, deleted: %d", stale, deleted)
+
+    def query_stat(self):
+        query = DBSession.query(Job.status, db.func.count(Job.id)).group_by(Job.status)
+        return dict(status=dict(query.all()))
+
+    def _update(self, job_id, **values):
+        # Executed in a separate transaction to be visible immediately
+        self.env.core.engine.execute(Job.__table__.update().where(
+            Job.__table__.c.id == job_id).values(**values))
+
+    _notify_key = COMP_ID + '.submit'
+
+    option_annotations = (
+        Option('worker.poll_interval', timedelta, default=timedelta(seconds=30),
+               doc="Interval of queue polling by workers, new jobs are also "
+               "announced with notifications."),
+        Option('heartbeat_interval', timedelta, default=timedelta(seconds=30)),
+        Option('progress_interval', timedelta, default=timedelta(seconds=1),
+               doc="Minimum interval between job progress updates."),
+        Option('stale_timeout', timedelta, default=timedelta(minutes=10),
+               doc="Running jobs without heartbeat are failed after this timeout."),
+        Option('ttl', timedelta, default=timedelta(days=7),
+               doc="Finished jobs and their result files are deleted after this interval."),
+    )
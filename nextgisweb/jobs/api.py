@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import json
+
+from pyramid.httpexceptions import HTTPForbidden, HTTPNotFound
+from pyramid.response import Response, FileResponse
+
+from ..env import env
+
+from .model import Job
+
+
+def job_response(request, job):
+    """ Response for the submitted job with its status and location """
+
+    location = request.route_url('jobs.item', id=job.id)
+    return Response(
+        json.dumps(job.serialize()), status=202,
+        content_type='application/json', charset='utf-8',
+        location=location)
+
+
+def _job(request):
+    job = Job.filter_by(id=int(request.matchdict['id'])).one_or_none()
+    if job is None:
+        raise HTTPNotFound()
+
+    user = request.user
+    if job.user_id != user.id and not user.is_administrator:
+        raise HTTPForbidden()
+
+    return job
+
+
+def item(request):
+    job = _job(request)
+    result = job.serialize()
+    if job.fileobj is not None:
+        result['file']['url'] = request.route_url('jobs.file', id=job.id)
+    return result
+
+
+def file(request):
+    job = _job(request)
+    if job.fileobj is None:
+        raise HTTPNotFound()
+
+    response = FileResponse(
+        env.file_storage.filename(job.fileobj),
+        content_type=job.content_type, request=request)
+    response.content_disposition = 'attachment; filename=%s' % job.filename
+    return response
+
+
+def setup_pyramid(comp, config):
+    config.add_route(
+        'jobs.item', r'/api/component/jobs/{id:\d+}'
+    ).add_view(item, request_method='GET', renderer='json')
+
+    config.add_route(
+        'jobs.file', r'/api/component/jobs/{id:\d+}/file'
+    ).add_view(file, request_method='GET')
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+from ..command import Command
+
+
+@Command.registry.register
+class WorkerCommand():
+    identity = 'jobs.worker'
+
+    @classmethod
+    def argparser_setup(cls, parser, env):
+        parser.add_argument(
+            '--once', action='store_true', default=False,
+            help="Exit when the job queue is empty")
+
+    @classmethod
+    def execute(cls, args, env):
+        env.jobs.worker(once=args.once)
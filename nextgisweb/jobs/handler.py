@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import threading
+from datetime import datetime
+
+from ..env import env
+from ..registry import registry_maker
+
+from .util import COMP_ID
+
+
+class JobHandler(object):
+    """ Base class for background job handlers. Handlers are registered
+    by identity and executed by ``jobs.worker`` processes inside of the
+    database transaction unless ``manage_transaction`` is set, see
+    :py:meth:`JobsComponent.submit`. """
+
+    registry = registry_maker()
+
+    identity = None
+
+    # Handlers which commit the transaction themselves (e.g. long-running
+    # jobs committing intermediate results) are executed outside of the
+    # transaction, and the job is reloaded to store its final status.
+    manage_transaction = False
+
+    @classmethod
+    def submit(cls, user=None, **params):
+        return env.jobs.submit(cls.identity, params, user=user)
+
+    def run(self, ctx):
+        raise NotImplementedError()
+
+
+class JobContext(object):
+    """ Execution context passed to :py:meth:`JobHandler.run` """
+
+    def __init__(self, comp, job):
+        self.comp = comp
+        self.job_id = job.id
+        self.params = job.params
+        self.user_id = job.user_id
+
+        self.fileobj = None
+        self.filename = None
+        self.content_type = None
+
+        self._reported = None
+        self._stop = threading.Event()
+
+    def progress(self, value, message=None):
+        """ Report job progress (a value from 0 to 1) and an optional
+        status message. Reports are written in a separate transaction and
+        throttled to ``progress_interval``. """
+
+        now = datetime.utcnow()
+        if (
+            self._reported is not None and value < 1
+            and now - self._reported < self.comp.progress_interval
+        ):
+            return
+
+        self._reported = now
+        self.comp._update(self.job_id, progress=value, message=message, heartbeat=now)
+
+    def result_file(self, src, filename, content_type='application/octet-stream'):
+        """ Store the file (a path or file-like object) as the job result
+        artifact in file storage """
+
+        fileobj = env.file_storage.fileobj(component=COMP_ID)
+        env.file_storage.write_file(fileobj, src)
+
+        self.fileobj = fileobj
+        self.filename = filename
+        self.content_type = content_type
+
+    def __enter__(self):
+        thread = threading.Thread(target=self._heartbeat, name='JobHeartbeat')
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+
+    def _heartbeat(self):
+        # Running jobs without heartbeat for a long time are considered
+        # abandoned by crashed workers, see JobsComponent.cleanup.
+        interval = self.comp.heartbeat_interval.total_seconds()
+        while not self._stop.wait(interval):
+            try:
+                self.comp._update(self.job_id, heartbeat=datetime.utcnow())
+            except Exception:
+                self.comp.logger.exception("Failed to update heartbeat of job %d", self.job_id)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+from collections import OrderedDict
+
+from .. import db
+from ..auth import User
+from ..file_storage import FileObj
+from ..models import declarative_base
+
+Base = declarative_base()
+
+JOB_STATUS = ('pending', 'running', 'succeeded', 'failed')
+
+
+class Job(Base):
+    __tablename__ = 'jobs_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    handler = db.Column(db.Unicode, nullable=False)
+    params = db.Column(db.JSONText, nullable=False)
+    status = db.Column(db.Enum(*JOB_STATUS), nullable=False, default='pending')
+    progress = db.Column(db.Float)
+    message = db.Column(db.Unicode)
+    error = db.Column(db.Unicode)
+    result = db.Column(db.JSONText)
+    user_id = db.Column(db.ForeignKey(User.id))
+    created = db.Column(db.DateTime, nullable=False)
+    started = db.Column(db.DateTime)
+    finished = db.Column(db.DateTime)
+    heartbeat = db.Column(db.DateTime)
+    fileobj_id = db.Column(db.ForeignKey(FileObj.id))
+    filename = db.Column(db.Unicode)
+    content_type = db.Column(db.Unicode)
+
+    fileobj = db.relationship(FileObj, lazy='joined')
+
+    __table_args__ = (
+        db.Index('jobs_job_status_id_idx', status, id),
+    )
+
+    def serialize(self):
+        def _dt(value):
+            return value.isoformat() if value is not None else None
+
+        return OrderedDict((
+            ('id', self.id),
+            ('handler', self.handler),
+            ('status', self.status),
+            ('progress', self.progress),
+            ('message', self.message),
+            ('error', self.error),
+            ('result', self.result),
+            ('created', _dt(self.created)),
+            ('started', _dt(self.started)),
+            ('finished', _dt(self.finished)),
+            ('file', OrderedDict((
+                ('filename', self.filename),
+                ('content_type', self.content_type),
+                ('size', self.fileobj.size),
+            )) if self.fileobj is not None else None),
+        ))
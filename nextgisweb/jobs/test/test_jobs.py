@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import io
+
+import pytest
+import transaction
+
+from nextgisweb.auth import User
+from nextgisweb.jobs import Job, JobHandler
+from nextgisweb.models import DBSession
+
+
+@JobHandler.registry.register
+class EchoJob(JobHandler):
+    identity = 'test.echo'
+
+    def run(self, ctx):
+        if ctx.params.get('fail'):
+            raise ValueError()
+
+        ctx.progress(0.5, "Half done")
+        content = ctx.params['content'].encode('utf-8')
+        ctx.result_file(io.BytesIO(content), 'echo.txt', 'text/plain')
+        return dict(echo=ctx.params['content'])
+
+
+@pytest.fixture()
+def submit(ngw_env):
+    job_ids = []
+
+    def _submit(**params):
+        with transaction.manager:
+            job = EchoJob.submit(user=User.by_keyname('administrator'), **params)
+            job_ids.append(job.id)
+            return job.id
+
+    yield _submit
+
+    with transaction.manager:
+        for job in Job.filter(Job.id.in_(job_ids)):
+            fileobj = job.fileobj
+            DBSession.delete(job)
+            if fileobj is not None:
+                DBSession.delete(fileobj)
+
+
+def test_execute(submit, ngw_env, ngw_webtest_app, ngw_auth_administrator):
+    job_id = submit(content='echo')
+
+    resp = ngw_webtest_app.get('/api/component/jobs/%d' % job_id, status=200)
+    assert resp.json['status'] == 'pending'
+
+    assert ngw_env.jobs.claim() == job_id
+    assert ngw_env.jobs.execute(job_id)
+
+    resp = ngw_webtest_app.get('/api/component/jobs/%d' % job_id, status=200)
+    assert resp.json['status'] == 'succeeded'
+    assert resp.json['progress'] == 1
+    assert resp.json['result'] == dict(echo='echo')
+    assert resp.json['file']['filename'] == 'echo.txt'
+
+    resp = ngw_webtest_app.get(resp.json['file']['url'], status=200)
+    assert resp.body == b'echo'
+
+
+def test_failed(submit, ngw_env, ngw_webtest_app, ngw_auth_administrator):
+    job_id = submit(fail=True)
+
+    ngw_env.jobs.worker(once=True)
+
+    resp = ngw_webtest_app.get('/api/component/jobs/%d' % job_id, status=200)
+    assert resp.json['status'] == 'failed'
+    assert resp.json['error'] == 'ValueError'
+    assert resp.json['file'] is None
+
+
+def test_forbidden(submit, ngw_webtest_app):
+    job_id = submit(content='echo')
+    ngw_webtest_app.get('/api/component/jobs/%d' % job_id, status=403)
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+
+from ..i18n import trstring_factory
+
+COMP_ID = 'jobs'
+_ = trstring_factory(COMP_ID)
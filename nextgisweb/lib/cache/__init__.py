@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, unicode_literals, print_function, absolute_import
+from collections import OrderedDict
+from threading import Lock
+from time import time
+
+__all__ = ['TTLCache']
+
+
+class TTLCache(object):
+    """ Thread-safe size-bounded LRU cache with per-item expiration.
+    Least recently used items are evicted when maxsize is exceeded and
+    expired items are evicted on access. Optionally the total weight of
+    items, given by the weigher function, is limited with maxweight. """
+
+    def __init__(self, maxsize, ttl=None, timer=time, maxweight=None, weigher=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.maxweight = maxweight
+        self.weigher = weigher
+        self.weight = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires, weight = self._data.pop(key)
+            except KeyError:
+                return default
+            if expires is not None and expires <= self.timer():
+                self.weight -= weight
+                return default
+            self._data[key] = (value, expires, weight)
+            return value
+
+    def put(self, key, value, ttl=None):
+        """ Put value into the cache. Item TTL in seconds defaults to
+        cache TTL, and ``None`` means that item never expires. """
+
+        if ttl is None:
+            ttl = self.ttl
+
+        if ttl is not None and ttl <= 0:
+            return
+
+        weight = 0
+        if self.maxweight is not None:
+            weight = self.weigher(value)
+            if weight > self.maxweight:
+                return
+
+        expires = (self.timer() + ttl) if ttl is not None else None
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, expires, weight)
+            self.weight += weight
+            while len(self._data) > self.maxsize or (
+                self.maxweight is not None and self.weight > self.maxweight
+            ):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self.weight -= evicted
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def _pop(self, key, default=None):
+        value, expires, weight = self._data.pop(key, (default, None, 0))
+        self.weight -= weight
+        return value
+
+    def __contains__(self, key):
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, unicode_literals, print_function, absolute_import
+
+from nextgisweb.lib.cache import TTLCache
+
+
+class Timer(object):
+
+    def __init__(self):
+        self.value = 0
+
+    def __call__(self):
+        return self.value
+
+
+def test_lru():
+    cache = TTLCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+
+    # Key 'b' is the least recently used now
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+    assert cache.pop('a') == 1
+    assert cache.get('a', 'default') == 'default'
+
+
+def test_ttl():
+    timer = Timer()
+    cache = TTLCache(maxsize=10, ttl=10, timer=timer)
+    cache.put('default', 1)
+    cache.put('short', 2, ttl=5)
+    cache.put('expired', 3, ttl=0)
+    assert 'expired' not in cache
+
+    timer.value = 5
+    assert cache.get('default') == 1
+    assert cache.get('short') is None
+
+    timer.value = 10
+    assert cache.get('default') is None
+    assert len(cache) == 0
+
+
+def test_weight():
+    cache = TTLCache(maxsize=10, maxweight=10, weigher=len)
+    cache.put('a', 'aaaa')
+    cache.put('b', 'bbbb')
+    assert cache.weight == 8
+
+    # Key 'a' is evicted to fit the weight limit
+    cache.put('c', 'cccc')
+    assert 'a' not in cache
+    assert cache.weight == 8
+
+    # Items heavier than the limit are not cached
+    cache.put('d', 'd' * 11)
+    assert 'd' not in cache
+    assert 'b' in cache and 'c' in cache
+
+    cache.put('b', 'b')
+    assert cache.weight == 5
+    assert cache.pop('c') == 'cccc'
+    assert cache.weight == 1
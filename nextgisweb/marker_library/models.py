@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
-from shutil import copyfileobj
 
 import sqlalchemy as sa
 import sqlalchemy.orm as orm
@@ -44,9 +43,6 @@ class Marker(Base):
 
     def load_file(self, fp):
         fileobj = env.file_storage.fileobj('marker_library')
-        filename = env.file_storage.filename(fileobj, makedirs=True)
-
-        with open(filename, 'wb') as fd:
-            copyfileobj(fp, fd)
+        env.file_storage.write_file(fileobj, fp)
 
         self.fileobj = fileobj
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
+import threading
+
 from ..component import Component, require
 from .model import Base, PostgisConnection, PostgisLayer
 
@@ -13,6 +15,7 @@ class PostgisComponent(Component):
     def initialize(self):
         super(PostgisComponent, self).initialize()
         self._engine = dict()
+        self._engine_lock = threading.Lock()
 
     @require('feature_layer')
     def setup_pyramid(self, config):
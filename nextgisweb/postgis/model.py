@@ -40,7 +40,12 @@ from ..feature_layer import (
     IFeatureQueryFilterBy,
     IFeatureQueryLike,
     IFeatureQueryIntersects,
-    IFeatureQueryOrderBy)
+    IFeatureQueryOrderBy,
+    IFeatureQueryOrderByDistance,
+    IFeatureQueryAggregate,
+    IFeatureQueryGeomFormat)
+from ..feature_layer.aggregate import aggregate
+from ..feature_layer.geomformat import geom_format_expr, geom_format_value
 
 from .util import _
 
@@ -74,6 +79,12 @@ class PostgisConnection(Base, Resource):
     def get_engine(self):
         comp = env.postgis
 
+        # Engines are created from request threads and threads fetching
+        # features of several layers concurrently, see identify
+        with comp._engine_lock:
+            return self._get_engine(comp)
+
+    def _get_engine(self, comp):
         # Need to check connection params to see if
         # they changed for each connection request
         credhash = (self.hostname, self.port, self.database, self.username, self.password)
@@ -547,12 +558,17 @@ class PostgisLayerSerializer(Serializer):
     IFeatureQueryLike,
     IFeatureQueryIntersects,
     IFeatureQueryOrderBy,
+    IFeatureQueryOrderByDistance,
+    IFeatureQueryAggregate,
+    IFeatureQueryGeomFormat,
 )
 class FeatureQueryBase(object):
 
     def __init__(self):
         self._srs = None
         self._geom = None
+        self._geom_format = None
+        self._geom_precision = None
         self._box = None
 
         self._fields = None
@@ -565,6 +581,8 @@ class FeatureQueryBase(object):
         self._intersects = None
 
         self._order_by = None
+        self._order_by_distance = None
+        self._max_distance = None
 
     def srs(self, srs):
         self._srs = srs
@@ -572,6 +590,10 @@ class FeatureQueryBase(object):
     def geom(self):
         self._geom = True
 
+    def geom_format(self, format, precision=None):
+        self._geom_format = format
+        self._geom_precision = precision
+
     def box(self):
         self._box = True
 
@@ -591,12 +613,21 @@ class FeatureQueryBase(object):
     def order_by(self, *args):
         self._order_by = args
 
+    def order_by_distance(self, geom, max_distance=None):
+        self._order_by_distance = geom
+        self._max_distance = max_distance
+
     def like(self, value):
         self._like = value
 
     def intersects(self, geom):
         self._intersects = geom
 
+    def aggregate(self, keyname, stats=(), distinct=None, histogram=None, bins=10):
+        return self().aggregate(
+            keyname, stats=stats, distinct=distinct,
+            histogram=histogram, bins=bins)
+
     def __call__(self):
         tab = db.sql.table(self.layer.table)
         tab.schema = self.layer.schema
@@ -618,7 +649,12 @@ class FeatureQueryBase(object):
         geomexpr = db.func.st_transform(geomcol, srsid)
 
         if self._geom:
-            addcol(db.func.st_astext(geomexpr).label('geom'))
+            if self._geom_format is not None:
+                addcol(geom_format_expr(
+                    geomexpr, self._geom_format,
+                    self._geom_precision).label('geom'))
+            else:
+                addcol(db.func.st_astext(geomexpr).label('geom'))
 
         fieldmap = []
         for idx, fld in enumerate(self.layer.fields, start=1):
@@ -684,16 +720,35 @@ class FeatureQueryBase(object):
         select.append_whereclause(db.func.geometrytype(db.sql.column(
             self.layer.column_geom)).in_((gt, )))
 
+        if self._order_by_distance is not None:
+            # KNN operator <-> uses the spatial index when it goes first
+            distgeom = db.func.st_transform(db.func.st_setsrid(db.func.st_geomfromtext(
+                self._order_by_distance.wkt), self._order_by_distance.srid),
+                self.layer.geometry_srid)
+            select.append_order_by(geomcol.op('<->')(distgeom))
+            addcol(db.func.st_distance(geomcol, distgeom).label('distance'))
+            if self._max_distance is not None:
+                select.append_whereclause(db.func.st_dwithin(
+                    geomcol, distgeom, self._max_distance))
+
         if self._order_by:
             for order, colname in self._order_by:
                 select.append_order_by(dict(asc=db.asc, desc=db.desc)[order](
                     db.sql.column(colname)))
         select.append_order_by(idcol)
 
+        # Connection attributes are loaded here, so features can be
+        # fetched in another thread without the database session.
+        connection = self.layer.connection
+        connection.get_engine()
+
         class QueryFeatureSet(FeatureSet):
             layer = self.layer
+            concurrent = True
 
             _geom = self._geom
+            _geom_format = self._geom_format
+            _distance = self._order_by_distance is not None
             _box = self._box
             _fields = self._fields
             _limit = self._limit
@@ -705,20 +760,27 @@ class FeatureQueryBase(object):
                 else:
                     query = select
 
-                conn = self.layer.connection.get_connection()
+                conn = connection.get_connection()
 
                 try:
                     for row in conn.execute(query):
                         fdict = dict((k, row[l]) for k, l in fieldmap)
 
-                        if self._geom:
+                        geom = geom_encoded = None
+                        if self._geom and self._geom_format is not None:
+                            geom_encoded = geom_format_value(row['geom'], self._geom_format)
+                        elif self._geom:
                             geom = geom_from_wkt(row['geom'])
-                        else:
-                            geom = None
+
+                        calculated = dict()
+                        if self._distance:
+                            calculated['distance'] = row['distance']
 
                         yield Feature(
                             layer=self.layer, id=row['id'],
                             fields=fdict, geom=geom,
+                            geom_encoded=geom_encoded,
+                            calculations=calculated,
                             box=box(
                                 row['box_left'], row['box_bottom'],
                                 row['box_right'], row['box_top']
@@ -741,4 +803,15 @@ class FeatureQueryBase(object):
                 finally:
                     conn.close()
 
+            def aggregate(self, keyname, **kwargs):
+                column = self.layer.field_by_keyname(keyname).column_name
+                source = select.with_only_columns([
+                    db.sql.column(column).label('value'), ]).order_by(None)
+
+                conn = self.layer.connection.get_connection()
+                try:
+                    return aggregate(conn, source, **kwargs)
+                finally:
+                    conn.close()
+
         return QueryFeatureSet()
@@ -16,7 +16,7 @@ from .util import (
     gensecret,
     persistent_secret)
 from .model import Base, Session, SessionStore
-from .command import ServerCommand  # NOQA
+from .command import ServerCommand, CompressStaticCommand  # NOQA
 
 __all__ = ['viewargs', ]
 
@@ -106,6 +106,10 @@ class PyramidComponent(Component):
 
         Option('backup.download', bool, default=False),
 
+        Option('session.backend', str, default='db',
+               doc="Session storage backend: db or cookie. Cookie backend "
+                   "keeps session data in a signed and encrypted cookie."),
+
         Option('session.cookie.name', str, default='ngw-sid',
                doc="Session cookie name"),
 
@@ -115,6 +119,17 @@ class PyramidComponent(Component):
         Option('session.activity_delta', timedelta, default=timedelta(minutes=10),
                doc="Session last activity update time delta in seconds."),
 
+        Option('compression.enabled', bool, default=True,
+               doc="Compress responses with gzip or brotli (if installed) "
+                   "according to Accept-Encoding request header."),
+
+        Option('compression.min_size', int, default=1024,
+               doc="Responses with known size below this limit (in bytes) "
+                   "are not compressed."),
+
+        Option('compression.gzip_level', int, default=6),
+        Option('compression.brotli_quality', int, default=4),
+
         Option('debugtoolbar.enabled', bool),
         Option('debugtoolbar.hosts'),
     )
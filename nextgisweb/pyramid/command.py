@@ -40,3 +40,29 @@ class ServerCommand(Command):
         serve(
             app, host=args.host, port=args.port, threads=1,
             clear_untrusted_proxy_headers=True)
+
+
+@Command.registry.register
+class CompressStaticCommand(Command):
+    identity = 'pyramid.compress_static'
+    no_initialize = True
+
+    @classmethod
+    def argparser_setup(cls, parser, env):
+        parser.add_argument(
+            '--min-size', type=int, default=256,
+            help="Skip files smaller than this size in bytes")
+
+    @classmethod
+    def execute(cls, args, env):
+        from pkg_resources import resource_filename
+        from ..package import amd_packages
+        from .compression import compress_static
+
+        paths = [resource_filename('nextgisweb', 'static')]
+        for name, asset in amd_packages():
+            py_package, path = asset.split(':', 1)
+            paths.append(resource_filename(py_package, path))
+
+        written = compress_static(paths, min_size=args.min_size)
+        logger.info("Precompressed static files written: %d", written)
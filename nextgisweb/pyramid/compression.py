@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import io
+import os
+import os.path
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from ..env import env
+
+# Content types compressed by the tween, prefixes are matched
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/geo+json',
+    'application/javascript',
+    'application/x-javascript',
+    'application/xml',
+    'application/vnd.mapbox-vector-tile',
+    'image/svg+xml',
+)
+
+# Static file extensions for precompression
+STATIC_EXTENSIONS = (
+    '.js', '.css', '.html', '.htm', '.hbs', '.json', '.map', '.svg',
+    '.xml', '.txt', '.ttf', '.otf', '.eot',
+)
+
+# Variants of precompressed static files by encoding
+STATIC_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def available_encodings():
+    """ Supported content encodings in order of preference """
+    return ('br', 'gzip') if brotli is not None else ('gzip', )
+
+
+def accepted_encodings(request):
+    """ Set of content encodings accepted by the client """
+
+    header = request.headers.get('Accept-Encoding')
+    if header is None:
+        return set()
+
+    result = set()
+    for item in header.split(','):
+        parts = item.strip().split(';')
+        coding = parts[0].strip().lower()
+        quality = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        if coding != '' and quality > 0:
+            result.add(coding)
+
+    return result
+
+
+class _GzipCompressor(object):
+
+    def __init__(self, level):
+        # Offset of 16 makes zlib write gzip header and trailer
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _BrotliCompressor(object):
+
+    def __init__(self, quality):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.finish()
+
+
+def compressor(encoding, level=None):
+    if encoding == 'gzip':
+        return _GzipCompressor(6 if level is None else level)
+    elif encoding == 'br':
+        return _BrotliCompressor(4 if level is None else level)
+    raise ValueError("Unsupported encoding: %s" % encoding)
+
+
+def compress_iter(app_iter, comp):
+    """ Compress response body chunks as they are produced, so streamed
+    responses are not buffered in memory """
+
+    try:
+        for chunk in app_iter:
+            data = comp.compress(chunk)
+            if data:
+                yield data
+        yield comp.flush()
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+
+def _compressible(request, response, min_size):
+    if request.method == 'HEAD' or response.status_code != 200:
+        return False
+
+    if response.content_encoding is not None:
+        return False
+
+    if response.content_length is not None and response.content_length < min_size:
+        return False
+
+    content_type = response.content_type
+    if content_type is None:
+        return False
+
+    for prefix in COMPRESSIBLE_TYPES:
+        if content_type.startswith(prefix):
+            return True
+
+    return False
+
+
+def compression_tween_factory(handler, registry):
+    """ Tween compresses responses with gzip or brotli (if available)
+    according to the Accept-Encoding request header """
+
+    options = env.pyramid.options.with_prefix('compression')
+    if not options['enabled']:
+        return handler
+
+    min_size = options['min_size']
+    levels = dict(gzip=options['gzip_level'], br=options['brotli_quality'])
+
+    def compression_tween(request):
+        response = handler(request)
+
+        if not _compressible(request, response, min_size):
+            return response
+
+        vary = tuple(response.vary or ())
+        if 'Accept-Encoding' not in vary:
+            response.vary = vary + ('Accept-Encoding', )
+
+        accepted = accepted_encodings(request)
+        for encoding in available_encodings():
+            if encoding in accepted:
+                break
+        else:
+            return response
+
+        comp = compressor(encoding, levels[encoding])
+        response.app_iter = compress_iter(response.app_iter, comp)
+        response.content_length = None
+        response.content_encoding = encoding
+
+        # Strong ETag should differ for encoded representations, but weak
+        # one still matches If-None-Match of the original response.
+        etag = response.headers.get('ETag')
+        if etag is not None and not etag.startswith('W/'):
+            response.headers['ETag'] = str('W/' + etag)
+
+        return response
+
+    return compression_tween
+
+
+def compress_file(filename, encodings=None):
+    """ Write precompressed variants of the file if they are missing or
+    outdated and return the number of written variants """
+
+    if encodings is None:
+        encodings = available_encodings()
+
+    mtime = os.path.getmtime(filename)
+    written = 0
+
+    for encoding, ext in STATIC_VARIANTS:
+        if encoding not in encodings:
+            continue
+
+        target = filename + ext
+        if os.path.isfile(target) and os.path.getmtime(target) >= mtime:
+            continue
+
+        # Maximum compression level, as it's done only once
+        comp = compressor(encoding, 9 if encoding == 'gzip' else 11)
+        with io.open(filename, 'rb') as src, io.open(target, 'wb') as dst:
+            dst.write(comp.compress(src.read()))
+            dst.write(comp.flush())
+
+        written += 1
+
+    return written
+
+
+def compress_static(paths, min_size=0):
+    """ Precompress static files with known extensions in directories """
+
+    written = 0
+    for path in paths:
+        for dirpath, dirnames, filenames in os.walk(path):
+            for fn in filenames:
+                if not fn.endswith(STATIC_EXTENSIONS):
+                    continue
+                filename = os.path.join(dirpath, fn)
+                if os.path.getsize(filename) < min_size:
+                    continue
+                written += compress_file(filename)
+
+    return written
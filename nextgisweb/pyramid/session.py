@@ -2,20 +2,28 @@
 from __future__ import division, absolute_import, print_function, unicode_literals
 
 import json
+import logging
+from base64 import urlsafe_b64encode
 from datetime import datetime
+from hashlib import sha256
 from six import text_type
 
 import transaction
 from pyramid.interfaces import ISession
-from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from zope.interface import implementer
+from zope.sqlalchemy import mark_changed
 
+from ..compat import lru_cache
+from ..core.exception import UserException
 from ..models import DBSession
 
 from .model import Session, SessionStore
-from .util import gensecret, datetime_to_unix
+from .util import _, gensecret, datetime_to_unix
 
-__all__ = ['WebSession']
+__all__ = ['WebSession', 'CookieSession', 'session_factory']
+
+_logger = logging.getLogger(__name__)
 
 cookie_settings = dict(
     path='/',
@@ -33,6 +41,16 @@ allowed_types = (
     tuple,
 )
 
+# Browsers ignore cookies larger than 4096 bytes including name and
+# attributes, so leave some space for them.
+COOKIE_VALUE_LIMIT = 3800
+
+
+class SessionTooLarge(UserException):
+    title = _("Session data too large")
+    message = _("Session data don't fit into the session cookie.")
+    http_status_code = 500
+
 
 def validate_value(v):
     t = type(v)
@@ -43,10 +61,35 @@ def validate_value(v):
     return True
 
 
+def array_to_tuple(v):
+    if type(v) == list:
+        v = tuple(array_to_tuple(_v) for _v in v)
+    return v
+
+
+def set_cookie(request, response, name, value, max_age):
+    settings = dict(cookie_settings)
+    settings['secure'] = request.scheme == 'https'
+    settings['max_age'] = max_age.total_seconds()
+    response.set_cookie(name, value=value, **settings)
+
+
+def session_factory(request):
+    """ Session factory which selects session backend according to
+    ``session.backend`` option value """
+
+    backend = request.env.pyramid.options['session.backend']
+    if backend == 'db':
+        return WebSession(request)
+    elif backend == 'cookie':
+        return CookieSession(request)
+    else:
+        raise ValueError("Invalid session backend: " + backend)
+
+
 @implementer(ISession)
 class WebSession(dict):
     def __init__(self, request):
-        self._refreshed = False
         self._updated = list()
         self._cleared = False
         self._deleted = list()
@@ -56,15 +99,27 @@ class WebSession(dict):
         self._last_activity = None
 
         if self._session_id is not None:
-            try:
-                actual_date = datetime.utcnow() - self._cookie_max_age
-                session = Session.filter(
-                    Session.id == self._session_id,
-                    Session.last_activity > actual_date).one()
+            # Session and all its keys are loaded with a single query.
+            # Sessions are small so it's cheaper than lazy key loading.
+            actual_date = datetime.utcnow() - self._cookie_max_age
+            rows = DBSession.query(
+                Session.created, Session.last_activity,
+                SessionStore.key, SessionStore.value
+            ).outerjoin(
+                SessionStore, SessionStore.session_id == Session.id
+            ).filter(
+                Session.id == self._session_id,
+                Session.last_activity > actual_date
+            ).all()
+
+            if len(rows) > 0:
                 self.new = False
-                self.created = datetime_to_unix(session.created)
-                self._last_activity = session.last_activity
-            except NoResultFound:
+                self.created = datetime_to_unix(rows[0].created)
+                self._last_activity = rows[0].last_activity
+                for row in rows:
+                    if row.key is not None:
+                        self._set_from_db(row.key, row.value)
+            else:
                 self._session_id = None
 
         if self._session_id is None:
@@ -72,90 +127,73 @@ class WebSession(dict):
             self.created = datetime_to_unix(datetime.utcnow())
 
         def check_save(request, response):
-            with transaction.manager:
-                utcnow = datetime.utcnow()
-
-                if self._session_id is not None:
-                    if self._cleared:
-                        SessionStore.filter(
-                            SessionStore.session_id == self._session_id,
-                            ~SessionStore.key.in_(self._updated)
-                        ).delete(synchronize_session=False)
-                    elif len(self._deleted) > 0:
-                        SessionStore.filter(
-                            SessionStore.session_id == self._session_id,
-                            SessionStore.key.in_(self._deleted)
-                        ).delete(synchronize_session=False)
-
-                    activity_delta = request.env.pyramid.options['session.activity_delta']
-                    if utcnow - self._last_activity > activity_delta:
-                        DBSession.query(Session).filter_by(
-                            id=self._session_id, last_activity=self._last_activity
-                        ).update(dict(last_activity=utcnow))
-
-                if len(self._updated) > 0:
-                    if self._session_id is None:
-                        self._session_id = gensecret(32)
-                        Session(
-                            id=self._session_id,
-                            created=utcnow,
-                            last_activity=utcnow
-                        ).persist()
-
-                    with DBSession.no_autoflush:
-                        for key in self._updated:
-                            try:
-                                kv = SessionStore.filter_by(
-                                    session_id=self._session_id,
-                                    key=key).one()
-                            except NoResultFound:
-                                kv = SessionStore(session_id=self._session_id, key=key).persist()
-                            kv.value = self._get_for_db(key)
+            utcnow = datetime.utcnow()
+            activity_delta = request.env.pyramid.options['session.activity_delta']
+
+            touch = self._session_id is not None and \
+                utcnow - self._last_activity > activity_delta
+            purge = self._session_id is not None and \
+                (self._cleared or len(self._deleted) > 0)
+
+            # Don't open a transaction if there is nothing to write
+            if touch or purge or len(self._updated) > 0:
+                with transaction.manager:
+                    self._save(utcnow, touch)
 
             if self._session_id:
-                cookie_settings['secure'] = request.scheme == 'https'
-                cookie_settings['max_age'] = self._cookie_max_age.total_seconds()
-                response.set_cookie(self._cookie_name, value=self._session_id, **cookie_settings)
+                set_cookie(request, response, self._cookie_name,
+                           self._session_id, self._cookie_max_age)
 
         request.add_response_callback(check_save)
 
+    def _save(self, utcnow, touch):
+        if self._session_id is not None:
+            if self._cleared:
+                SessionStore.filter(
+                    SessionStore.session_id == self._session_id,
+                    ~SessionStore.key.in_(self._updated)
+                ).delete(synchronize_session=False)
+            elif len(self._deleted) > 0:
+                SessionStore.filter(
+                    SessionStore.session_id == self._session_id,
+                    SessionStore.key.in_(self._deleted)
+                ).delete(synchronize_session=False)
+
+            if touch:
+                DBSession.query(Session).filter_by(
+                    id=self._session_id, last_activity=self._last_activity
+                ).update(dict(last_activity=utcnow))
+
+        if len(self._updated) > 0:
+            if self._session_id is None:
+                self._session_id = gensecret(32)
+                Session(
+                    id=self._session_id,
+                    created=utcnow,
+                    last_activity=utcnow
+                ).persist()
+                DBSession.flush()
+
+            # Flush all changed keys with a single upsert statement
+            stmt = pg_insert(SessionStore.__table__).values([
+                dict(session_id=self._session_id, key=key,
+                     value=self._get_for_db(key))
+                for key in self._updated])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=('session_id', 'key'),
+                set_=dict(value=stmt.excluded.value))
+            DBSession.execute(stmt)
+
+        mark_changed(DBSession())
+
     def _get_for_db(self, key):
         value = super(WebSession, self).__getitem__(key)
         return json.dumps(value)
 
     def _set_from_db(self, key, value):
-        value = json.loads(value)
-
-        def array_to_tuple(v):
-            if type(v) == list:
-                v = tuple(array_to_tuple(_v) for _v in v)
-            return v
-
-        value = array_to_tuple(value)
+        value = array_to_tuple(json.loads(value))
         super(WebSession, self).__setitem__(key, value)
 
-    @property
-    def _keys(self):
-        return super(WebSession, self).keys()
-
-    def _refresh_all(self):
-        if self._refreshed:
-            return
-        for kv in SessionStore.filter(SessionStore.session_id == self._session_id,
-                                      ~SessionStore.key.in_(self._keys)).all():
-            self._set_from_db(kv.key, kv.value)
-        self._refreshed = True
-
-    def _refresh(self, key):
-        if self._refreshed or key in self._keys:
-            return
-        if key not in self._deleted:
-            try:
-                kv = SessionStore.filter_by(session_id=self._session_id, key=key).one()
-                self._set_from_db(key, kv.value)
-            except NoResultFound:
-                pass
-
     # ISession
 
     def flash(self, msg, queue='', allow_duplicate=True):
@@ -169,38 +207,6 @@ class WebSession(dict):
 
     # dict
 
-    def __contains__(self, key, *args, **kwargs):
-        self._refresh(key)
-        return super(WebSession, self).__contains__(key, *args, **kwargs)
-
-    def keys(self, *args, **kwargs):
-        self._refresh_all()
-        return super(WebSession, self).keys(*args, **kwargs)
-
-    def values(self, *args, **kwargs):
-        self._refresh_all()
-        return super(WebSession, self).values(*args, **kwargs)
-
-    def items(self, *args, **kwargs):
-        self._refresh_all()
-        return super(WebSession, self).items(*args, **kwargs)
-
-    def __len__(self, *args, **kwargs):
-        self._refresh_all()
-        return super(WebSession, self).__len__(*args, **kwargs)
-
-    def __getitem__(self, key, *args, **kwargs):
-        self._refresh(key)
-        return super(WebSession, self).__getitem__(key, *args, **kwargs)
-
-    def get(self, key, *args, **kwargs):
-        self._refresh(key)
-        return super(WebSession, self).get(key, *args, **kwargs)
-
-    def __iter__(self, *args, **kwargs):
-        self._refresh_all()
-        return super(WebSession, self).__iter__(*args, **kwargs)
-
     def __setitem__(self, key, value, *args, **kwargs):
         validate_value(value)
         if key not in self._updated:
@@ -216,7 +222,6 @@ class WebSession(dict):
         raise NotImplementedError()
 
     def __delitem__(self, key, *args, **kwargs):
-        self._refresh(key)
         if key not in self._deleted:
             self._deleted.append(key)
         if key in self._updated:
@@ -233,5 +238,133 @@ class WebSession(dict):
         del self._updated[:]
         del self._deleted[:]
         self._cleared = True
-        self._refreshed = True
         return super(WebSession, self).clear(*args, **kwargs)
+
+
+@lru_cache(maxsize=4)
+def _fernet(secret):
+    from cryptography.fernet import Fernet
+    key = urlsafe_b64encode(sha256(('session:' + secret).encode('utf-8')).digest())
+    return Fernet(key)
+
+
+@implementer(ISession)
+class CookieSession(dict):
+    """ Stateless session backend which keeps session data in a signed
+    and encrypted cookie. It doesn't make any database queries, but it's
+    suitable only for small sessions like authentication state. """
+
+    def __init__(self, request):
+        from cryptography.fernet import InvalidToken
+
+        self._changed = False
+        self._cookie_name = request.env.pyramid.options['session.cookie.name']
+        self._cookie_max_age = request.env.pyramid.options['session.cookie.max_age']
+        self._accessed = None
+
+        self.new = True
+        self.created = datetime_to_unix(datetime.utcnow())
+
+        self._fernet = fernet = _fernet(request.env.pyramid.secret)
+
+        cookie = request.cookies.get(self._cookie_name)
+        if cookie is not None:
+            try:
+                payload = fernet.decrypt(
+                    cookie.encode('ascii'),
+                    ttl=int(self._cookie_max_age.total_seconds()))
+            except (InvalidToken, UnicodeError):
+                # Tampered or expired cookie or session identifier
+                # issued by the database session backend.
+                pass
+            else:
+                data = json.loads(payload.decode('utf-8'))
+                self.new = False
+                self.created = data['created']
+                self._accessed = data['accessed']
+                for k, v in data['store'].items():
+                    super(CookieSession, self).__setitem__(k, array_to_tuple(v))
+
+        def check_save(request, response):
+            now = datetime_to_unix(datetime.utcnow())
+            activity_delta = request.env.pyramid.options['session.activity_delta']
+
+            if not self._changed and (self.new or (
+                now - self._accessed <= activity_delta.total_seconds()
+            )):
+                return
+
+            if len(self) == 0:
+                if not self.new:
+                    response.delete_cookie(
+                        self._cookie_name, path=cookie_settings['path'],
+                        domain=cookie_settings['domain'])
+                return
+
+            # The size is checked on modification, see __setitem__, so the
+            # view gets an error instead of the broken response here.
+            value = self._encode(now)
+            if len(value) > COOKIE_VALUE_LIMIT:
+                _logger.error("Session data is too large for the cookie backend!")
+                return
+
+            set_cookie(request, response, self._cookie_name,
+                       value, self._cookie_max_age)
+
+        request.add_response_callback(check_save)
+
+    def _encode(self, accessed):
+        payload = json.dumps(dict(
+            created=self.created, accessed=accessed,
+            store=dict(self.items())))
+        return self._fernet.encrypt(payload.encode('utf-8')).decode('ascii')
+
+    # ISession
+
+    def flash(self, msg, queue='', allow_duplicate=True):
+        raise NotImplementedError()
+
+    def pop_flash(self, queue=''):
+        raise NotImplementedError()
+
+    def peek_flash(self, queue=''):
+        raise NotImplementedError()
+
+    # dict
+
+    def __setitem__(self, key, value, *args, **kwargs):
+        validate_value(value)
+
+        missing = key not in self
+        previous = self.get(key)
+        super(CookieSession, self).__setitem__(key, value, *args, **kwargs)
+
+        if len(self._encode(datetime_to_unix(datetime.utcnow()))) > COOKIE_VALUE_LIMIT:
+            if missing:
+                super(CookieSession, self).__delitem__(key)
+            else:
+                super(CookieSession, self).__setitem__(key, previous)
+            raise SessionTooLarge()
+
+        self._changed = True
+
+    def __delitem__(self, key, *args, **kwargs):
+        result = super(CookieSession, self).__delitem__(key, *args, **kwargs)
+        self._changed = True
+        return result
+
+    def setdefault(self, *args, **kwargs):
+        raise NotImplementedError()
+
+    def update(self, *args, **kwargs):
+        raise NotImplementedError()
+
+    def pop(self, *args, **kwargs):
+        raise NotImplementedError()
+
+    def popitem(self, *args, **kwargs):
+        raise NotImplementedError()
+
+    def clear(self, *args, **kwargs):
+        self._changed = True
+        return super(CookieSession, self).clear(*args, **kwargs)
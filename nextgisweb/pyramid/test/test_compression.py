@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import gzip
+import io
+
+import pytest
+from webob import Request
+
+from nextgisweb.pyramid.compression import (
+    accepted_encodings, compressor, compress_iter, compress_file)
+
+
+@pytest.fixture(scope='module')
+def webtest(ngw_webtest_factory):
+    return ngw_webtest_factory()
+
+
+def _gunzip(data):
+    return gzip.GzipFile(fileobj=io.BytesIO(data)).read()
+
+
+@pytest.mark.parametrize('header, expected', (
+    (None, set()),
+    ('gzip', {'gzip'}),
+    ('gzip, deflate, br', {'gzip', 'deflate', 'br'}),
+    ('br;q=0, gzip;q=0.5', {'gzip'}),
+    ('identity', {'identity'}),
+))
+def test_accepted_encodings(header, expected):
+    headers = dict() if header is None else {'Accept-Encoding': header}
+    assert accepted_encodings(Request.blank('/', headers=headers)) == expected
+
+
+def test_compress_iter():
+    closed = []
+
+    class AppIter(object):
+        def __iter__(self):
+            return iter([b'foo' * 100, b'', b'bar' * 100])
+
+        def close(self):
+            closed.append(True)
+
+    data = b''.join(compress_iter(AppIter(), compressor('gzip')))
+    assert _gunzip(data) == b'foo' * 100 + b'bar' * 100
+    assert closed == [True]
+
+
+def test_compress_file(tmp_path):
+    fn = str(tmp_path / 'test.js')
+    with io.open(fn, 'wb') as fd:
+        fd.write(b'var a = 1;\n' * 100)
+
+    assert compress_file(fn, encodings=('gzip', )) == 1
+    with io.open(fn + '.gz', 'rb') as fd:
+        assert _gunzip(fd.read()) == b'var a = 1;\n' * 100
+
+    # Up-to-date variant is not written again
+    assert compress_file(fn, encodings=('gzip', )) == 0
+
+
+def test_tween(webtest):
+    url = '/api/component/pyramid/route'
+
+    resp = webtest.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in resp.headers['Vary']
+    assert resp.json == webtest.get(url).json
+
+    resp = webtest.get(url, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in resp.headers
+    assert 'Accept-Encoding' in resp.headers['Vary']
+
+
+def test_static(webtest, ngw_env):
+    static_key = ngw_env.pyramid.static_key
+    resp = webtest.get('/static{}/amd/ngw-pyramid/CORSForm.js'.format(static_key))
+    assert resp.cache_control.max_age == ngw_env.pyramid.static_max_age
@@ -12,6 +12,7 @@ from pyramid.response import Response
 from six.moves.http_cookies import SimpleCookie
 
 from nextgisweb.pyramid import Session, SessionStore
+from nextgisweb.pyramid.session import SessionTooLarge
 
 
 prefix = '_test_'
@@ -271,3 +272,70 @@ def test_session_start(handler, expect, ngw_webtest_app, webapp_handler):
     with webapp_handler(_handler):
         ngw_webtest_app.get('/test/request/')
         assert ('ngw-sid' in ngw_webtest_app.cookies) == expect
+
+
+@pytest.fixture()
+def cookie_backend(ngw_env, ngw_webtest_app):
+    ngw_webtest_app.reset()
+    with ngw_env.pyramid.options.override({'session.backend': 'cookie'}):
+        yield
+    ngw_webtest_app.reset()
+
+
+def test_cookie_backend(cookie_backend, ngw_env, ngw_webtest_app, webapp_handler):
+    value = ('nested', (1, 2.5, True, None))
+
+    def _set(request):
+        request.session['foo'] = value
+        request.session['bar'] = 'bar'
+        return Response()
+
+    def _get(request):
+        assert request.session['foo'] == value
+        assert request.session['bar'] == 'bar'
+        del request.session['bar']
+        return Response()
+
+    def _check(request):
+        assert request.session['foo'] == value
+        assert 'bar' not in request.session
+        return Response()
+
+    for req in (_set, _get, _check):
+        with webapp_handler(req):
+            ngw_webtest_app.get('/test/request/')
+
+    cookie_name = ngw_env.pyramid.options['session.cookie.name']
+    session_id = ngw_webtest_app.cookies[cookie_name]
+    assert Session.filter_by(id=session_id).first() is None
+
+
+def test_cookie_backend_tampered(cookie_backend, ngw_env, ngw_webtest_app, webapp_handler):
+    def _check(request):
+        assert request.session.new
+        assert 'foo' not in request.session
+        return Response()
+
+    cookie_name = ngw_env.pyramid.options['session.cookie.name']
+    ngw_webtest_app.set_cookie(cookie_name, 'invalid')
+    with webapp_handler(_check):
+        ngw_webtest_app.get('/test/request/')
+
+
+def test_cookie_backend_too_large(cookie_backend, ngw_env, ngw_webtest_app, webapp_handler):
+    def _set(request):
+        request.session['foo'] = 'foo'
+        with pytest.raises(SessionTooLarge):
+            request.session['bar'] = 'x' * 4096
+
+        # Session isn't changed by the failed assignment
+        assert 'bar' not in request.session
+        return Response()
+
+    def _check(request):
+        assert request.session['foo'] == 'foo'
+        return Response()
+
+    for req in (_set, _check):
+        with webapp_handler(req):
+            ngw_webtest_app.get('/test/request/')
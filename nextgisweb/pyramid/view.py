@@ -1,19 +1,17 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
-import sys
-import errno
 import os
 import os.path
 import logging
 from time import sleep
 from datetime import datetime, timedelta
 from pkg_resources import resource_filename
-from six import reraise
 
 from psutil import Process
 from pyramid.response import Response, FileResponse
+from pyramid.static import static_view
 from pyramid.authorization import ACLAuthorizationPolicy
-from pyramid.events import BeforeRender
+from pyramid.events import BeforeRender, NewResponse
 from pyramid.httpexceptions import HTTPFound, HTTPNotFound
 
 from .. import dynmenu as dm
@@ -22,38 +20,44 @@ from ..package import amd_packages
 from ..compat import lru_cache
 
 from . import exception
-from .session import WebSession
+from .session import session_factory
 from .renderer import json_renderer
 from .util import _, pip_freeze
+from .compression import available_encodings
 
 _logger = logging.getLogger(__name__)
 
+# Precompressed variants of static files, see pyramid.compress_static
+STATIC_CONTENT_ENCODINGS = available_encodings()
+
+# Static URLs contain static_key, so responses never change in production
+STATIC_MAX_AGE = 365 * 24 * 3600
+
 
 def static_amd_file(request):
     subpath = request.matchdict['subpath']
     amd_package_name = subpath[0]
-    amd_package_path = '/'.join(subpath[1:])
 
-    ap_base_path = _amd_package_path(amd_package_name)
-    if ap_base_path is None:
+    view = _amd_package_view(
+        amd_package_name, request.env.pyramid.static_max_age)
+    if view is None:
         raise HTTPNotFound()
 
-    try:
-        return FileResponse(
-            os.path.join(ap_base_path, amd_package_path),
-            cache_max_age=3600, request=request)
-    except (OSError, IOError) as exc:
-        if exc.errno in (errno.ENOENT, errno.EISDIR):
-            raise HTTPNotFound()
-        reraise(*sys.exc_info())
+    # Static view resolves the file by the request subpath, so the first
+    # element with the package name is stripped.
+    request.subpath = subpath[1:]
+    return view(request.context, request)
 
 
 @lru_cache(maxsize=64)
-def _amd_package_path(name):
+def _amd_package_view(name, cache_max_age):
     for p, asset in amd_packages():
         if p == name:
             py_package, path = asset.split(':', 1)
-            return resource_filename(py_package, path)
+            return static_view(
+                resource_filename(py_package, path), use_subpath=True,
+                cache_max_age=cache_max_age,
+                content_encodings=STATIC_CONTENT_ENCODINGS)
 
 
 def home(request):
@@ -226,7 +230,7 @@ def setup_pyramid(comp, config):
     is_debug = env.core.debug
 
     # Session factory
-    config.set_session_factory(WebSession)
+    config.set_session_factory(session_factory)
 
     # Empty authorization policy. Why do we need this?
     # NOTE: Authentication policy is set up in then authentication component!
@@ -273,6 +277,10 @@ def setup_pyramid(comp, config):
         'nextgisweb.pyramid.util.header_encoding_tween_factory',
         over=('nextgisweb.pyramid.exception.unhandled_exception_tween_factory', ))
 
+    config.add_tween(
+        'nextgisweb.pyramid.compression.compression_tween_factory',
+        under='INGRESS')
+
     # INTERNATIONALIZATION
 
     # Substitute localizer from pyramid with our own, original is
@@ -317,13 +325,29 @@ def setup_pyramid(comp, config):
         comp.static_key = '/' + pip_freeze()[0]
         _logger.debug("Using pip freeze static key [%s]", comp.static_key[1:])
 
+    comp.static_max_age = 3600 if is_debug else STATIC_MAX_AGE
+
     config.add_static_view(
         '/static{}/asset'.format(comp.static_key),
-        'nextgisweb:static', cache_max_age=3600)
+        'nextgisweb:static', cache_max_age=comp.static_max_age,
+        content_encodings=STATIC_CONTENT_ENCODINGS)
 
     config.add_route('amd_package', '/static{}/amd/*subpath'.format(comp.static_key)) \
         .add_view(static_amd_file)
 
+    if not is_debug:
+        static_prefix = '/static{}/'.format(comp.static_key)
+
+        def static_immutable(event):
+            response = event.response
+            cache_control = response.headers.get('Cache-Control')
+            if (
+                response.status_code == 200 and cache_control is not None
+                and event.request.path_info.startswith(static_prefix)
+            ):
+                response.headers['Cache-Control'] = str(cache_control + ', immutable')
+        config.add_subscriber(static_immutable, NewResponse)
+
     # Collect external AMD-packages from other components
     amd_base = []
     for c in comp._env.chain('amd_base'):
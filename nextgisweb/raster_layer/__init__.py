@@ -7,6 +7,7 @@ from ..component import Component
 from .model import Base, RasterLayer
 from .gdaldriver import GDAL_DRIVER_NAME_2_EXPORT_FORMATS
 from . import command  # NOQA
+from . import job  # NOQA
 
 __all__ = ['RasterLayerComponent', 'RasterLayer']
 
@@ -1,16 +1,20 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
+import os
 from six import ensure_str
-import tempfile
+
+import backports.tempfile
 
 from osgeo import gdal
 from pyramid.response import FileResponse
 
 from ..env import env
+from ..jobs.api import job_response
 from ..spatial_ref_sys import SRS
 from ..resource import ValidationError, DataScope
 from .gdaldriver import EXPORT_FORMAT_GDAL
 from .model import RasterLayer
+from .job import ExportJob
 from .util import _
 
 
@@ -22,7 +26,6 @@ def export(request):
     request.resource_permission(PERM_READ)
 
     srs = int(request.GET.get("srs", request.context.srs.id))
-    srs = SRS.filter_by(id=srs).one()
     format = request.GET.get("format", "GTiff")
     bands = request.GET.getall("bands")
 
@@ -32,39 +35,53 @@ def export(request):
     if format not in EXPORT_FORMAT_GDAL:
         raise ValidationError(_("Format '%s' is not supported.") % (format,))
 
+    if request.GET.get("async", "false").lower() == "true":
+        job = ExportJob.submit(
+            user=request.user, resource_id=request.context.id,
+            srs=srs, format=format, bands=bands)
+        return job_response(request, job)
+
+    with backports.tempfile.TemporaryDirectory() as tmp_dir:
+        path, filename, content_type = export_file(
+            request.context, tmp_dir, srs=srs, format=format, bands=bands)
+
+        response = FileResponse(path, content_type=(
+            ensure_str(content_type) if content_type else None))
+        response.content_disposition = ensure_str("attachment; filename=%s" % filename)
+        return response
+
+
+def export_file(resource, tmp_dir, srs, format, bands):
+    """ Export the raster into the file in the given directory, returns
+    the path, the file name and the content type """
+
+    srs = SRS.filter_by(id=srs).one()
     driver = EXPORT_FORMAT_GDAL[format]
 
-    filename = "%d.%s" % (request.context.id, driver.extension,)
-    content_disposition = "attachment; filename=%s" % filename
-
-    def _warp(source_filename):
-        with tempfile.NamedTemporaryFile(suffix=".%s" % driver.extension) as tmp_file:
-            try:
-                gdal.UseExceptions()
-                gdal.Warp(
-                    tmp_file.name, source_filename,
-                    options=gdal.WarpOptions(
-                        format=driver.name, dstSRS=srs.wkt,
-                        creationOptions=driver.options
-                    ),
-                )
-            except RuntimeError as e:
-                raise ValidationError(str(e))
-            finally:
-                gdal.DontUseExceptions()
-
-            response = FileResponse(tmp_file.name, content_type=(
-                ensure_str(driver.mime) if driver.mime else None))
-            response.content_disposition = ensure_str(content_disposition)
-            return response
-
-    source_filename = env.raster_layer.workdir_filename(request.context.fileobj)
-    if len(bands) != request.context.band_count:
-        with tempfile.NamedTemporaryFile(suffix=".tif") as tmp_file:
-            gdal.Translate(tmp_file.name, source_filename, bandList=bands)
-            return _warp(tmp_file.name)
-    else:
-        return _warp(source_filename)
+    filename = "%d.%s" % (resource.id, driver.extension,)
+    path = os.path.join(tmp_dir, filename)
+
+    source_filename = env.raster_layer.workdir_filename(resource.fileobj)
+    if len(bands) != resource.band_count:
+        translated = os.path.join(tmp_dir, "translated.tif")
+        gdal.Translate(translated, source_filename, bandList=bands)
+        source_filename = translated
+
+    try:
+        gdal.UseExceptions()
+        gdal.Warp(
+            path, source_filename,
+            options=gdal.WarpOptions(
+                format=driver.name, dstSRS=srs.wkt,
+                creationOptions=driver.options
+            ),
+        )
+    except RuntimeError as e:
+        raise ValidationError(str(e))
+    finally:
+        gdal.DontUseExceptions()
+
+    return path, filename, driver.mime
 
 
 def setup_pyramid(comp, config):
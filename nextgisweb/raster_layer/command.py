@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
+import transaction
+
 from ..command import Command
 
 from .model import RasterLayer
+from .job import BuildOverviewJob
 
 
 @Command.registry.register
@@ -11,9 +14,17 @@ class RebuildOverviewCommand():
 
     @classmethod
     def argparser_setup(cls, parser, env):
-        pass
+        parser.add_argument(
+            '--async', dest='async_', action='store_true', default=False,
+            help="Submit a background job instead of building overviews")
 
     @classmethod
     def execute(cls, args, env):
+        if args.async_:
+            with transaction.manager:
+                job = BuildOverviewJob.submit()
+                print(job.id)
+            return
+
         for resource in RasterLayer.query():
             resource.build_overview()
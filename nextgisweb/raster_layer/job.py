@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import backports.tempfile
+
+from ..jobs import JobHandler
+
+from .model import RasterLayer
+
+
+@JobHandler.registry.register
+class ExportJob(JobHandler):
+    identity = 'raster_layer.export'
+
+    def run(self, ctx):
+        from .api import export_file
+
+        params = dict(ctx.params)
+        resource = RasterLayer.filter_by(id=params.pop('resource_id')).one()
+
+        with backports.tempfile.TemporaryDirectory() as tmp_dir:
+            ctx.progress(0, "Exporting raster")
+            path, filename, content_type = export_file(resource, tmp_dir, **params)
+            ctx.result_file(path, filename, content_type or 'application/octet-stream')
+
+
+@JobHandler.registry.register
+class BuildOverviewJob(JobHandler):
+    identity = 'raster_layer.build_overview'
+
+    def run(self, ctx):
+        query = RasterLayer.query()
+        resource_id = ctx.params.get('resource_id')
+        if resource_id is not None:
+            query = query.filter_by(id=resource_id)
+
+        resources = query.all()
+        for idx, resource in enumerate(resources):
+            ctx.progress(idx / len(resources), "Building overview for resource %d" % resource.id)
+            resource.build_overview(missing_only=ctx.params.get('missing_only', False))
@@ -126,6 +126,7 @@ class RasterLayer(Base, Resource, SpatialLayerMixin):
                     '-co', 'TILED=YES',
                     '-co', 'BIGTIFF=YES', filename, dst_file))
         subprocess.check_call(cmd)
+        env.file_storage.update_stat(fobj)
 
         ds = gdal.Open(dst_file, gdalconst.GA_ReadOnly)
 
@@ -3,10 +3,13 @@ from __future__ import division, unicode_literals, print_function, absolute_impo
 import os
 import os.path
 
+import transaction
+
 from ..lib.config import Option
 from ..component import Component
 
 from . import command  # NOQA
+from . import job  # NOQA
 from .interface import (
     IRenderableStyle,
     IExtentRenderRequest,
@@ -56,6 +59,20 @@ class RenderComponent(Component):
             seed=self.tile_cache_seed
         ))
 
+    def maintenance(self):
+        super(RenderComponent, self).maintenance()
+
+        # Tile cache consists of tables in tile_cache schema and SQLite
+        # databases with tile images.
+        files_size = 0
+        for (dirpath, dirnames, filenames) in os.walk(self.tile_cache_path):
+            for fn in filenames:
+                files_size += os.stat(os.path.join(dirpath, fn)).st_size
+
+        with transaction.manager:
+            size, count = self.env.core.schema_size('tile_cache')
+            self.env.core.storage_set('render.tile_cache', size + files_size, count)
+
     def backup_configure(self, config):
         super(RenderComponent, self).backup_configure(config)
         config.exclude_table_data('tile_cache', '*')
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+
+from ..jobs import JobHandler
+
+from .command import tile_cache_seed
+
+
+@JobHandler.registry.register
+class TileCacheSeedJob(JobHandler):
+    identity = 'render.tile_cache_seed'
+
+    # Seeding commits the progress of each tile cache
+    manage_transaction = True
+
+    def run(self, ctx):
+        tile_cache_seed(progress_cb=ctx.progress)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import os.path
+
+import pytest
+import transaction
+
+from nextgisweb.auth import User
+from nextgisweb.jobs import Job
+from nextgisweb.models import DBSession
+from nextgisweb.raster_layer import RasterLayer
+from nextgisweb.raster_style import RasterStyle
+from nextgisweb.render.job import TileCacheSeedJob
+from nextgisweb.render.model import ResourceTileCache
+from nextgisweb.spatial_ref_sys import SRS
+
+
+@pytest.fixture()
+def tile_cache_id(ngw_env, ngw_resource_group):
+    with transaction.manager:
+        admin = User.by_keyname('administrator')
+        layer = RasterLayer(
+            parent_id=ngw_resource_group, display_name='render.test:seed_job',
+            owner_user=admin, srs=SRS.filter_by(id=3857).one(),
+        ).persist()
+        layer.load_file(os.path.join(
+            os.path.split(__file__)[0], os.path.pardir, os.path.pardir,
+            'raster_layer', 'test', 'data', 'sochi-aster-colorized.tif'
+        ), ngw_env)
+
+        style = RasterStyle(
+            parent=layer, display_name='render.test:seed_job',
+            owner_user=admin,
+        ).persist()
+
+        tile_cache = ResourceTileCache(
+            resource=style, enabled=True, seed_z=2,
+        ).persist()
+
+        DBSession.flush()
+        tile_cache.initialize()
+        style_id, layer_id = style.id, layer.id
+
+    yield style_id
+
+    with transaction.manager:
+        DBSession.delete(RasterStyle.filter_by(id=style_id).one())
+        DBSession.delete(RasterLayer.filter_by(id=layer_id).one())
+
+
+def test_seed_job(tile_cache_id, ngw_env):
+    with transaction.manager:
+        job_id = TileCacheSeedJob.submit().id
+
+    assert ngw_env.jobs.claim() == job_id
+    assert ngw_env.jobs.execute(job_id)
+
+    with transaction.manager:
+        job = Job.filter_by(id=job_id).one()
+        assert job.status == 'succeeded'
+        assert job.progress == 1
+        assert job.finished is not None
+
+        tile_cache = ResourceTileCache.filter_by(resource_id=tile_cache_id).one()
+        assert tile_cache.seed_status == 'completed'
+
+        DBSession.delete(job)
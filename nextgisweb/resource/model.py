@@ -480,6 +480,11 @@ class ResourceACLRule(Base):
     principal = db.relationship(Principal)
 
     def cmp_user(self, user):
+        # Group memberships are precomputed, so the principal isn't
+        # loaded for group rules matching the user.
+        if self.principal_id in user.member_of_ids:
+            return True
+
         principal = self.principal
         return (isinstance(principal, User) and principal.compare(user)) \
             or (isinstance(principal, Group) and principal.is_member(user))
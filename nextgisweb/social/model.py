@@ -1,8 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
 
-from shutil import copyfile
-
 from .. import db
 from ..env import env
 from ..file_storage import FileObj
@@ -43,9 +41,7 @@ class _preview_file_upload_attr(SP):
             fileobj = env.file_storage.fileobj(component=COMP_ID)
 
             srcfile, _ = env.file_upload.get_filename(value['id'])
-            dstfile = env.file_storage.filename(fileobj, makedirs=True)
-
-            copyfile(srcfile, dstfile)
+            env.file_storage.write_file(fileobj, srcfile)
             social.preview_fileobj = fileobj
         elif social.preview_fileobj is not None:
             fileobj = social.preview_fileobj
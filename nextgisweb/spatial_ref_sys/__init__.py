@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, unicode_literals, print_function, absolute_import
+import threading
+
+from pyproj import CRS, Transformer
 from sqlalchemy.orm.exc import NoResultFound
 
+from ..lib.config import Option
 from ..component import Component
+from ..core.notify import ProcessCache
+from ..models import DBSession
 from .util import COMP_ID
 from .models import Base, SRS, SRSMixin, WKT_EPSG_4326, WKT_EPSG_3857
 
@@ -13,6 +19,42 @@ class SpatialRefSysComponent(Component):
     identity = COMP_ID
     metadata = Base.metadata
 
+    def initialize(self):
+        super(SpatialRefSysComponent, self).initialize()
+
+        # Parsed CRS and transformers by SRS identifiers, see SRS events
+        self.registry = ProcessCache(
+            self.env.core.notify_listener, 'spatial_ref_sys.srs',
+            maxsize=self.options['registry.size'],
+            enabled=self.options['registry.enabled'])
+
+    def crs(self, srs_id):
+        """ Parsed pyproj CRS of the SRS with the given identifier, raises
+        ``NoResultFound`` if it doesn't exist """
+
+        srs_id = int(srs_id)
+
+        def _load():
+            wkt, = DBSession.query(SRS.wkt).filter_by(id=srs_id).one()
+            return CRS.from_wkt(wkt)
+
+        return self.registry.get(('crs', srs_id), _load)
+
+    def transformer(self, srs_from_id, srs_to_id):
+        """ Transformer between SRS with the given identifiers, which is
+        reused between requests """
+
+        srs_from_id, srs_to_id = int(srs_from_id), int(srs_to_id)
+
+        def _load():
+            return Transformer.from_crs(
+                self.crs(srs_from_id), self.crs(srs_to_id),
+                always_xy=True)
+
+        # pyproj < 3.1 transformers can't be shared between threads
+        key = ('transformer', srs_from_id, srs_to_id, threading.current_thread().ident)
+        return self.registry.get(key, _load)
+
     def initialize_db(self):
         srs_list = (
             SRS(
@@ -46,3 +88,10 @@ class SpatialRefSysComponent(Component):
 
     def query_stat(self):
         return dict(count=SRS.query().count())
+
+    option_annotations = (
+        Option('registry.enabled', bool, default=True),
+        Option('registry.size', int, default=256,
+               doc="Maximum number of parsed coordinate systems and transformers "
+                   "cached in process memory."),
+    )
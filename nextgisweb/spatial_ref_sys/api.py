@@ -1,18 +1,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
 
-from pyproj import CRS
-
 from ..core.exception import ValidationError
 from ..geometry import (
     geom_from_wkt,
     geom_to_wkt,
-    geom_transform as shp_geom_transform,
+    geom_transform_with,
+    geom_transform_many,
     geom_calc as shp_geom_calc,
+    geom_calc_many,
 )
 from .models import SRS
 from .util import convert_to_wkt, _
 
+GEOM_BATCH_MAX = 10000
+GEOM_BATCH_RESULT = ('geom', 'length', 'area')
+
 
 def collection(request):
     srs_collection = list(map(lambda o: dict(
@@ -43,33 +46,68 @@ def srs_convert(request):
 
 
 def geom_transform(request):
-    srs_from = SRS.filter_by(id=int(request.json_body["srs"])).one()
-    srs_to = SRS.filter_by(id=int(request.matchdict["id"])).one()
+    transformer = request.env.spatial_ref_sys.transformer(
+        request.json_body["srs"], request.matchdict["id"])
     geom = geom_from_wkt(request.json_body["geom"])
 
-    crs_from = CRS.from_wkt(srs_from.wkt)
-    crs_to = CRS.from_wkt(srs_to.wkt)
-    geom_transformed = shp_geom_transform(geom, crs_from, crs_to)
+    geom_transformed = geom_transform_with(geom, transformer)
 
     return dict(geom=geom_to_wkt(geom_transformed))
 
 
 def geom_calc(request, prop):
+    comp = request.env.spatial_ref_sys
     srs_from_id = request.json_body["srs"] if "srs" in request.json_body else None
-    srs_to = SRS.filter_by(id=int(request.matchdict["id"])).one()
+    srs_to_id = int(request.matchdict["id"])
     geom = geom_from_wkt(request.json_body["geom"])
 
-    crs_to = CRS.from_wkt(srs_to.wkt)
+    crs_to = comp.crs(srs_to_id)
 
-    if srs_from_id and srs_from_id != srs_to.id:
-        srs_from = SRS.filter_by(id=int(srs_from_id)).one()
-        crs_from = CRS.from_wkt(srs_from.wkt)
-        geom = shp_geom_transform(geom, crs_from, crs_to)
+    if srs_from_id and int(srs_from_id) != srs_to_id:
+        geom = geom_transform_with(geom, comp.transformer(srs_from_id, srs_to_id))
 
-    value = shp_geom_calc(geom, crs_to, prop, srs_to.id)
+    value = shp_geom_calc(geom, crs_to, prop, srs_to_id)
     return dict(value=value)
 
 
+def geom_batch(request):
+    """ Transform geometries and calculate their length or area in the
+    target SRS. Request body: ``srs`` - source SRS (target SRS by default),
+    ``geom`` - list of WKT geometries and ``result`` - list of requested
+    values (``geom``, ``length`` or ``area``). """
+
+    comp = request.env.spatial_ref_sys
+    body = request.json_body
+    srs_to_id = int(request.matchdict["id"])
+    srs_from_id = int(body.get("srs", srs_to_id))
+
+    result = body.get("result", ["geom", ])
+    for r in result:
+        if r not in GEOM_BATCH_RESULT:
+            raise ValidationError(_("Invalid result value: %s.") % r)
+
+    wkts = body["geom"]
+    if len(wkts) > GEOM_BATCH_MAX:
+        raise ValidationError(_("Too many geometries, maximum is %d.") % GEOM_BATCH_MAX)
+
+    geoms = [geom_from_wkt(w) for w in wkts]
+    if srs_from_id != srs_to_id:
+        geoms = geom_transform_many(geoms, comp.transformer(srs_from_id, srs_to_id))
+
+    values = dict()
+    if "geom" in result:
+        values["geom"] = [geom_to_wkt(g) for g in geoms]
+
+    crs_to = comp.crs(srs_to_id)
+    for prop in ("length", "area"):
+        if prop in result:
+            values[prop] = geom_calc_many(geoms, crs_to, prop, srs_to_id)
+
+    return [
+        dict((k, v[i]) for k, v in values.items())
+        for i in range(len(geoms))]
+
+
 def setup_pyramid(comp, config):
     config.add_route(
         "spatial_ref_sys.collection", "/api/component/spatial_ref_sys/",
@@ -94,6 +132,11 @@ def setup_pyramid(comp, config):
         r"/api/component/spatial_ref_sys/{id:\d+}/geom_area"
     ).add_view(lambda r: geom_calc(r, "area"), request_method="POST", renderer="json")
 
+    config.add_route(
+        "spatial_ref_sys.geom_batch",
+        r"/api/component/spatial_ref_sys/{id:\d+}/geom_batch"
+    ).add_view(geom_batch, request_method="POST", renderer="json")
+
     config.add_route(
         "spatial_ref_sys.get", r"/api/component/spatial_ref_sys/{id:\d+}",
     ).add_view(get, request_method="GET", renderer="json")
@@ -7,6 +7,7 @@ import sqlalchemy.orm as orm
 from sqlalchemy.ext.declarative import declared_attr
 
 from .. import db
+from ..env import env
 from ..models import declarative_base
 
 from .util import convert_to_proj
@@ -67,7 +68,17 @@ class SRS(Base):
 
     @property
     def is_geographic(self):
-        return CRS.from_wkt(self.wkt).is_geographic
+        return self.crs.is_geographic
+
+    @property
+    def crs(self):
+        """ Parsed pyproj CRS, which is taken from the registry for
+        persistent objects with unchanged WKT """
+
+        state = sa.inspect(self)
+        if state.persistent and 'wkt' not in state.committed_state:
+            return env.spatial_ref_sys.crs(self.id)
+        return CRS.from_wkt(self.wkt)
 
     @property
     def _zero_level_numtiles_x(self):
@@ -175,6 +186,15 @@ DROP FUNCTION IF EXISTS srs_spatial_ref_sys_sync();
 """), propagate=True)
 
 
+def _srs_changed(mapper, connection, target):
+    # Parsed CRS and transformers are cached by SRS identifiers
+    env.spatial_ref_sys.registry.changed()
+
+
+for _evt in ('after_update', 'after_delete'):
+    db.event.listen(SRS, _evt, _srs_changed)
+
+
 class SRSMixin(object):
 
     @declared_attr
@@ -75,3 +75,27 @@ def test_geom_area(ngw_webtest_app, srs_msk23_id):
         dict(geom=POLY)
     )
     assert abs(result.json["value"] - 10000) < 1e-6
+
+
+def test_geom_batch(ngw_webtest_app):
+    result = ngw_webtest_app.post_json(
+        "/api/component/spatial_ref_sys/%d/geom_batch" % 3857,
+        dict(geom=[MOSCOW_VLADIVOSTOK, 'POINT EMPTY', MOSCOW_VLADIVOSTOK],
+             srs=4326, result=['geom', 'length'])
+    )
+    assert len(result.json) == 3
+    g1 = geom_from_wkt(result.json[0]["geom"])
+    g2 = geom_from_wkt("LINESTRING(4187839.2436 7508807.8513,14683040.8356 5330254.9437)")
+    assert g2.almost_equals(g1, 4)
+    assert geom_from_wkt(result.json[1]["geom"]).is_empty
+    assert abs(result.json[2]["length"] - LENGTH_FLAT) < 1e-6
+
+    result = ngw_webtest_app.post_json(
+        "/api/component/spatial_ref_sys/%d/geom_batch" % 4326,
+        dict(geom=[MOSCOW_VLADIVOSTOK] * 2, result=['length'])
+    )
+    assert result.json == [dict(length=pytest.approx(LENGTH_SPHERE))] * 2
+
+    ngw_webtest_app.post_json(
+        "/api/component/spatial_ref_sys/%d/geom_batch" % 4326,
+        dict(geom=[MOSCOW_VLADIVOSTOK], result=['volume']), status=422)
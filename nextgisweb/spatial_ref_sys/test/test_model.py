@@ -2,6 +2,7 @@
 from __future__ import division, absolute_import, print_function, unicode_literals
 
 import pytest
+from sqlalchemy.orm.exc import NoResultFound
 
 from nextgisweb import db
 from nextgisweb.models import DBSession
@@ -108,3 +109,28 @@ def test_point_tilexy(ngw_txn):
 
     vdk_x, vdk_y = 14681475, 5300249
     assert list(map(int, srs_3395._point_tilexy(vdk_x, vdk_y, zoom))) == [3548, 1506]
+
+
+def test_registry(ngw_env, ngw_txn):
+    comp = ngw_env.spatial_ref_sys
+
+    obj = SRS(wkt=WKT_EPSG_4326, display_name='')
+    obj.persist()
+    DBSession.flush()
+
+    assert comp.crs(obj.id).is_geographic
+    assert obj.is_geographic
+
+    # Changes are visible in the modifying transaction
+    obj.wkt = WKT_EPSG_3857
+    DBSession.flush()
+
+    assert not comp.crs(obj.id).is_geographic
+    x, y = comp.transformer(4326, obj.id).transform(180, 0)
+    assert (x, y) == pytest.approx((BOUNDS_EPSG_3857[2], 0))
+
+    DBSession.delete(obj)
+    DBSession.flush()
+
+    with pytest.raises(NoResultFound):
+        comp.crs(obj.id)
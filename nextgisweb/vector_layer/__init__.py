@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
+from datetime import datetime, timedelta
 
+import transaction
+
+from ..lib.config import Option
 from ..component import Component, require
 
-from .model import Base, VectorLayer
+from .model import Base, VectorLayer, VectorLayerChange, SCHEMA
 from . import command  # NOQA
 
 __all__ = [
@@ -19,3 +23,23 @@ class VectorLayerComponent(Component):
     @require('feature_layer')
     def setup_pyramid(self, config):
         from . import view  # NOQA: F401
+
+    def maintenance(self):
+        super(VectorLayerComponent, self).maintenance()
+
+        with transaction.manager:
+            size, count = self.env.core.schema_size(SCHEMA)
+            self.env.core.storage_set('vector_layer.tables', size, count)
+
+        self.logger.info("Cleaning up feature changes...")
+        with transaction.manager:
+            deleted = VectorLayerChange.filter(
+                VectorLayerChange.tstamp < datetime.utcnow() - self.options['changes.ttl']
+            ).delete(synchronize_session=False)
+        self.logger.info("Feature changes deleted: %d", deleted)
+
+    option_annotations = (
+        Option('changes.ttl', timedelta, default=timedelta(days=90),
+               doc="Recorded feature changes are deleted after this interval, "
+               "clients synchronized earlier have to reload layer data."),
+    )
@@ -73,6 +73,10 @@ class CleanupOrhpanedTablesCommand():
                 _logger.debug(drop_query)
                 con.execute(drop_query)
 
+                # Trigger function of the search column, if it's enabled
+                con.execute('DROP FUNCTION IF EXISTS "%s"."%s_search"()' % (
+                    SCHEMA, row['table_name']))
+
                 if args.table_per_txn:
                     con.execute('COMMIT')
 
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, absolute_import, print_function, unicode_literals
+import itertools
 import json
 import uuid
 import zipfile
@@ -8,9 +9,11 @@ from datetime import datetime, time, date
 import six
 
 from zope.interface import implementer
+from zope.sqlalchemy import mark_changed
 from osgeo import ogr, osr
 
 from sqlalchemy.sql import ColumnElement
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.ext.compiler import compiles
 
 import geoalchemy2 as ga
@@ -48,8 +51,11 @@ from ..feature_layer import (
     GEOM_TYPE_OGR,
     FIELD_TYPE,
     FIELD_TYPE_OGR,
+    FIELD_INDEX,
     IFeatureLayer,
     IFieldEditableFeatureLayer,
+    IFieldIndexedFeatureLayer,
+    IVersionedFeatureLayer,
     IWritableFeatureLayer,
     IFeatureQuery,
     IFeatureQueryFilter,
@@ -57,10 +63,16 @@ from ..feature_layer import (
     IFeatureQueryLike,
     IFeatureQueryIntersects,
     IFeatureQueryOrderBy,
+    IFeatureQueryOrderByDistance,
     IFeatureQueryClipByBox,
     IFeatureQuerySimplify,
+    IFeatureQueryGeomFormat,
+    IFeatureQueryAggregate,
+    IFeatureQueryCluster,
     on_data_change,
     query_feature_or_not_found)
+from ..feature_layer.aggregate import aggregate
+from ..feature_layer.geomformat import geom_format_expr, geom_format_value
 
 from .util import _
 
@@ -98,6 +110,49 @@ _FIELD_TYPE_2_DB = dict(zip(FIELD_TYPE.enum, FIELD_TYPE_DB))
 
 SCHEMA = 'vector_layer'
 
+# Maximum number of fields in a single jsonb_build_object call, PostgreSQL
+# functions are limited to 100 arguments.
+JSON_BUILD_FIELDS = 50
+
+# Values of all fields are joined with the unit separator into the search
+# column, so the search pattern can't match across field boundaries. The
+# function is generated for each layer table with its field columns.
+SEARCH_FUNCTION_DDL = """
+    CREATE OR REPLACE FUNCTION {schema}.{table}_search() RETURNS trigger AS $$
+    BEGIN
+        NEW.search := {value};
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# Generalized geometry columns geom_gen_N are simplified from the geometry
+# with tolerances passed as trigger arguments.
+GENERALIZE_FUNCTION_DDL = """
+    CREATE OR REPLACE FUNCTION {schema}.generalize_update() RETURNS trigger AS $$
+    DECLARE
+        gen hstore := ''::hstore;
+    BEGIN
+        FOR i IN 0 .. TG_NARGS - 1 LOOP
+            gen := gen || hstore('geom_gen_' || i, ST_SimplifyPreserveTopology(
+                NEW.geom, TG_ARGV[i]::double precision)::text);
+        END LOOP;
+        NEW := NEW #= gen;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+""".format(schema=SCHEMA)
+
+GENERALIZATION_LEVELS_MAX = 8
+
+CHANGE_ACTIONS = ('create', 'update', 'delete', 'delete_all')
+
+GENERALIZATION_GEOM_TYPES = (
+    GEOM_TYPE.LINESTRING, GEOM_TYPE.POLYGON,
+    GEOM_TYPE.MULTILINESTRING, GEOM_TYPE.MULTIPOLYGON,
+    GEOM_TYPE.LINESTRINGZ, GEOM_TYPE.POLYGONZ,
+    GEOM_TYPE.MULTILINESTRINGZ, GEOM_TYPE.MULTIPOLYGONZ)
+
 Base = declarative_base()
 
 
@@ -120,6 +175,8 @@ class TableInfo(object):
 
     def __init__(self, srs_id):
         self.srs_id = srs_id
+        self.search = False
+        self.generalization = ()
         self.metadata = None
         self.table = None
         self.model = None
@@ -224,6 +281,8 @@ class TableInfo(object):
         self = cls(layer.srs_id)
 
         self.geometry_type = layer.geometry_type
+        self.search = layer.search_index
+        self.generalization = layer.generalization or ()
 
         self.fields = []
         for f in layer.fields:
@@ -283,6 +342,16 @@ class TableInfo(object):
                 fld.datatype]), self.fields)
         )
 
+        if self.search:
+            # Maintained by the trigger, see VectorLayer.setup_search_index
+            table.append_column(db.Column('search', db.Unicode))
+
+        # Maintained by the trigger, see VectorLayer.setup_generalization
+        for level in range(len(self.generalization)):
+            table.append_column(db.Column('geom_gen_%d' % level, ga.Geometry(
+                dimension=2, srid=self.srs_id, geometry_type=geom_fldtype,
+                spatial_index=False)))
+
         db.mapper(model, table)
 
         self.metadata = metadata
@@ -392,7 +461,9 @@ class VectorLayerField(Base, LayerField):
     fld_uuid = db.Column(db.Unicode(32), nullable=False)
 
 
-@implementer(IFeatureLayer, IFieldEditableFeatureLayer, IWritableFeatureLayer, IBboxLayer)
+@implementer(
+    IFeatureLayer, IFieldEditableFeatureLayer, IFieldIndexedFeatureLayer,
+    IVersionedFeatureLayer, IWritableFeatureLayer, IBboxLayer)
 class VectorLayer(Base, Resource, SpatialLayerMixin, LayerFieldsMixin):
     identity = 'vector_layer'
     cls_display_name = _("Vector layer")
@@ -401,6 +472,9 @@ class VectorLayer(Base, Resource, SpatialLayerMixin, LayerFieldsMixin):
 
     tbl_uuid = db.Column(db.Unicode(32), nullable=False)
     geometry_type = db.Column(db.Enum(*GEOM_TYPE.enum), nullable=False)
+    search_index = db.Column(db.Boolean, nullable=False, default=False)
+    generalization = db.Column(db.ARRAY(db.Float))
+    version = db.Column(db.BigInteger, nullable=False, default=0)
 
     __field_class__ = VectorLayerField
 
@@ -433,6 +507,8 @@ class VectorLayer(Base, Resource, SpatialLayerMixin, LayerFieldsMixin):
         tableinfo.metadata.create_all(bind=DBSession.connection())
 
         self.tableinfo = tableinfo
+        self._setup_table_extras()
+        self._data_changed()
 
     def setup_from_fields(self, fields):
         tableinfo = TableInfo.from_fields(
@@ -443,6 +519,19 @@ class VectorLayer(Base, Resource, SpatialLayerMixin, LayerFieldsMixin):
         tableinfo.metadata.create_all(bind=DBSession.connection())
 
         self.tableinfo = tableinfo
+        self._setup_table_extras()
+        self._data_changed()
+
+    def _setup_table_extras(self):
+        # A new table is created on data upload, restore the search column
+        # and generalized geometry columns.
+        search_index, self.search_index = self.search_index, False
+        if search_index:
+            self.setup_search_index(True)
+
+        generalization, self.generalization = self.generalization, None
+        if generalization and self.geometry_type in GENERALIZATION_GEOM_TYPES:
+            self.setup_generalization(generalization)
 
     def load_from_ogr(self, ogrlayer, strdecode):
         self.tableinfo.load_from_ogr(ogrlayer, strdecode)
@@ -479,6 +568,9 @@ class VectorLayer(Base, Resource, SpatialLayerMixin, LayerFieldsMixin):
         op = migrate_operation()
         op.add_column(self._tablename, column, schema=SCHEMA)
 
+        if self.search_index:
+            self._setup_search_function()
+
         return VectorLayerField(datatype=datatype, fld_uuid=uid)
 
     def field_delete(self, field):
@@ -489,6 +581,212 @@ class VectorLayer(Base, Resource, SpatialLayerMixin, LayerFieldsMixin):
         with op.batch_alter_table(self._tablename, schema=SCHEMA) as batch_op:
             batch_op.drop_column('fld_' + uid)
 
+        # Remove values of the dropped field from the search column, the
+        # update fires the trigger with the regenerated function.
+        if self.search_index:
+            self._setup_search_function()
+            DBSession.connection().execute('UPDATE {}.{} SET search = NULL'.format(
+                SCHEMA, self._tablename))
+
+    # IFieldIndexedFeatureLayer
+
+    def _index_names(self):
+        return set(row[0] for row in DBSession.connection().execute(db.text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE schemaname = :schema AND tablename = :table"
+        ), schema=SCHEMA, table=self._tablename))
+
+    def field_indexes(self):
+        names = self._index_names()
+        return dict((f, [
+            kind for kind in FIELD_INDEX.enum
+            if _field_index_name(f, kind) in names
+        ]) for f in self.fields)
+
+    def field_index(self, field, kinds):
+        names = self._index_names()
+        column = 'fld_%s' % field.fld_uuid
+
+        ddl = []
+        for kind in FIELD_INDEX.enum:
+            name = _field_index_name(field, kind)
+            if kind in kinds and name not in names:
+                if kind == FIELD_INDEX.BTREE:
+                    method = 'btree ({})'.format(column)
+                elif kind == FIELD_INDEX.TRIGRAM:
+                    if field.datatype != FIELD_TYPE.STRING:
+                        raise ValidationError(_(
+                            "Trigram index is supported only for string fields."))
+                    _trgm_required()
+                    method = 'gin ({} gin_trgm_ops)'.format(column)
+                ddl.append('CREATE INDEX {} ON {}.{} USING {}'.format(
+                    name, SCHEMA, self._tablename, method))
+            elif kind not in kinds and name in names:
+                ddl.append('DROP INDEX {}.{}'.format(SCHEMA, name))
+
+        conn = DBSession.connection()
+        for stmt in ddl:
+            conn.execute(stmt)
+        if len(ddl) > 0:
+            mark_changed(DBSession())
+
+    def setup_search_index(self, enabled):
+        """ Add or remove the search column, which holds values of all fields
+        and is used by the ``like`` feature query filter with the trigram
+        index instead of scanning all columns. """
+
+        if enabled == self.search_index:
+            return
+
+        table = '{}.{}'.format(SCHEMA, self._tablename)
+        if enabled:
+            _trgm_required()
+            ddl = (
+                self._search_function_ddl(),
+                'ALTER TABLE {} ADD COLUMN search text'.format(table),
+                'CREATE TRIGGER search_update BEFORE INSERT OR UPDATE ON {0} '
+                'FOR EACH ROW EXECUTE PROCEDURE {0}_search()'.format(table),
+                'UPDATE {} SET search = NULL'.format(table),
+                'CREATE INDEX {}_search ON {} USING gin (search gin_trgm_ops)'.format(
+                    self._tablename, table),
+            )
+        else:
+            ddl = (
+                'DROP TRIGGER search_update ON {}'.format(table),
+                'DROP FUNCTION {}_search()'.format(table),
+                'ALTER TABLE {} DROP COLUMN search'.format(table),
+            )
+
+        conn = DBSession.connection()
+        for stmt in ddl:
+            conn.execute(stmt)
+        mark_changed(DBSession())
+
+        self.search_index = enabled
+
+    def _search_function_ddl(self):
+        # Field columns are read from the table as fields may be created
+        # and deleted in the same transaction before they are flushed.
+        rows = DBSession.connection().execute(db.text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = :schema AND table_name = :table "
+            "AND left(column_name, 4) = 'fld_' ORDER BY ordinal_position"
+        ), schema=SCHEMA, table=self._tablename)
+        columns = ['NEW.{}::text'.format(row[0]) for row in rows]
+
+        return SEARCH_FUNCTION_DDL.format(
+            schema=SCHEMA, table=self._tablename,
+            value="NULLIF(concat_ws(chr(31), {}), '')".format(', '.join(columns))
+            if len(columns) > 0 else 'NULL')
+
+    def _setup_search_function(self):
+        DBSession.connection().execute(self._search_function_ddl())
+        mark_changed(DBSession())
+
+    def setup_generalization(self, tolerances):
+        """ Set up generalized geometry columns, one per tolerance in layer
+        SRS units, or remove them if tolerances are empty. Feature queries
+        with simplification read geometries from the nearest level, so
+        simplification of detailed geometries on each request is avoided.
+        The columns are updated by the trigger on geometry changes. """
+
+        tolerances = sorted(set(float(t) for t in tolerances)) or None
+        if tolerances == self.generalization:
+            return
+
+        if tolerances is not None:
+            if self.geometry_type not in GENERALIZATION_GEOM_TYPES:
+                raise ValidationError(_(
+                    "Generalization is supported only for line and polygon layers."))
+            if len(tolerances) > GENERALIZATION_LEVELS_MAX:
+                raise ValidationError(_(
+                    "Too many generalization levels, maximum is %d.")
+                    % GENERALIZATION_LEVELS_MAX)
+            if tolerances[0] <= 0:
+                raise ValidationError(_(
+                    "Generalization tolerance must be positive."))
+
+        table = '{}.{}'.format(SCHEMA, self._tablename)
+        ddl = []
+
+        if self.generalization:
+            ddl.append('DROP TRIGGER generalize_update ON {}'.format(table))
+            ddl.append('ALTER TABLE {} {}'.format(table, ', '.join(
+                'DROP COLUMN geom_gen_{}'.format(level)
+                for level in range(len(self.generalization)))))
+
+        if tolerances is not None:
+            coltype = 'geometry({}, {})'.format(
+                _GEOM_TYPE_2_DB[self.geometry_type], self.srs.id)
+            ddl.append(GENERALIZE_FUNCTION_DDL)
+            ddl.append('ALTER TABLE {} {}'.format(table, ', '.join(
+                'ADD COLUMN geom_gen_{} {}'.format(level, coltype)
+                for level in range(len(tolerances)))))
+            ddl.append('UPDATE {} SET {}'.format(table, ', '.join(
+                'geom_gen_{} = ST_SimplifyPreserveTopology(geom, {!r})'.format(
+                    level, tolerance)
+                for level, tolerance in enumerate(tolerances))))
+            ddl.append(
+                'CREATE TRIGGER generalize_update '
+                'BEFORE INSERT OR UPDATE OF geom ON {} FOR EACH ROW '
+                'EXECUTE PROCEDURE {}.generalize_update({})'.format(
+                    table, SCHEMA, ', '.join(
+                        "'{!r}'".format(tolerance) for tolerance in tolerances)))
+
+        conn = DBSession.connection()
+        for stmt in ddl:
+            conn.execute(stmt)
+        mark_changed(DBSession())
+
+        self.generalization = tolerances
+
+    # IVersionedFeatureLayer
+
+    def _data_changed(self, action=None, feature_id=None):
+        # Version is incremented with row lock on the layer, so concurrent
+        # writers are serialized and versions are committed in order.
+        if self.id is None:
+            return
+
+        table = VectorLayer.__table__
+        version = DBSession.execute(
+            table.update().where(table.c.id == self.id)
+            .values(version=table.c.version + 1)
+            .returning(table.c.version)).scalar()
+        set_committed_value(self, 'version', version)
+
+        if action is None:
+            # Layer data were replaced, so recorded changes are useless
+            DBSession.execute(VectorLayerChange.__table__.delete().where(
+                VectorLayerChange.resource_id == self.id))
+        else:
+            DBSession.execute(VectorLayerChange.__table__.insert().values(
+                resource_id=self.id, version=version, action=action,
+                feature_id=feature_id, tstamp=datetime.utcnow()))
+
+        mark_changed(DBSession())
+        env.feature_layer.result_cache.changed()
+
+    def feature_changed(self, feature_id):
+        self._data_changed('update', feature_id)
+
+    def changes(self, since, limit):
+        if since > self.version:
+            return None
+
+        query = VectorLayerChange.filter(
+            VectorLayerChange.resource_id == self.id,
+            VectorLayerChange.version > since,
+        ).order_by(VectorLayerChange.version).limit(limit)
+        result = [(c.version, c.action, c.feature_id) for c in query]
+
+        # Each version has its own record, so a gap means that changes
+        # were cleaned up or the layer data were replaced.
+        if since < self.version and (len(result) == 0 or result[0][0] != since + 1):
+            return None
+
+        return result
+
     # IWritableFeatureLayer
 
     def feature_put(self, feature):
@@ -510,6 +808,7 @@ class VectorLayer(Base, Resource, SpatialLayerMixin, LayerFieldsMixin):
                 feature.geom, srid=self.srs_id)
 
         DBSession.merge(obj)
+        self._data_changed('update', feature.id)
 
         self.after_feature_update.fire(resource=self, feature=feature)
 
@@ -546,6 +845,7 @@ class VectorLayer(Base, Resource, SpatialLayerMixin, LayerFieldsMixin):
         DBSession.add(obj)
         DBSession.flush()
         DBSession.refresh(obj)
+        self._data_changed('create', obj.id)
 
         self.after_feature_create.fire(resource=self, feature_id=obj.id)
 
@@ -569,6 +869,7 @@ class VectorLayer(Base, Resource, SpatialLayerMixin, LayerFieldsMixin):
         feature = query_feature_or_not_found(query, self.id, feature_id)
         obj = DBSession.query(tableinfo.model).filter_by(id=feature.id).one()
         DBSession.delete(obj)
+        self._data_changed('delete', feature_id)
 
         self.after_feature_delete.fire(resource=self, feature_id=feature_id)
 
@@ -582,6 +883,7 @@ class VectorLayer(Base, Resource, SpatialLayerMixin, LayerFieldsMixin):
         tableinfo.setup_metadata(self._tablename)
 
         DBSession.query(tableinfo.model).delete()
+        self._data_changed('delete_all')
 
         self.after_all_feature_delete.fire(resource=self)
 
@@ -592,6 +894,10 @@ class VectorLayer(Base, Resource, SpatialLayerMixin, LayerFieldsMixin):
     def extent(self):
         """Return layer's extent
         """
+        result_cache = env.feature_layer.result_cache
+        return result_cache.get(result_cache.key(self, 'extent'), self._extent)
+
+    def _extent(self):
         st_force2d = func.st_force2d
         st_transform = func.st_transform
         st_extent = func.st_extent
@@ -642,12 +948,25 @@ event.listen(
     propagate=True)
 
 
+class VectorLayerChange(Base):
+    __tablename__ = 'vector_layer_change'
+
+    resource_id = db.Column(db.ForeignKey(VectorLayer.id, ondelete='CASCADE'), primary_key=True)
+    version = db.Column(db.BigInteger, primary_key=True)
+    action = db.Column(db.Enum(*CHANGE_ACTIONS), nullable=False)
+    feature_id = db.Column(db.Integer)
+    tstamp = db.Column(db.DateTime, nullable=False)
+
+
 # Drop data table on vector layer deletion
 @event.listens_for(VectorLayer, 'before_delete')
 def drop_verctor_layer_table(mapper, connection, target):
     tableinfo = TableInfo.from_layer(target)
     tableinfo.setup_metadata(target._tablename)
     tableinfo.metadata.drop_all(bind=connection)
+    if target.search_index:
+        connection.execute('DROP FUNCTION IF EXISTS {}.{}_search()'.format(
+            SCHEMA, target._tablename))
 
 
 def _set_encoding(encoding):
@@ -802,6 +1121,28 @@ class _fields_attr(SP):
             srlzr.obj.setup_from_fields(value)
 
 
+class _search_index_attr(SP):
+
+    def setter(self, srlzr, value):
+        srlzr.obj.setup_search_index(bool(value))
+
+
+class _generalization_attr(SP):
+
+    def getter(self, srlzr):
+        return srlzr.obj.generalization or []
+
+    def setter(self, srlzr, value):
+        if value is None:
+            value = []
+        elif not isinstance(value, list) or not all(
+            isinstance(t, (int, float)) and not isinstance(t, bool)
+            for t in value
+        ):
+            raise ValidationError(_("Generalization must be a list of tolerances."))
+        srlzr.obj.setup_generalization(value)
+
+
 class _geometry_type_attr(SP):
 
     def setter(self, srlzr, value):
@@ -831,6 +1172,28 @@ class VectorLayerSerializer(Serializer):
     source = _source_attr(read=None, write=P_DS_WRITE)
     fields = _fields_attr(read=None, write=P_DS_WRITE)
 
+    search_index = _search_index_attr(read=P_DSS_READ, write=P_DSS_WRITE)
+    generalization = _generalization_attr(read=P_DSS_READ, write=P_DSS_WRITE)
+    version = SP(read=P_DS_READ, write=None)
+
+
+def _field_index_name(field, kind):
+    return 'fld_%s_%s' % (field.fld_uuid, kind)
+
+
+def _json_value(datatype, value):
+    # Temporal values are represented in JSON with ISO 8601 strings
+    if value is None:
+        return None
+    elif datatype == FIELD_TYPE.DATE:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    elif datatype == FIELD_TYPE.TIME:
+        return datetime.strptime(value, '%H:%M:%S.%f' if '.' in value else '%H:%M:%S').time()
+    elif datatype == FIELD_TYPE.DATETIME:
+        return datetime.strptime(
+            value, '%Y-%m-%dT%H:%M:%S.%f' if '.' in value else '%Y-%m-%dT%H:%M:%S')
+    return value
+
 
 @lru_cache()
 def _clipbybox2d_exists():
@@ -841,6 +1204,21 @@ def _clipbybox2d_exists():
     )
 
 
+@lru_cache()
+def _trgm_exists():
+    return (
+        DBSession.connection()
+        .execute("SELECT 1 FROM pg_extension WHERE extname='pg_trgm'")
+        .fetchone()
+    )
+
+
+def _trgm_required():
+    if not _trgm_exists():
+        raise ValidationError(_(
+            "PostgreSQL extension 'pg_trgm' is required for trigram indexes."))
+
+
 @implementer(
     IFeatureQuery,
     IFeatureQueryFilter,
@@ -848,8 +1226,12 @@ def _clipbybox2d_exists():
     IFeatureQueryLike,
     IFeatureQueryIntersects,
     IFeatureQueryOrderBy,
+    IFeatureQueryOrderByDistance,
     IFeatureQueryClipByBox,
     IFeatureQuerySimplify,
+    IFeatureQueryGeomFormat,
+    IFeatureQueryAggregate,
+    IFeatureQueryCluster,
 )
 class FeatureQueryBase(object):
 
@@ -859,6 +1241,8 @@ class FeatureQueryBase(object):
         self._clip_by_box = None
         self._simplify = None
         self._single_part_geom = None
+        self._geom_format = None
+        self._geom_precision = None
         self._box = None
 
         self._geom_len = None
@@ -874,6 +1258,8 @@ class FeatureQueryBase(object):
         self._intersects = None
 
         self._order_by = None
+        self._order_by_distance = None
+        self._max_distance = None
 
     def srs(self, srs):
         self._srs = srs
@@ -888,6 +1274,10 @@ class FeatureQueryBase(object):
     def simplify(self, tolerance):
         self._simplify = tolerance
 
+    def geom_format(self, format, precision=None):
+        self._geom_format = format
+        self._geom_precision = precision
+
     def geom_length(self):
         self._geom_len = True
 
@@ -916,12 +1306,24 @@ class FeatureQueryBase(object):
     def order_by(self, *args):
         self._order_by = args
 
+    def order_by_distance(self, geom, max_distance=None):
+        self._order_by_distance = geom
+        self._max_distance = max_distance
+
     def like(self, value):
         self._like = value
 
     def intersects(self, geom):
         self._intersects = geom
 
+    def aggregate(self, keyname, stats=(), distinct=None, histogram=None, bins=10):
+        return self().aggregate(
+            keyname, stats=stats, distinct=distinct,
+            histogram=histogram, bins=bins)
+
+    def cluster(self, size, origin=(0, 0), aggregates=()):
+        return self().cluster(size, origin=origin, aggregates=aggregates)
+
     def __call__(self):
         tableinfo = TableInfo.from_layer(self.layer)
         tableinfo.setup_metadata(self.layer._tablename)
@@ -935,6 +1337,21 @@ class FeatureQueryBase(object):
         geomcol = table.columns.geom
         geomexpr = func.st_transform(geomcol, srsid)
 
+        simplify = self._simplify
+        if simplify is not None and srsid == self.layer.srs_id:
+            level = None
+            for idx, tolerance in enumerate(tableinfo.generalization):
+                if tolerance <= simplify:
+                    level, level_tolerance = idx, tolerance
+
+            if level is not None:
+                geomexpr = func.st_transform(
+                    table.columns['geom_gen_%d' % level], srsid)
+                # A level generalized with at least a half of the requested
+                # tolerance is close enough, no need to simplify it again.
+                if level_tolerance * 2 >= simplify:
+                    simplify = None
+
         if self._clip_by_box is not None:
             if _clipbybox2d_exists():
                 clip = func.st_setsrid(
@@ -947,9 +1364,9 @@ class FeatureQueryBase(object):
                     self._clip_by_box.srid)
                 geomexpr = func.st_intersection(geomexpr, clip)
 
-        if self._simplify is not None:
+        if simplify is not None:
             geomexpr = func.st_simplifypreservetopology(
-                geomexpr, self._simplify
+                geomexpr, simplify
             )
 
         if self._geom:
@@ -963,9 +1380,16 @@ class FeatureQueryBase(object):
                 def compile(expr, compiler, **kw):
                     return "(%s).geom" % str(compiler.process(expr.base))
 
-                columns.append(func.st_asewkb(geom(func.st_dump(geomexpr))).label('geom'))
+                geomsel = geom(func.st_dump(geomexpr))
+            else:
+                geomsel = geomexpr
+
+            if self._geom_format is not None:
+                columns.append(geom_format_expr(
+                    geomsel, self._geom_format,
+                    self._geom_precision).label('geom'))
             else:
-                columns.append(func.st_asewkb(geomexpr).label('geom'))
+                columns.append(func.st_asewkb(geomsel).label('geom'))
 
         if self._geom_len:
             columns.append(func.st_length(func.geography(
@@ -1049,7 +1473,10 @@ class FeatureQueryBase(object):
 
             where.append(db.and_(*token))
 
-        if self._like:
+        if self._like and tableinfo.search:
+            where.append(table.columns.search.ilike("%" + self._like + "%"))
+
+        elif self._like:
             token = []
             for f in tableinfo.fields:
                 token.append(
@@ -1068,6 +1495,17 @@ class FeatureQueryBase(object):
                     intgeom, self.layer.srs_id)))
 
         order_criterion = []
+
+        if self._order_by_distance is not None:
+            # KNN operator <-> uses the spatial index when it goes first
+            distgeom = func.st_transform(func.st_setsrid(func.st_geomfromtext(
+                self._order_by_distance.wkt), self._order_by_distance.srid),
+                self.layer.srs_id)
+            order_criterion.append(geomcol.op('<->')(distgeom))
+            columns.append(func.st_distance(geomcol, distgeom).label('distance'))
+            if self._max_distance is not None:
+                where.append(func.st_dwithin(geomcol, distgeom, self._max_distance))
+
         if self._order_by:
             for order, colname in self._order_by:
                 order_criterion.append(dict(asc=db.asc, desc=db.desc)[order](
@@ -1079,7 +1517,9 @@ class FeatureQueryBase(object):
             layer = self.layer
 
             _geom = self._geom
+            _geom_format = self._geom_format
             _geom_len = self._geom_len
+            _distance = self._order_by_distance is not None
             _box = self._box
             _limit = self._limit
             _offset = self._offset
@@ -1096,20 +1536,24 @@ class FeatureQueryBase(object):
                 for row in rows:
                     fdict = dict((f.keyname, row[f.keyname])
                                  for f in selected_fields)
-                    if self._geom:
+                    geom = geom_encoded = None
+                    if self._geom and self._geom_format is not None:
+                        geom_encoded = geom_format_value(row['geom'], self._geom_format)
+                    elif self._geom:
                         geom = geom_from_wkb(
                             row['geom'].tobytes() if six.PY3
                             else six.binary_type(row['geom']))
-                    else:
-                        geom = None
 
                     calculated = dict()
                     if self._geom_len:
                         calculated['geom_len'] = row['geom_len']
+                    if self._distance:
+                        calculated['distance'] = row['distance']
 
                     yield Feature(
                         layer=self.layer, id=row.id,
                         fields=fdict, geom=geom,
+                        geom_encoded=geom_encoded,
                         calculations=calculated,
                         box=box(
                             row.box_left, row.box_bottom,
@@ -1127,4 +1571,74 @@ class FeatureQueryBase(object):
                 for row in res:
                     return row[0]
 
+            def union_select(self):
+                pairs = [
+                    (sql.literal(f.keyname), table.columns[f.key])
+                    for f in selected_fields]
+                chunks = [
+                    func.jsonb_build_object(*itertools.chain(*pairs[i:i + JSON_BUILD_FIELDS]))
+                    for i in range(0, len(pairs), JSON_BUILD_FIELDS)]
+                fields = chunks[0] if chunks else func.jsonb_build_object()
+                for chunk in chunks[1:]:
+                    fields = fields.op('||')(chunk)
+
+                return sql.select(
+                    [
+                        sql.literal(self.layer.id, db.Integer).label('layer_id'),
+                        table.columns.id.label('id'),
+                        fields.label('fields'),
+                        func.row_number().over(order_by=order_criterion).label('rank'),
+                    ],
+                    whereclause=db.and_(*where),
+                    limit=self._limit,
+                    offset=self._offset,
+                    order_by=order_criterion,
+                )
+
+            def union_feature(self, row):
+                fields = row['fields']
+                return Feature(
+                    layer=self.layer, id=row['id'],
+                    fields=dict(
+                        (f.keyname, _json_value(f.datatype, fields.get(f.keyname)))
+                        for f in selected_fields))
+
+            def aggregate(self, keyname, **kwargs):
+                source = sql.select(
+                    [table.columns[tableinfo[keyname].key].label('value'), ],
+                    whereclause=db.and_(*where))
+                return aggregate(DBSession.connection(), source, **kwargs)
+
+            def cluster(self, size, origin=(0, 0), aggregates=()):
+                point = func.st_centroid(func.st_transform(geomcol, srsid))
+                cell = func.st_snaptogrid(point, origin[0], origin[1], size, size)
+
+                columns = [
+                    func.count().label('count'),
+                    func.min(table.columns.id).label('id'),
+                    func.st_asewkb(func.st_centroid(func.st_collect(point))).label('geom'),
+                ]
+                labels = []
+                for fn, keyname in aggregates:
+                    label = '%s_%s' % (fn, keyname)
+                    columns.append(getattr(func, fn)(
+                        table.columns[tableinfo[keyname].key]).label(label))
+                    labels.append(label)
+
+                query = sql.select(
+                    columns, whereclause=db.and_(*where),
+                ).group_by(cell)
+
+                result = []
+                for row in DBSession.connection().execute(query):
+                    result.append(dict(
+                        geom=geom_from_wkb(
+                            row['geom'].tobytes() if six.PY3
+                            else six.binary_type(row['geom'])),
+                        count=row['count'],
+                        id=row['id'] if row['count'] == 1 else None,
+                        fields=dict((label, row[label]) for label in labels),
+                    ))
+                return result
+
         return QueryFeatureSet()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import json
+import six
+from uuid import uuid4
+
+import pytest
+from osgeo import ogr
+
+from nextgisweb.models import DBSession
+from nextgisweb.auth import User
+from nextgisweb.feature_layer import Feature
+from nextgisweb.geometry import geom_from_wkt
+from nextgisweb.resource.exception import ValidationError
+from nextgisweb.spatial_ref_sys import SRS
+from nextgisweb.vector_layer import VectorLayer
+
+
+def zigzag(length, offset=0):
+    # Line with 1 meter deviations, collapsed by tolerances above 1 meter
+    return 'LINESTRING (%s)' % ', '.join(
+        '%d %d' % (x, offset + x % 2) for x in range(length))
+
+
+@pytest.fixture
+def resource(ngw_txn, ngw_resource_group):
+    geojson = {
+        'type': 'FeatureCollection',
+        'features': [{
+            'type': 'Feature',
+            'geometry': json.loads(ogr.CreateGeometryFromWkt(
+                zigzag(100)).ExportToJson()),
+            'properties': {'name': 'zigzag'},
+        }]
+    }
+    dsource = ogr.Open(json.dumps(geojson))
+    layer = dsource.GetLayer(0)
+
+    resource = VectorLayer(
+        parent_id=ngw_resource_group, display_name='generalization',
+        owner_user=User.by_keyname('administrator'),
+        srs=SRS.filter_by(id=3857).one(),
+        tbl_uuid=six.text_type(uuid4().hex),
+    ).persist()
+
+    resource.setup_from_ogr(layer, lambda x: x)
+    resource.load_from_ogr(layer, lambda x: x)
+
+    DBSession.flush()
+    return resource
+
+
+def vertices(resource, simplify):
+    query = resource.feature_query()
+    query.geom()
+    query.simplify(simplify)
+    return [len(f.geom.coords) for f in query()]
+
+
+def test_generalization(resource, ngw_txn):
+    assert vertices(resource, 5) == [2]
+
+    resource.setup_generalization([5, 0.1])
+    assert resource.generalization == [0.1, 5]
+
+    assert vertices(resource, 0.05) == [100]
+    assert vertices(resource, 0.1) == [100]
+    assert vertices(resource, 5) == [2]
+    assert vertices(resource, 50) == [2]
+
+    resource.feature_create(Feature(
+        fields=dict(name='new'), geom=geom_from_wkt(zigzag(10, offset=10))))
+    assert sorted(vertices(resource, 5)) == [2, 2]
+
+    query = resource.feature_query()
+    query.filter_by(name='zigzag')
+    feature = list(query())[0]
+    feature.geom = geom_from_wkt(zigzag(20))
+    resource.feature_put(feature)
+
+    query = resource.feature_query()
+    query.geom()
+    query.simplify(0.1)
+    query.filter_by(name='zigzag')
+    assert [len(f.geom.coords) for f in query()] == [20]
+
+    resource.setup_generalization([])
+    assert resource.generalization is None
+    assert sorted(vertices(resource, 0.1)) == [10, 20]
+
+
+def test_point_layer(ngw_txn, ngw_resource_group):
+    resource = VectorLayer(
+        parent_id=ngw_resource_group, display_name='points',
+        owner_user=User.by_keyname('administrator'),
+        srs=SRS.filter_by(id=3857).one(), geometry_type='POINT',
+        tbl_uuid=six.text_type(uuid4().hex),
+    ).persist()
+    resource.setup_from_fields([])
+
+    with pytest.raises(ValidationError):
+        resource.setup_generalization([1])
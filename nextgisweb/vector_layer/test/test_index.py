@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, absolute_import, print_function, unicode_literals
+import json
+import six
+from uuid import uuid4
+
+import pytest
+import transaction
+from osgeo import ogr
+
+from nextgisweb.models import DBSession
+from nextgisweb.auth import User
+from nextgisweb.spatial_ref_sys import SRS
+from nextgisweb.vector_layer import VectorLayer
+
+
+@pytest.fixture(scope='module')
+def vector_layer_id(ngw_resource_group):
+    with transaction.manager:
+        trgm = DBSession.connection().execute(
+            "SELECT 1 FROM pg_extension WHERE extname='pg_trgm'").fetchone()
+        if trgm is None:
+            pytest.skip("PostgreSQL extension pg_trgm is not available")
+
+        obj = VectorLayer(
+            parent_id=ngw_resource_group, display_name='vector_layer',
+            owner_user=User.by_keyname('administrator'),
+            srs=SRS.filter_by(id=3857).one(),
+            tbl_uuid=six.text_type(uuid4().hex),
+        ).persist()
+
+        geojson = {
+            'type': 'FeatureCollection',
+            'features': [{
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [0.0, 0.0]},
+                'properties': {'int': num, 'string': text},
+            } for num, text in ((1, 'Foo bar'), (2, 'Baz'), (3, None))]
+        }
+        dsource = ogr.Open(json.dumps(geojson))
+        layer = dsource.GetLayer(0)
+
+        obj.setup_from_ogr(layer, lambda x: x)
+        obj.load_from_ogr(layer, lambda x: x)
+
+        DBSession.flush()
+        DBSession.expunge(obj)
+
+    yield obj.id
+
+    with transaction.manager:
+        DBSession.delete(VectorLayer.filter_by(id=obj.id).one())
+
+
+def test_field_index(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/resource/%d' % vector_layer_id
+
+    def field_indexes():
+        fields = ngw_webtest_app.get(url).json['feature_layer']['fields']
+        return dict((f['keyname'], f['index']) for f in fields)
+
+    assert field_indexes() == dict(int=[], string=[])
+
+    fields = ngw_webtest_app.get(url).json['feature_layer']['fields']
+    fid = dict((f['keyname'], f['id']) for f in fields)
+
+    ngw_webtest_app.put_json(url, dict(feature_layer=dict(fields=[
+        dict(id=fid['int'], index=['btree']),
+        dict(id=fid['string'], index=['btree', 'trigram']),
+    ])))
+    assert field_indexes() == dict(int=['btree'], string=['btree', 'trigram'])
+
+    ngw_webtest_app.put_json(url, dict(feature_layer=dict(fields=[
+        dict(id=fid['string'], index=['trigram']),
+    ])))
+    assert field_indexes() == dict(int=['btree'], string=['trigram'])
+
+    ngw_webtest_app.put_json(url, dict(feature_layer=dict(fields=[
+        dict(id=fid['int'], index=['trigram']),
+    ])), status=422)
+
+
+def test_search_index(ngw_webtest_app, vector_layer_id, ngw_auth_administrator):
+    url = '/api/resource/%d' % vector_layer_id
+    feature_url = '/api/resource/%d/feature/' % vector_layer_id
+
+    def like(value):
+        return sorted(f['fields']['int'] for f in ngw_webtest_app.get(
+            feature_url, dict(like=value)).json)
+
+    assert like('BA') == [1, 2]
+
+    ngw_webtest_app.put_json(url, dict(vector_layer=dict(search_index=True)))
+    assert ngw_webtest_app.get(url).json['vector_layer']['search_index'] is True
+
+    assert like('BA') == [1, 2]
+    assert like('3') == [3]
+    assert like('r2') == []
+
+    ngw_webtest_app.post_json(feature_url, dict(
+        geom='POINT (0 0)', fields=dict(int=4, string='Qux')))
+    assert like('qu') == [4]
+
+    fields = ngw_webtest_app.get(url).json['feature_layer']['fields']
+    fid = dict((f['keyname'], f['id']) for f in fields)
+
+    # Values of deleted fields are removed from the search column
+    ngw_webtest_app.put_json(url, dict(feature_layer=dict(fields=[
+        dict(id=fid['string'], delete=True),
+    ])))
+    assert like('qu') == []
+    assert like('4') == [4]
+
+    ngw_webtest_app.put_json(url, dict(feature_layer=dict(fields=[
+        dict(id=fid['int']),
+        dict(keyname='note', datatype='STRING'),
+    ])))
+    ngw_webtest_app.post_json(feature_url, dict(
+        geom='POINT (0 0)', fields=dict(int=5, note='Quux')))
+    assert like('quu') == [5]
+
+    ngw_webtest_app.put_json(url, dict(vector_layer=dict(search_index=False)))
+    assert like('quu') == [5]
@@ -19,6 +19,7 @@ from ..resource import (
 from ..spatial_ref_sys import SRS
 from ..geometry import geom_from_wkt
 from ..feature_layer import IFeatureLayer
+from ..feature_layer.identify import identify_filter
 from .. import geojson
 
 from .model import Service
@@ -223,7 +224,7 @@ def _get_feature_info(obj, request):
         request.resource_permission(DataScope.read, flayer)
 
         query = flayer.feature_query()
-        query.intersects(qgeom)
+        identify_filter(query, flayer, qgeom)
 
         # Limit number of layer features so that we
         # don't overshoot its total number
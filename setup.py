@@ -49,6 +49,7 @@ requires = [
     'unicodecsv==0.14.1',
     'flatdict==4.0.1',
     'psutil==5.7.3',
+    'cryptography==3.3.2',  # The last release supporting Python 2.7
 
     # TODO: Move to dev or test dependencies
     'freezegun',
@@ -66,7 +67,8 @@ if sys.version_info[0:2] < (3, 6):
 
 
 extras_require = {
-    'dev': ['pdbpp', 'ipython']
+    'dev': ['pdbpp', 'ipython'],
+    'brotli': ['brotli'],
 }
 
 entry_points = {